@@ -0,0 +1,84 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+# Alias lookup time for different amounts of aliases (folder / executable path aliases).
+# Usage (from the repository root): python benchmarks/bench_aliases.py
+# The previous implementation (dict lookup of every parent path of the executable, Windows paths are used on any OS) is measured for comparison.
+
+from pathlib import Path, PureWindowsPath
+import time
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from modular.aliases import AliasMatcher  # noqa: E402
+
+
+ALIASES_AMOUNTS = (10, 1000, 10000, 50000)
+LOOKUPS_AMOUNT = 10000
+MISSING_PATH = r"C:\Program Files\Some Vendor\Some App\bin\x64\release\app.exe"  # 8 components, no alias.
+ALIASED_PATH = r"C:\Games\Game 7\Binaries\Win64\game.exe"  # Matches `C:\Games\Game 7` folder alias.
+
+
+def gen_aliases(amount: int) -> dict[str, str]:
+    aliases = {}
+    for i in range(amount):
+        if i % 2:
+            aliases[rf"C:\Games\Game {i}"] = f"Game{i}"
+        else:
+            aliases[rf"D:\Apps\Vendor {i % 97}\App {i}\app{i}.exe"] = f"App{i}"
+    return aliases
+
+
+def bench(func, path: str) -> float:
+    """
+    Returns average time (in seconds) of `func(path)`.
+    """
+    start = time.perf_counter()
+    for _ in range(LOOKUPS_AMOUNT):
+        func(path)
+    return (time.perf_counter() - start) / LOOKUPS_AMOUNT
+
+
+def old_get_alias(aliases: dict[PureWindowsPath, str], path: str) -> str | None:
+    """
+    Previous implementation: exact path, then every parent folder.
+    """
+    path = PureWindowsPath(path)
+    if path in aliases:
+        return aliases[path]
+    for parent in path.parents:
+        if parent in aliases:
+            return aliases[parent]
+    return None
+
+
+def main():
+    print(f"{'aliases':>8}  {'miss':>9}  {'hit':>9}  {'old miss':>9}  {'old hit':>9}")
+    for amount in ALIASES_AMOUNTS:
+        aliases = gen_aliases(amount)
+        matcher = AliasMatcher()
+        for path, alias in aliases.items():
+            matcher.add(path, alias)
+        matcher.compile()
+        old_aliases = {PureWindowsPath(path): alias for path, alias in aliases.items()}
+        assert matcher.find(ALIASED_PATH) == "Game7" and matcher.find(MISSING_PATH) is None
+
+        print(f"{amount:>8}  "
+              f"{bench(matcher.find, MISSING_PATH) * 1e6:>7.2f}us  "
+              f"{bench(matcher.find, ALIASED_PATH) * 1e6:>7.2f}us  "
+              f"{bench(lambda p: old_get_alias(old_aliases, p), MISSING_PATH) * 1e6:>7.2f}us  "
+              f"{bench(lambda p: old_get_alias(old_aliases, p), ALIASED_PATH) * 1e6:>7.2f}us", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+# Save-time latency of "most recorded process" queries for different replay buffer lengths.
+# Usage (from the repository root): python benchmarks/bench_exe_history.py [--old]
+# --old also measures the previous implementation: max(deque, key=deque.count) (quadratic, very slow for 1h+ buffers).
+
+from collections import deque
+from pathlib import Path
+import argparse
+import time
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from modular.exe_history import ExeHistory  # noqa: E402
+
+
+BUFFER_LENGTHS = (30, 600, 3600, 21600)  # seconds
+EXECUTABLES_AMOUNT = 8
+SAMPLING_PERIOD = 1.0  # seconds
+SWITCH_EVERY = 7  # samples
+QUERIES_AMOUNT = 1000
+
+
+def fill_history(max_time: float) -> tuple[ExeHistory, float]:
+    """
+    Fills the history twice over its length (so eviction is included), returns the history and the last timestamp.
+    """
+    history = ExeHistory(max_time=max_time, max_gap=SAMPLING_PERIOD * 3)
+    ts = 0.0
+    for i in range(int(max_time / SAMPLING_PERIOD) * 2):
+        ts = i * SAMPLING_PERIOD
+        history.append((i // SWITCH_EVERY) % EXECUTABLES_AMOUNT, ts)
+    return history, ts
+
+
+def bench_query(history: ExeHistory, now: float) -> float:
+    """
+    Returns average time (in seconds) of the query made on clip saving (whole buffer and clip span).
+    """
+    start = time.perf_counter()
+    for _ in range(QUERIES_AMOUNT):
+        snapshot = history.snapshot(now)
+        snapshot.top(1)
+        snapshot.top_between(now - history.max_time / 2, now, 1)
+    return (time.perf_counter() - start) / QUERIES_AMOUNT
+
+
+def bench_old(max_time: float) -> float:
+    """
+    Returns time (in seconds) of the previous implementation: `max(deque, key=deque.count)` over Path samples.
+    """
+    paths = [Path(f"C:/Games/game{i}/game{i}.exe") for i in range(EXECUTABLES_AMOUNT)]
+    samples = deque(maxlen=int(max_time / SAMPLING_PERIOD))
+    for i in range(int(max_time / SAMPLING_PERIOD) * 2):
+        samples.append(paths[(i // SWITCH_EVERY) % EXECUTABLES_AMOUNT])
+    start = time.perf_counter()
+    max(samples, key=samples.count)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--old", action="store_true", help="Also measure the previous implementation.")
+    args = parser.parse_args()
+
+    print(f"{'buffer':>8}  {'query':>10}" + (f"  {'old':>10}" if args.old else ""))
+    for max_time in BUFFER_LENGTHS:
+        history, now = fill_history(max_time)
+        line = f"{max_time:>7}s  {bench_query(history, now) * 1e6:>8.2f}us"
+        if args.old:
+            line += f"  {bench_old(max_time) * 1e3:>8.1f}ms"
+        print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@
 import ast
 import logging
 from typing import TypeAlias
+from modular.known_games import compile_known_games
 
 
 logger = logging.getLogger()
@@ -133,6 +134,19 @@ def find_imports(file_name: str) -> tuple[Imports, int]:
 
 
 FILES_ORDER = ['ui',
+               'exe_history',
+               'process_cache',
+               'backends',
+               'sampler',
+               'session_log',
+               'templates',
+               'aliases',
+               'known_games',
+               'friendly_names',
+               'rules',
+               'save_request',
+               'unique_names',
+               'finalizer',
                'globals',
                'exceptions',
                'updates_check',
@@ -140,6 +154,7 @@ FILES_ORDER = ['ui',
                'properties_callbacks',
                'tech',
                'obs_related',
+               'capture_hooks',
                'script_helpers',
                'clipname_gen',
                'save_buffer',
@@ -181,4 +196,7 @@ if __name__ == '__main__':
     total_code += code_without_imports.strip()
 
     with open('smart_replays.py', 'w', encoding='utf-8') as f:
-        f.write(total_code)
\ No newline at end of file
+        f.write(total_code)
+
+    games_amount = compile_known_games('known_games.txt', 'smart_replays_known_games.db')
+    logger.info(f'Known games database compiled: {games_amount} entries.')
\ No newline at end of file
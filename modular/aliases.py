@@ -0,0 +1,380 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from pathlib import Path
+from collections import OrderedDict
+from threading import Lock
+import re
+
+
+class AliasTrie:
+    """
+    Trie of aliases paths, built from case-folded path components.
+
+    Both exact executable paths and folders are stored in the same trie, so the longest matching prefix
+    (the executable itself or its closest aliased parent folder) is found in a single walk over
+    the path components. Lookup time depends on the path depth only, not on the amount of aliases.
+    Paths are case-folded and both `\\` and `/` are treated as separators, so `C:\\Games` and `c:/games`
+    are the same key.
+    """
+    SEPARATORS_RE = re.compile(r"[\\/]+")
+    VALUE_KEY = ""  # Path components are never empty, so an empty key is used to store an alias in a node.
+
+    def __init__(self):
+        self.root: dict = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def split_path(cls, path: str | Path) -> list[str]:
+        """
+        Splits the path into case-folded components.
+
+        :param path: File or folder path.
+        """
+        return [i for i in cls.SEPARATORS_RE.split(str(path).casefold()) if i]
+
+    def add(self, path: str | Path, alias: str) -> bool:
+        """
+        Adds an alias. Returns False if the path already has an alias (it's not replaced).
+
+        :param path: Executable or folder path.
+        :param alias: Alias.
+        """
+        node = self.root
+        for part in self.split_path(path):
+            node = node.setdefault(part, {})
+        if self.VALUE_KEY in node:
+            return False
+
+        node[self.VALUE_KEY] = alias
+        self.size += 1
+        return True
+
+    def find(self, path: str | Path) -> str | None:
+        """
+        Returns alias of the path itself or of its closest parent folder, or None if there is no alias.
+
+        :param path: Executable path.
+        """
+        return self.match(path)[0]
+
+    def match(self, path: str | Path) -> tuple[str | None, bool]:
+        """
+        Returns alias of the path itself or of its closest parent folder (or None if there is no alias)
+        and whether it's an alias of the path itself.
+
+        :param path: Executable path.
+        """
+        return self.match_parts(self.split_path(path))
+
+    def match_parts(self, parts: list[str]) -> tuple[str | None, bool]:
+        """
+        Same as `match`, but takes path already split into case-folded components (see `split_path`).
+        """
+        node = self.root
+        alias, exact = None, False
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return alias, False
+            if self.VALUE_KEY in node:
+                alias, exact = node[self.VALUE_KEY], True
+            else:
+                exact = False
+        return alias, exact
+
+
+class AliasPattern:
+    """
+    Glob or regex alias, compiled as a part of a combined regex (see `AliasMatcher`).
+    """
+    PLACEHOLDER_RE = re.compile(r"\{(\w+)}")
+
+    def __init__(self, index: int, regex: str, alias: str, prefix: str, key: str | None = None):
+        """
+        :param index: Pattern index (priority).
+        :param regex: Regex of the pattern (its group names are already prefixed).
+        :param alias: Alias, can contain `{1}` (captured group number) or `{name}` (captured group name) placeholders.
+        :param prefix: Prefix of the pattern's group names.
+        :param key: Case-folded path component that every matching path contains (if known).
+        """
+        self.index = index
+        self.regex = regex
+        self.alias = alias
+        self.prefix = prefix
+        self.key = key
+        # Compiled in the same form as in the combined regex, so invalid patterns are rejected by `AliasMatcher.add`.
+        self.compiled = re.compile(f"(?:{regex})", re.IGNORECASE)
+        self.groups_amount = self.compiled.groups
+        self.group = 0  # Index of the pattern's outer group in the combined regex (set by `AliasMatcher.compile`).
+        self.has_placeholders = bool(self.PLACEHOLDER_RE.search(alias))
+        self.replacement_table: dict = {}  # `str.translate` table for captured values (set by `AliasMatcher`).
+
+    def render(self, match: re.Match, offset: int = 0) -> str:
+        """
+        Substitutes captured groups into the alias. Prohibited characters of captured values are replaced with `_`.
+
+        :param match: Match of the pattern (or of the combined regex).
+        :param offset: Index of the pattern's first group in the match groups.
+        """
+        if not self.has_placeholders:
+            return self.alias
+
+        groups = match.groups()[offset:offset + self.groups_amount]
+
+        def replace(placeholder: re.Match) -> str:
+            key = placeholder.group(1)
+            if key.isdigit():
+                value = groups[int(key) - 1] if 0 < int(key) <= len(groups) else None
+            else:
+                value = match.groupdict().get(self.prefix + key)
+            return (value or "").translate(self.replacement_table)
+
+        return self.PLACEHOLDER_RE.sub(replace, self.alias)
+
+
+class AliasMatcher:
+    """
+    All aliases of the script compiled into a few lookup structures.
+
+    Supported alias paths:
+        - exact executable paths and folders (`C:\\Games\\Apex`) - `AliasTrie`;
+        - executable names (`valorant.exe`) - dict of case-folded names;
+        - globs (`*\\steamapps\\common\\<game>\\**`): `*` - any characters within a path component,
+          `**` - any characters, `?` - any character, `<name>` - captures a path component;
+        - regexes (`re:.*\\(\\w+)-Win64-Shipping\\.exe`).
+
+    Alias of a glob or regex can contain `{1}` / `{name}` placeholders that are replaced with captured groups.
+
+    Globs with a literal path component (e.g. `steamapps`) are indexed by it, so only the patterns which
+    components are present in the path are tried. Other globs and regexes are compiled into combined
+    alternation regexes (up to `CHUNK_SIZE` patterns in each), so a lookup is one regex match per chunk
+    instead of a match per pattern. The matched pattern is found by the index of the last closed group
+    (pattern's outer group).
+
+    Priority: exact executable path, executable name, patterns (in the order they were added), closest folder.
+    Matching is case-insensitive.
+    """
+    CHUNK_SIZE = 200
+    GLOB_TOKENS_RE = re.compile(r"\*\*|\*|\?|<(\w+)>|[\\/]+")
+    NAMED_GROUP_RE = re.compile(r"\(\?P([<=])(\w+)")
+    NUMBERED_BACKREFERENCE_RE = re.compile(r"\\\d")
+    GLOBAL_FLAGS_RE = re.compile(r"\(\?([ims]+)\)")
+
+    def __init__(self, prohibited_chars: str = ""):
+        """
+        :param prohibited_chars: Characters that are replaced with `_` in captured groups.
+        """
+        self.trie = AliasTrie()
+        self.names: dict[str, str] = {}  # {case-folded executable name: alias}
+        self.patterns: list[AliasPattern] = []
+        self.keys: dict[str, list[AliasPattern]] = {}  # {case-folded path component: [pattern, ...]}
+        self.chunks: list[tuple[re.Pattern, dict[int, AliasPattern]]] = []  # [(regex, {group: pattern}), ...]
+        self.replacement_table = str.maketrans({i: "_" for i in prohibited_chars})
+
+    def __len__(self) -> int:
+        return len(self.trie) + len(self.names) + len(self.patterns)
+
+    @staticmethod
+    def is_pattern(path: str) -> bool:
+        """
+        Checks if the alias path is a glob or regex.
+        """
+        return path.startswith("re:") or any(i in path for i in "*?<")
+
+    def add(self, path: str, alias: str) -> bool:
+        """
+        Adds an alias. Returns False if the path already has an alias.
+        Raises `re.error` if the path is an invalid regex.
+        Patterns are not matched until `compile` is called.
+
+        :param path: Executable path, folder path, executable name, glob or regex (with `re:` prefix).
+        :param alias: Alias.
+        """
+        if self.is_pattern(path):
+            pattern = self._create_pattern(len(self.patterns), path, alias)
+            pattern.replacement_table = self.replacement_table
+            self.patterns.append(pattern)
+            return True
+        elif not any(i in path for i in "\\/"):
+            key = path.casefold()
+            if key in self.names:
+                return False
+            self.names[key] = alias
+            return True
+        return self.trie.add(path, alias)
+
+    def compile(self):
+        """
+        Compiles patterns into combined regexes.
+        """
+        keys, chunks = {}, []
+        for pattern in self.patterns:
+            if pattern.key:
+                keys.setdefault(pattern.key, []).append(pattern)
+
+        not_indexed = [pattern for pattern in self.patterns if not pattern.key]
+        for start in range(0, len(not_indexed), self.CHUNK_SIZE):
+            patterns, regexes, group = {}, [], 1
+            for pattern in not_indexed[start:start + self.CHUNK_SIZE]:
+                pattern.group = group
+                patterns[group] = pattern
+                regexes.append(f"({pattern.regex})")
+                group += 1 + pattern.groups_amount
+            chunks.append((re.compile("|".join(regexes), re.IGNORECASE), patterns))
+        self.keys, self.chunks = keys, chunks
+
+    def find(self, path: str | Path) -> str | None:
+        """
+        Returns alias of the executable or None if there is no alias.
+
+        :param path: Executable path.
+        """
+        path = str(path)
+        parts = AliasTrie.split_path(path)
+        alias, exact = self.trie.match_parts(parts)
+        if exact:
+            return alias
+
+        if parts and parts[-1] in self.names:
+            return self.names[parts[-1]]
+
+        result = None  # (pattern, match, groups offset)
+        if self.keys:
+            candidates = {pattern.index: pattern for part in parts for pattern in self.keys.get(part, ())}
+            for index in sorted(candidates):
+                if match := candidates[index].compiled.fullmatch(path):
+                    result = (candidates[index], match, 0)
+                    break
+
+        for regex, patterns in self.chunks:
+            if match := regex.fullmatch(path):
+                pattern = patterns[match.lastindex]
+                if result is None or pattern.index < result[0].index:
+                    result = (pattern, match, pattern.group)
+                break
+
+        if result is not None:
+            return result[0].render(result[1], result[2])
+        return alias
+
+    @classmethod
+    def _create_pattern(cls, index: int, path: str, alias: str) -> AliasPattern:
+        prefix, key = f"a{index}_", None
+        if path.startswith("re:"):
+            regex = path[3:]
+            if cls.NUMBERED_BACKREFERENCE_RE.search(regex):
+                raise re.error("Numbered backreferences are not supported.")
+            # Global flags are allowed only at the start of the combined regex, so leading `(?i)` is scoped
+            # to the pattern: `(?i:...)`. Global flags in other places are rejected when the pattern is compiled.
+            if flags := cls.GLOBAL_FLAGS_RE.match(regex):
+                regex = f"(?{flags.group(1)}:{regex[flags.end():]})"
+            # Group names are prefixed, since all patterns are combined in one regex.
+            regex = cls.NAMED_GROUP_RE.sub(lambda m: f"(?P{m.group(1)}{prefix}{m.group(2)}", regex)
+        else:
+            regex = cls._translate_glob(path, prefix)
+            literals = [i for i in AliasTrie.split_path(path) if not any(j in i for j in "*?<")]
+            key = max(literals, key=len, default=None)
+        return AliasPattern(index, regex, alias, prefix, key)
+
+    @classmethod
+    def _translate_glob(cls, glob: str, prefix: str) -> str:
+        """
+        Translates glob into regex. Globs that don't start with a drive or separator match at any depth.
+        """
+        result = [] if re.match(r"[a-zA-Z]:|[\\/]", glob) else [r"(?:.*[\\/])?"]
+        position = 0
+        for token in cls.GLOB_TOKENS_RE.finditer(glob):
+            result.append(re.escape(glob[position:token.start()]))
+            value = token.group(0)
+            if value == "**":
+                result.append(".*")
+            elif value == "*":
+                result.append(r"[^\\/]*")
+            elif value == "?":
+                result.append(r"[^\\/]")
+            elif token.group(1):
+                result.append(f"(?P<{prefix}{token.group(1)}>[^\\\\/]+)")
+            else:
+                result.append(r"[\\/]+")
+            position = token.end()
+        result.append(re.escape(glob[position:]))
+        return "".join(result)
+
+
+class DisplayNameCache:
+    """
+    Bounded LRU memo of executables display names (alias or executable name): {exe_id: display_name}.
+
+    The cache is tagged with aliases generation (incremented every time aliases are reloaded).
+    If a lookup is made with another generation, the cache is cleared first, so names resolved
+    with old aliases are never returned.
+    """
+    def __init__(self, max_size: int = 256):
+        """
+        :param max_size: Max amount of cached names. The least recently used names are evicted.
+        """
+        self.max_size = max_size
+        self.entries: OrderedDict[int, str] = OrderedDict()
+        self.generation = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, exe_id: int, generation: int) -> str | None:
+        """
+        Returns cached display name or None.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param generation: Current aliases generation.
+        """
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+
+            name = self.entries.get(exe_id)
+            if name is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(exe_id)
+            self.hits += 1
+            return name
+
+    def put(self, exe_id: int, name: str, generation: int):
+        """
+        Caches display name. Ignored if aliases were reloaded while the name was resolved.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param name: Display name.
+        :param generation: Aliases generation the name was resolved with.
+        """
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[exe_id] = name
+            self.entries.move_to_end(exe_id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{len(self.entries)} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
@@ -0,0 +1,480 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+import ctypes
+from ctypes import wintypes
+from ctypes.util import find_library
+from pathlib import Path
+from contextlib import suppress
+from bisect import bisect_right
+from threading import Lock
+import subprocess
+import shlex
+import time
+import sys
+import os
+
+
+class LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [("cbSize", wintypes.UINT),
+                ("dwTime", wintypes.DWORD)]
+
+
+class XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [("window", ctypes.c_ulong),
+                ("state", ctypes.c_int),
+                ("kind", ctypes.c_int),
+                ("til_or_since", ctypes.c_ulong),
+                ("idle", ctypes.c_ulong),
+                ("eventMask", ctypes.c_ulong)]
+
+
+class ForegroundBackend:
+    """
+    Base class of OS-specific process and window introspection.
+
+    Everything the script needs to know about the system (active window, its process,
+    process executable, user idle time, sound playback) goes through a backend,
+    so the naming pipeline doesn't depend on a specific OS.
+    """
+    name = "base"
+
+    def get_active_window(self) -> int:
+        """
+        Returns handle (or any other unique ID) of the current active window.
+        """
+        raise NotImplementedError
+
+    def get_window_pid(self, window: int) -> int:
+        """
+        Returns process ID of the window.
+
+        :param window: Window handle (from `get_active_window`).
+        """
+        raise NotImplementedError
+
+    def get_active_window_pid(self) -> int:
+        """
+        Returns process ID of the current active window.
+        """
+        return self.get_window_pid(self.get_active_window())
+
+    def get_window_title(self, window: int) -> str:
+        """
+        Returns title of the window.
+
+        :param window: Window handle (from `get_active_window`).
+        """
+        return ""
+
+    def get_executable_product_name(self, path: str | Path) -> str:
+        """
+        Returns product name of the executable from its metadata (e.g. version resource), or an empty string.
+        It can be slow, results should be cached.
+
+        :param path: Executable path.
+        """
+        return ""
+
+    def get_process_creation_time(self, pid: int) -> int:
+        """
+        Returns process creation time (in any units, used only to tell apart processes with the same ID).
+
+        :param pid: Process ID.
+        """
+        raise NotImplementedError
+
+    def get_executable_path(self, pid: int) -> str:
+        """
+        Returns path of process's executable.
+
+        :param pid: Process ID.
+        """
+        raise NotImplementedError
+
+    def get_running_process_ids(self) -> set[int]:
+        """
+        Returns IDs of all currently running processes.
+        """
+        raise NotImplementedError
+
+    def get_time_since_last_input(self) -> int:
+        """
+        Returns the time (in seconds) since the last mouse or keyboard input.
+        """
+        return 0
+
+    def play_sound(self, path: str | Path):
+        """
+        Plays sound (.wav) asynchronously.
+
+        :param path: Path to sound.
+        """
+
+
+class WindowsBackend(ForegroundBackend):
+    """
+    Windows backend (user32, kernel32, psapi, version).
+    """
+    name = "windows"
+    VERSION_INFO_FIELDS = ("ProductName", "FileDescription")
+    VERSION_INFO_TRANSLATIONS = ("040904b0", "040904e4", "000004b0")  # English (Unicode / Windows-1252), neutral.
+
+    def __init__(self):
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.psapi = ctypes.windll.psapi
+        self.version = ctypes.windll.version
+
+    def get_active_window(self) -> int:
+        return self.user32.GetForegroundWindow()
+
+    def get_window_pid(self, window: int) -> int:
+        pid = wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(window, ctypes.byref(pid))
+        return pid.value
+
+    def get_window_title(self, window: int) -> str:
+        length = self.user32.GetWindowTextLengthW(window)
+        title_buffer = ctypes.create_unicode_buffer(length + 1)
+        self.user32.GetWindowTextW(window, title_buffer, length + 1)
+        return title_buffer.value
+
+    def get_executable_product_name(self, path: str | Path) -> str:
+        size = self.version.GetFileVersionInfoSizeW(str(path), None)
+        if not size:
+            return ""
+        info = ctypes.create_string_buffer(size)
+        if not self.version.GetFileVersionInfoW(str(path), 0, size, info):
+            return ""
+
+        value, length = ctypes.c_void_p(), wintypes.UINT()
+        translations = []
+        if (self.version.VerQueryValueW(info, "\\VarFileInfo\\Translation", ctypes.byref(value), ctypes.byref(length))
+                and length.value >= 4):
+            language, codepage = (wintypes.WORD * 2).from_address(value.value)
+            translations.append(f"{language:04x}{codepage:04x}")
+        translations.extend(self.VERSION_INFO_TRANSLATIONS)
+
+        for field in self.VERSION_INFO_FIELDS:
+            for translation in translations:
+                if (self.version.VerQueryValueW(info, f"\\StringFileInfo\\{translation}\\{field}",
+                                                ctypes.byref(value), ctypes.byref(length))
+                        and length.value and (name := ctypes.wstring_at(value, length.value).strip("\0 "))):
+                    return name
+        return ""
+
+    def get_process_creation_time(self, pid: int) -> int:
+        process_handle = self.kernel32.OpenProcess(0x1000, False, pid)
+        # PROCESS_QUERY_LIMITED_INFORMATION
+
+        if not process_handle:
+            raise OSError(f"Process {pid} does not exist.")
+
+        creation_time, exit_time, kernel_time, user_time = (wintypes.FILETIME() for _ in range(4))
+        result = self.kernel32.GetProcessTimes(process_handle,
+                                               ctypes.byref(creation_time),
+                                               ctypes.byref(exit_time),
+                                               ctypes.byref(kernel_time),
+                                               ctypes.byref(user_time))
+        self.kernel32.CloseHandle(process_handle)
+        if result:
+            return (creation_time.dwHighDateTime << 32) | creation_time.dwLowDateTime
+        else:
+            raise RuntimeError(f"Cannot get creation time for process {pid}.")
+
+    def get_executable_path(self, pid: int) -> str:
+        process_handle = self.kernel32.OpenProcess(0x0400 | 0x0010, False, pid)
+        # PROCESS_QUERY_INFORMATION | PROCESS_VM_READ
+
+        if not process_handle:
+            raise OSError(f"Process {pid} does not exist.")
+
+        filename_buffer = ctypes.create_unicode_buffer(260)  # Windows path is 260 characters max.
+        result = self.psapi.GetModuleFileNameExW(process_handle, None, filename_buffer, 260)
+        self.kernel32.CloseHandle(process_handle)
+        if result:
+            return filename_buffer.value
+        else:
+            raise RuntimeError(f"Cannot get executable path for process {pid}.")
+
+    def get_running_process_ids(self) -> set[int]:
+        size = 1024
+        while True:
+            pids = (wintypes.DWORD * size)()
+            bytes_returned = wintypes.DWORD()
+            if not self.psapi.EnumProcesses(pids, ctypes.sizeof(pids), ctypes.byref(bytes_returned)):
+                raise RuntimeError("Cannot enumerate processes.")
+
+            amount = bytes_returned.value // ctypes.sizeof(wintypes.DWORD)
+            if amount < size:  # If the buffer is full, there may be more processes.
+                return set(pids[:amount])
+            size *= 2
+
+    def get_time_since_last_input(self) -> int:
+        last_input_info = LASTINPUTINFO()
+        last_input_info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+
+        if self.user32.GetLastInputInfo(ctypes.byref(last_input_info)):
+            current_time = self.kernel32.GetTickCount()
+            idle_time_ms = current_time - last_input_info.dwTime
+            return idle_time_ms // 1000
+        return 0
+
+    def play_sound(self, path: str | Path):
+        import winsound
+        with suppress(Exception):
+            winsound.PlaySound(str(path), winsound.SND_ASYNC)
+
+
+class LinuxBackend(ForegroundBackend):
+    """
+    Linux backend.
+
+    Processes are inspected through `/proc/<pid>/exe` and `/proc/<pid>/stat`.
+    Active window and idle time are taken from X11 (EWMH `_NET_ACTIVE_WINDOW` / `_NET_WM_PID`
+    and XScreenSaver extension), if X11 display is available.
+    The display connection is used by the sampler thread and by the OBS thread, so every Xlib call is made
+    under `x_lock` (`XInitThreads` is not used: it must be called before any other Xlib call in the process,
+    and OBS has already made them when the script is loaded).
+    Product names are taken from `.desktop` entries (`Name` of the entry whose `Exec` / `TryExec` runs the executable).
+    """
+    name = "linux"
+
+    def __init__(self):
+        self.desktop_names: dict[str, str] | None = None  # {executable path or name: entry name}, loaded lazily.
+        self.xlib = None
+        self.xss = None
+        self.display = None
+        self.root = None
+        self.xss_info = None
+        self.x_lock = Lock()
+
+        with suppress(Exception):
+            xlib = ctypes.cdll.LoadLibrary(find_library("X11"))
+            xlib.XOpenDisplay.restype = ctypes.c_void_p
+            xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+            xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+            xlib.XInternAtom.restype = ctypes.c_ulong
+            xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+            xlib.XGetWindowProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong,
+                                                ctypes.c_long, ctypes.c_long, ctypes.c_int, ctypes.c_ulong,
+                                                ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+                                                ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                                                ctypes.POINTER(ctypes.c_void_p)]
+            xlib.XFree.argtypes = [ctypes.c_void_p]
+
+            display = xlib.XOpenDisplay(None)
+            if display:
+                self.xlib, self.display = xlib, display
+                self.root = xlib.XDefaultRootWindow(display)
+                self.atom_active_window = xlib.XInternAtom(display, b"_NET_ACTIVE_WINDOW", False)
+                self.atom_wm_pid = xlib.XInternAtom(display, b"_NET_WM_PID", False)
+                self.atom_wm_name = xlib.XInternAtom(display, b"_NET_WM_NAME", False)
+
+        if self.display:
+            with suppress(Exception):
+                xss = ctypes.cdll.LoadLibrary(find_library("Xss"))
+                xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+                xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                                      ctypes.POINTER(XScreenSaverInfo)]
+                self.xss, self.xss_info = xss, xss.XScreenSaverAllocInfo()
+
+    def get_active_window(self) -> int:
+        if not self.display:
+            raise OSError("X11 display is not available.")
+
+        window = self._get_window_property(self.root, self.atom_active_window)
+        if not window:
+            raise RuntimeError("Cannot get active window.")
+        return window
+
+    def get_window_pid(self, window: int) -> int:
+        pid = self._get_window_property(window, self.atom_wm_pid)
+        if not pid:
+            raise RuntimeError(f"Cannot get process ID of window {window}.")
+        return pid
+
+    def get_window_title(self, window: int) -> str:
+        return self._get_window_property(window, self.atom_wm_name, text=True) or ""
+
+    def get_executable_product_name(self, path: str | Path) -> str:
+        if self.desktop_names is None:
+            self.desktop_names = self._load_desktop_names()
+        path = str(path)
+        return self.desktop_names.get(path) or self.desktop_names.get(os.path.basename(path), "")
+
+    def get_process_creation_time(self, pid: int) -> int:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        # Process name (2nd field) can contain spaces and brackets, so fields are counted from the last ')'.
+        # starttime is the 22nd field.
+        return int(stat[stat.rindex(b")") + 2:].split()[19])
+
+    def get_executable_path(self, pid: int) -> str:
+        return os.readlink(f"/proc/{pid}/exe")
+
+    def get_running_process_ids(self) -> set[int]:
+        return {int(i) for i in os.listdir("/proc") if i.isdigit()}
+
+    def get_time_since_last_input(self) -> int:
+        if not self.xss:
+            return 0
+        with self.x_lock:
+            if self.xss.XScreenSaverQueryInfo(self.display, self.root, self.xss_info):
+                return self.xss_info.contents.idle // 1000
+        return 0
+
+    def play_sound(self, path: str | Path):
+        with suppress(Exception):
+            subprocess.Popen(["paplay", str(path)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _get_window_property(self, window: int, atom: int, text: bool = False) -> int | str | None:
+        """
+        Returns the first 32-bit value of the X11 window property.
+
+        :param text: Return the whole property as UTF-8 string (e.g. `_NET_WM_NAME`).
+        """
+        actual_type, actual_format = ctypes.c_ulong(), ctypes.c_int()
+        items_amount, bytes_after = ctypes.c_ulong(), ctypes.c_ulong()
+        prop = ctypes.c_void_p()
+        with self.x_lock:
+            status = self.xlib.XGetWindowProperty(self.display, window, atom, 0, 1024 if text else 1, False, 0,
+                                                  ctypes.byref(actual_type), ctypes.byref(actual_format),
+                                                  ctypes.byref(items_amount), ctypes.byref(bytes_after),
+                                                  ctypes.byref(prop))
+            if status or not prop.value:
+                return None
+
+            if text:
+                value = ctypes.string_at(prop, items_amount.value).decode("utf-8", "replace")
+            else:
+                # Format 32 items are stored as C longs.
+                value = ctypes.cast(prop, ctypes.POINTER(ctypes.c_ulong))[0] if items_amount.value else None
+            self.xlib.XFree(prop)
+        return value
+
+    @staticmethod
+    def _load_desktop_names() -> dict[str, str]:
+        """
+        Reads `.desktop` entries from XDG applications folders (user entries override system ones).
+
+        :return: {executable path or name: entry name}
+        """
+        data_dirs = [os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")]
+        data_dirs += (os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share").split(":")
+        data_dirs += ["/var/lib/flatpak/exports/share", os.path.expanduser("~/.local/share/flatpak/exports/share")]
+
+        names = {}
+        for data_dir in reversed(data_dirs):
+            for entry_path in Path(data_dir, "applications").glob("**/*.desktop"):
+                with suppress(OSError, UnicodeDecodeError):
+                    entry, section = {}, None
+                    for line in entry_path.read_text(encoding="utf-8").splitlines():
+                        if line.startswith("["):
+                            section = line.strip()
+                        elif section == "[Desktop Entry]" and "=" in line:
+                            key, value = line.split("=", 1)
+                            entry.setdefault(key.strip(), value.strip())
+
+                    if not entry.get("Name") or entry.get("NoDisplay") == "true":
+                        continue
+                    for command in (entry.get("TryExec", ""), entry.get("Exec", "")):
+                        with suppress(ValueError):
+                            args = shlex.split(command)
+                            while args and (args[0] == "env" or "=" in args[0]):
+                                args.pop(0)
+                            # Launchers shortcuts (e.g. `steam steam://rungameid/...`) don't name the launcher itself.
+                            if args and not any("://" in i for i in args):
+                                names[args[0]] = names[os.path.basename(args[0])] = entry["Name"]
+        return names
+
+
+class SyntheticBackend(ForegroundBackend):
+    """
+    Scripted backend for benchmarks and load tests.
+
+    Active executable is switched according to the script: a list of `(executable path, duration in seconds)`
+    pairs, that is played in a loop. Every executable gets its own fake process.
+    """
+    name = "synthetic"
+
+    def __init__(self, script: list[tuple[str, float]], idle_time: int = 0, clock=time.monotonic):
+        """
+        :param script: List of `(executable path, duration in seconds)` pairs.
+        :param idle_time: Value returned by `get_time_since_last_input`.
+        :param clock: Function that returns current time in seconds.
+        """
+        if not script:
+            raise ValueError("Script is empty.")
+
+        self.script = script
+        self.idle_time = idle_time
+        self.clock = clock
+        self.started_at = clock()
+        self.played_sounds: list[str] = []
+
+        self.segments_ends: list[float] = []
+        total = 0
+        for _, duration in script:
+            total += duration
+            self.segments_ends.append(total)
+
+        self.paths: dict[int, str] = {}  # {pid: "path/to/executable"}
+        self.pids: dict[str, int] = {}  # {"path/to/executable": pid}
+        for path, _ in script:
+            if path not in self.pids:
+                pid = 1000 + len(self.pids) * 4
+                self.pids[path], self.paths[pid] = pid, path
+
+    def get_active_window(self) -> int:
+        position = (self.clock() - self.started_at) % self.segments_ends[-1]
+        return bisect_right(self.segments_ends, position) + 1
+
+    def get_window_pid(self, window: int) -> int:
+        return self.pids[self.script[window - 1][0]]
+
+    def get_window_title(self, window: int) -> str:
+        return Path(self.script[window - 1][0]).stem
+
+    def get_process_creation_time(self, pid: int) -> int:
+        if pid not in self.paths:
+            raise OSError(f"Process {pid} does not exist.")
+        return 0
+
+    def get_executable_path(self, pid: int) -> str:
+        if pid not in self.paths:
+            raise OSError(f"Process {pid} does not exist.")
+        return self.paths[pid]
+
+    def get_running_process_ids(self) -> set[int]:
+        return set(self.paths)
+
+    def get_time_since_last_input(self) -> int:
+        return self.idle_time
+
+    def play_sound(self, path: str | Path):
+        self.played_sounds.append(str(path))
+
+
+def create_backend() -> ForegroundBackend:
+    """
+    Creates backend for the current OS.
+    """
+    if sys.platform == "win32":
+        return WindowsBackend()
+    elif sys.platform.startswith("linux"):
+        return LinuxBackend()
+    raise NotImplementedError(f"{sys.platform} is not supported.")
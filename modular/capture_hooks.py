@@ -0,0 +1,198 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from .globals import VARIABLES, CONSTANTS, PN
+from .tech import _print
+
+import obspython as obs
+import os
+
+
+def get_hooked_exe_id() -> int | None:
+    """
+    Returns ID of the executable that is currently captured by a game / window capture source
+    of the current scene. If several sources are hooked, returns the one that was hooked last.
+    """
+    hooked = VARIABLES.hooked_executables
+    if not hooked:
+        return None
+    # dict can be changed by OBS thread, so take a copy of values.
+    values = list(hooked.values())
+    return values[-1] if values else None
+
+
+def resolve_hooked_executable(executable: str) -> str:
+    """
+    Game capture reports only the executable file name.
+    Tries to find full path of the executable among cached processes to make path aliases work.
+
+    :param executable: Executable file name (e.g. `game.exe`).
+    :return: Full executable path if found, otherwise executable file name.
+    """
+    name = executable.casefold()
+    for _, path in list(VARIABLES.process_cache.entries.values()):
+        if os.path.basename(path).casefold() == name:
+            return path
+    return executable
+
+
+def query_hooked_executable(source) -> str | None:
+    """
+    Returns executable file name the capture source is currently hooked to (`get_hooked` proc of the source),
+    or None if the source is not hooked or OBS doesn't provide the proc (OBS < 30).
+
+    :param source: Capture source.
+    """
+    cd = obs.calldata_create()
+    try:
+        ph = obs.obs_source_get_proc_handler(source)
+        if not obs.proc_handler_call(ph, "get_hooked", cd) or not obs.calldata_bool(cd, "hooked"):
+            return None
+        return obs.calldata_string(cd, "executable") or None
+    finally:
+        obs.calldata_destroy(cd)
+
+
+def on_capture_hooked(cd):
+    """
+    `hooked` signal callback of a capture source.
+    """
+    source = obs.calldata_source(cd, "source")
+    executable = obs.calldata_string(cd, "executable")
+    if not source or not executable:
+        return
+
+    source_name = obs.obs_source_get_name(source)
+    exe_id = VARIABLES.exe_registry.intern(resolve_hooked_executable(executable))
+    VARIABLES.hooked_executables.pop(source_name, None)  # Re-insert to make it the last hooked.
+    VARIABLES.hooked_executables[source_name] = exe_id
+    VARIABLES.save_plan_dirty = True
+    _print(f"{source_name} hooked {VARIABLES.exe_registry.paths[exe_id]}.")
+
+
+def on_capture_unhooked(cd):
+    """
+    `unhooked` signal callback of a capture source.
+    """
+    source = obs.calldata_source(cd, "source")
+    if not source:
+        return
+
+    source_name = obs.obs_source_get_name(source)
+    if VARIABLES.hooked_executables.pop(source_name, None) is not None:
+        VARIABLES.save_plan_dirty = True
+        _print(f"{source_name} unhooked.")
+
+
+def on_scene_items_changed(cd):
+    """
+    `item_add` / `item_remove` signal callback of the current scene.
+    """
+    subscribe_capture_hooks()
+
+
+def find_capture_sources(scene_source, found: dict | None = None) -> dict:
+    """
+    Finds all capture sources (that emit `hooked` signal) in the scene, including nested scenes and groups.
+
+    :param scene_source: Scene source.
+    :param found: Already found sources {source_name: None} (used for recursion).
+    :return: {source_name: None}
+    """
+    found = {} if found is None else found
+    scene = obs.obs_scene_from_source(scene_source) or obs.obs_group_from_source(scene_source)
+    if not scene:
+        return found
+
+    items = obs.obs_scene_enum_items(scene)
+    for item in items or []:
+        source = obs.obs_sceneitem_get_source(item)
+        source_id = obs.obs_source_get_unversioned_id(source)
+        source_name = obs.obs_source_get_name(source)
+        if source_id in CONSTANTS.HOOKED_CAPTURE_SOURCES_IDS:
+            found[source_name] = None
+        elif source_id in ("scene", "group") and source_name not in found:
+            found[source_name] = None  # Prevents infinite recursion, removed below.
+            find_capture_sources(source, found)
+            del found[source_name]
+    obs.sceneitem_list_release(items)
+    return found
+
+
+def subscribe_capture_hooks():
+    """
+    (Re)subscribes to `hooked` / `unhooked` signals of capture sources of the current scene
+    and to `item_add` / `item_remove` signals of the current scene.
+    Hooked executables of the sources that are still in the current scene are kept,
+    sources that were hooked before subscribing are detected with `query_hooked_executable`.
+    """
+    hooked_executables = VARIABLES.hooked_executables
+    unsubscribe_capture_hooks()
+    if not obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_USE_CAPTURE_HOOKS):
+        return
+
+    scene_source = obs.obs_frontend_get_current_scene()
+    if not scene_source:
+        return
+
+    VARIABLES.hooks_scene_name = obs.obs_source_get_name(scene_source)
+    sh = obs.obs_source_get_signal_handler(scene_source)
+    obs.signal_handler_connect(sh, "item_add", on_scene_items_changed)
+    obs.signal_handler_connect(sh, "item_remove", on_scene_items_changed)
+
+    for source_name in find_capture_sources(scene_source):
+        source = obs.obs_get_source_by_name(source_name)
+        if not source:
+            continue
+        sh = obs.obs_source_get_signal_handler(source)
+        obs.signal_handler_connect(sh, "hooked", on_capture_hooked)
+        obs.signal_handler_connect(sh, "unhooked", on_capture_unhooked)
+        if source_name not in hooked_executables and (executable := query_hooked_executable(source)):
+            hooked_executables[source_name] = VARIABLES.exe_registry.intern(resolve_hooked_executable(executable))
+            VARIABLES.save_plan_dirty = True
+            _print(f"{source_name} is already hooked to {executable}.")
+        obs.obs_source_release(source)
+        VARIABLES.capture_sources.append(source_name)
+    obs.obs_source_release(scene_source)
+    VARIABLES.hooked_executables = {name: exe_id for name, exe_id in hooked_executables.items()
+                                    if name in VARIABLES.capture_sources}
+
+    if VARIABLES.capture_sources:
+        _print(f"Subscribed to capture sources of {VARIABLES.hooks_scene_name}: {', '.join(VARIABLES.capture_sources)}.")
+
+
+def unsubscribe_capture_hooks():
+    """
+    Unsubscribes from all signals connected in `subscribe_capture_hooks` and forgets hooked executables.
+    """
+    if VARIABLES.hooks_scene_name is not None:
+        scene_source = obs.obs_get_source_by_name(VARIABLES.hooks_scene_name)
+        if scene_source:
+            sh = obs.obs_source_get_signal_handler(scene_source)
+            obs.signal_handler_disconnect(sh, "item_add", on_scene_items_changed)
+            obs.signal_handler_disconnect(sh, "item_remove", on_scene_items_changed)
+            obs.obs_source_release(scene_source)
+
+    for source_name in VARIABLES.capture_sources:
+        source = obs.obs_get_source_by_name(source_name)
+        if not source:
+            continue
+        sh = obs.obs_source_get_signal_handler(source)
+        obs.signal_handler_disconnect(sh, "hooked", on_capture_hooked)
+        obs.signal_handler_disconnect(sh, "unhooked", on_capture_unhooked)
+        obs.obs_source_release(source)
+
+    VARIABLES.hooks_scene_name = None
+    VARIABLES.capture_sources = []
+    VARIABLES.hooked_executables = {}
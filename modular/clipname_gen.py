@@ -14,122 +14,262 @@
 
 from .globals import VARIABLES, CONSTANTS, PN, ClipNamingModes
 
-from .tech import get_active_window_pid, get_executable_path, _print
-from .obs_related import get_current_scene_name
+from .tech import get_active_executable_path, get_active_window_title, _print
+from .obs_related import get_current_scene_name, get_most_recorded_scene_name, get_replay_buffer_max_time
+from .templates import ClipTemplate
+from .aliases import AliasMatcher
+from .rules import ClipRule
+from .capture_hooks import get_hooked_exe_id
 
 import obspython as obs
 from pathlib import Path
-from datetime import datetime
+from contextlib import suppress
 import traceback
 
 
-def gen_clip_base_name(mode: ClipNamingModes | None = None) -> str:
+def gen_clip_base_name(mode: ClipNamingModes | None = None,
+                       clip_span: tuple[float, float] | None = None) -> str:
     """
     Generates the base name of the clip based on the selected naming mode.
     It does NOT generate a new path for the clip or filename, only its base name.
 
     :param mode: Clip naming mode. If None, the mode is fetched from the script config.
                  If a value is provided, it overrides the configs value.
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole exe history is used.
     :return: The base name of the clip based on the selected naming mode.
     """
     _print("Generating clip base name...")
     mode = obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_CLIPS_NAMING_MODE) if mode is None else mode
     mode = ClipNamingModes(mode)
 
-    if mode in [ClipNamingModes.CURRENT_PROCESS, ClipNamingModes.MOST_RECORDED_PROCESS]:
-        if mode is ClipNamingModes.CURRENT_PROCESS:
-            _print("Clip file name depends on the name of an active app (.exe file name) at the moment of clip saving.")
-            pid = get_active_window_pid()
-            executable_path = get_executable_path(pid)
-            _print(f"Current active window process ID: {pid}")
-            _print(f"Current active window executable: {executable_path}")
-
-        else:
-            _print("Clip file name depends on the name of an app (.exe file name) "
-                   "that was active most of the time during the clip recording.")
-            if VARIABLES.clip_exe_history:
-                executable_path = max(VARIABLES.clip_exe_history, key=VARIABLES.clip_exe_history.count)
-            else:
-                executable_path = get_executable_path(get_active_window_pid())
-
-        _print(f'Searching for {executable_path} in aliases list...')
-        if alias := get_alias(executable_path, VARIABLES.aliases):
-            _print(f'Alias found: {alias}.')
-            return alias
+    if mode is ClipNamingModes.CURRENT_PROCESS:
+        _print("Clip file name depends on the name of an active app (.exe file name) at the moment of clip saving.")
+        if (exe_id := get_hooked_exe_id()) is not None:
+            _print(f"Captured app executable: {VARIABLES.exe_registry.paths[exe_id]}")
         else:
-            _print(f"{executable_path} or its parents weren't found in aliases list. "
-                   f"Assigning the name of the executable: {executable_path.stem}")
-            return executable_path.stem
+            exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+            _print(f"Current active window process ID: {VARIABLES.process_cache.last_pid}")
+            _print(f"Current active window executable: {VARIABLES.exe_registry.paths[exe_id]}")
+        return get_exe_display_name(exe_id)
+
+    elif mode is ClipNamingModes.MOST_RECORDED_PROCESS:
+        _print("Clip file name depends on the name of an app (.exe file name) "
+               "that was active most of the time during the clip recording.")
+        return get_exe_display_name(get_top_exe_ids(1, 0, clip_span)[0])
+
+    elif mode is ClipNamingModes.TOP_PROCESSES:
+        _print("Clip file name depends on the names of apps (.exe file names) "
+               "that were active most of the time during the clip recording.")
+        return gen_top_apps_name(clip_span)
+
+    elif mode is ClipNamingModes.MOST_RECORDED_SCENE:
+        _print("Clip file name depends on the name of the scene "
+               "that was active most of the time during the clip recording.")
+        return get_most_recorded_scene_name(clip_span)
 
     else:
         _print("Clip filename depends on the name of the current scene name.")
         return get_current_scene_name()
 
 
-def get_alias(executable_path: str | Path, aliases_dict: dict[Path, str]) -> str | None:
+def gen_top_apps_name(clip_span: tuple[float, float] | None = None) -> str:
+    """
+    Generates a name from the names of the apps that were active most of the time during the clip recording
+    (amount of the apps and their min share are taken from the script config), e.g. `Game+Discord`.
+
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole exe history is used.
+    """
+    amount = obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_CLIPS_TOP_APPS_AMOUNT)
+    min_share = obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_CLIPS_TOP_APPS_MIN_SHARE) / 100
+    names = []
+    for exe_id in get_top_exe_ids(max(1, amount), min_share, clip_span):
+        if (name := get_exe_display_name(exe_id)) not in names:
+            names.append(name)
+    return CONSTANTS.TOP_APPS_SEPARATOR.join(names)
+
+
+def get_top_exe_ids(amount: int, min_share: float = 0.0, clip_span: tuple[float, float] | None = None) -> list[int]:
     """
-    Retrieves an alias for the given executable path from the provided dictionary.
+    Returns IDs of up to `amount` executables that were active most of the time during the clip recording.
+    If exe history is empty, returns captured (or active) executable.
 
-    The function first checks if the exact `executable_path` exists in `aliases_dict`.
-    If not, it searches for the closest parent directory that is present in the dictionary.
+    :param amount: Max amount of executables.
+    :param min_share: Min share (0..1) of the clip time (the most active executable is always included).
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole exe history is used.
+    """
+    history = VARIABLES.clip_exe_history.snapshot() if VARIABLES.clip_exe_history else None
+    exe_ids = []
+    if not history:
+        pass
+    elif clip_span is not None:
+        _print(f"Clip span: {clip_span[1] - clip_span[0]:.1f}s.")
+        exe_ids = history.top_between(*clip_span, amount, min_share)
+    else:
+        exe_ids = history.top(amount, min_share)
+
+    if not exe_ids and (exe_id := get_hooked_exe_id()) is not None:
+        exe_ids = [exe_id]
+    if not exe_ids:
+        exe_ids = [VARIABLES.exe_registry.intern(get_active_executable_path())]
+    return exe_ids
+
+
+def get_current_exe_id() -> int:
+    """
+    Returns ID of the captured app executable (if there is a hooked capture source) or of the active one.
+    """
+    if (exe_id := get_hooked_exe_id()) is None:
+        exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+    return exe_id
+
+
+def get_exe_display_name(exe_id: int, log: bool = True) -> str:
+    """
+    Returns alias of the registered executable, its title from the known games database,
+    its friendly name (see `FriendlyNameResolver`) or its name (without extension) if there is none of them.
+    Names are memoized in `VARIABLES.display_names` until aliases are reloaded.
+
+    :param exe_id: Executable ID (from `ExeRegistry`).
+    :param log: Log where the name was found.
+    """
+    executable_path = VARIABLES.exe_registry.paths[exe_id]
+    generation = VARIABLES.aliases_generation
+    if (name := VARIABLES.display_names.get(exe_id, generation)) is not None:
+        source = "cached"
+    elif name := get_alias(executable_path, VARIABLES.alias_matcher):
+        source = "alias"
+    elif name := VARIABLES.known_games.find(VARIABLES.exe_registry.stems[exe_id]):
+        source = "known game"
+    elif name := VARIABLES.friendly_names.resolve(executable_path, VARIABLES.backend):
+        source = "friendly name"
+    else:
+        name, source = VARIABLES.exe_registry.stems[exe_id], "executable name"
+
+    if source != "cached":
+        VARIABLES.display_names.put(exe_id, name, generation)
+    if log:
+        _print(f"Display name of {executable_path} ({source}): {name}.")
+    return name
+
+
+def get_alias(executable_path: str | Path, alias_matcher: AliasMatcher) -> str | None:
+    """
+    Retrieves an alias for the given executable path.
+
+    Priority: exact `executable_path`, executable name, globs / regexes, the closest parent directory.
+    Paths are compared case-insensitively.
 
     :param executable_path: A file path or string representing the executable.
-    :param aliases_dict: A dictionary where keys are `Path` objects representing executable file paths
-                         or directories, and values are their corresponding aliases.
+    :param alias_matcher: Compiled aliases (see `load_aliases`).
     :return: The corresponding alias if found, otherwise `None`.
     """
-    exe_path = Path(executable_path)
-    if exe_path in aliases_dict:
-        return aliases_dict[exe_path]
+    return alias_matcher.find(executable_path)
 
-    for parent in exe_path.parents:
-        if parent in aliases_dict:
-            return aliases_dict[parent]
 
+def get_clip_settings(log: bool = True) -> ClipRule:
+    """
+    Returns clip settings (naming mode, templates, links) from the script config,
+    overridden by the clip rules of the current app (captured or active) and scene.
 
+    :param log: Log the applied rule.
+    """
+    settings = VARIABLES.script_settings
+    clip_settings = ClipRule(obs.obs_data_get_int(settings, PN.PROP_CLIPS_NAMING_MODE),
+                             obs.obs_data_get_string(settings, PN.PROP_CLIPS_FILENAME_TEMPLATE),
+                             obs.obs_data_get_bool(settings, PN.PROP_CLIPS_SAVE_TO_FOLDER),
+                             obs.obs_data_get_string(settings, PN.PROP_CLIPS_FOLDER_TEMPLATE),
+                             obs.obs_data_get_bool(settings, PN.PROP_CLIPS_CREATE_LINKS))
+    rules = VARIABLES.clip_rules
+    if not rules:
+        return clip_settings
 
-def gen_filename(base_name: str, template: str, dt: datetime | None = None) -> str:
+    exe_id = executable_path = scene = None
+    if rules.has_app_rules:
+        exe_id = get_current_exe_id()
+        executable_path = VARIABLES.exe_registry.paths[exe_id]
+    if rules.has_scene_rules:
+        scene = get_current_scene_name()
+
+    if (rule := rules.find(exe_id, executable_path, scene)) is not None:
+        if log:
+            _print(f"Clip rule applied: {rule}.")
+        clip_settings = clip_settings.merged(rule)
+    return clip_settings
+
+
+def compile_clip_template(template: str, folder: bool = False) -> ClipTemplate:
     """
-    Generates a file name based on the template.
-    If the template is invalid or formatting fails, raises ValueError.
-    If the generated name contains prohibited characters, raises SyntaxError.
+    Returns compiled file name (or folder) template.
+    Compiled templates are cached until the script settings are updated.
+    If the template is invalid, raises ValueError.
+    If the template contains prohibited characters, raises SyntaxError.
 
-    :param base_name: Base name for the file.
-    :param template: Template for generating the file name.
-    :param dt: Optional datetime object; uses current time if None.
-    :return: Formatted file name.
+    :param template: Template string.
+    :param folder: Is it a folder template (can contain `/` and `\\` separators).
     """
-    if not template:
-        raise ValueError
+    key = (template, folder)
+    if (compiled := VARIABLES.compiled_templates.get(key)) is None:
+        try:
+            compiled = ClipTemplate(template, CONSTANTS.FILENAME_PROHIBITED_CHARS, separators="/\\" if folder else "")
+        except ValueError:
+            _print(f"An error occurred while compiling the template {template}.")
+            _print(traceback.format_exc())
+            raise
+        VARIABLES.compiled_templates[key] = compiled
+    return compiled
 
-    dt = dt or datetime.now()
-    filename = template.replace("%NAME", base_name)
 
-    try:
-        filename = dt.strftime(filename)
-    except Exception as e:
-        _print(f"An error occurred while generating the file name using the template {template}.")
-        _print(traceback.format_exc())
-        raise ValueError from e
+def check_clip_template(template: str, folder: bool = False) -> bool:
+    """
+    Checks whether the file name (or folder) template is valid.
+    Unlike `compile_clip_template`, doesn't log errors and doesn't cache the template
+    (it's called by the properties callbacks on every key press).
 
-    if any(i in filename for i in CONSTANTS.FILENAME_PROHIBITED_CHARS):
-        raise SyntaxError
-    return filename
+    :param template: Template string.
+    :param folder: Is it a folder template (can contain `/` and `\\` separators).
+    """
+    try:
+        ClipTemplate(template, CONSTANTS.FILENAME_PROHIBITED_CHARS, separators="/\\" if folder else "")
+    except (ValueError, SyntaxError):
+        return False
+    return True
 
 
-def ensure_unique_filename(file_path: str | Path) -> Path:
+def gen_template_values(base_name: str,
+                        templates: list[ClipTemplate],
+                        clip_span: tuple[float, float] | None = None,
+                        seq: int | None = None) -> dict[str, str]:
     """
-    Generates a unique filename by adding a numerical suffix if the file already exists.
+    Generates values of the variables used in the templates (only the used ones are generated).
 
-    :param file_path: A string or Path object representing the target file.
-    :return: A unique Path object with a modified name if necessary.
+    :param base_name: Base name of the clip (%NAME).
+    :param templates: Compiled templates.
+    :param clip_span: Start and end timestamps of the saved clip.
+    :param seq: Clip number (%SEQ). If None, the next number is used (without reserving it).
     """
-    file_path = Path(file_path)
-    parent, stem, suffix = file_path.parent, file_path.stem, file_path.suffix
-    counter = 1
+    used = set().union(*(template.variables for template in templates))
+    values = {"NAME": base_name}
+    if "APPS" in used:
+        values["APPS"] = gen_top_apps_name(clip_span)
+    if "SCENE" in used:
+        values["SCENE"] = get_current_scene_name()
+    if "TITLE" in used:
+        with suppress(Exception):
+            values["TITLE"] = get_active_window_title().strip()
+    if "BUFLEN" in used:
+        history = VARIABLES.clip_exe_history
+        values["BUFLEN"] = str(int(history.max_time if history is not None else get_replay_buffer_max_time()))
+    if "SEQ" in used:
+        values["SEQ"] = str(VARIABLES.clips_seq + 1 if seq is None else seq)
+    return values
 
-    while file_path.exists():
-        file_path = parent / f"{stem} ({counter}){suffix}"
-        counter += 1
 
-    return file_path
+def reserve_clip_seq() -> int:
+    """
+    Reserves the next clip number (%SEQ).
+    Numbers are reserved when the clip destination is generated (not when the clip is moved),
+    so clips saved one after another never get the same number.
+    Must be called on the main thread.
+    """
+    VARIABLES.clips_seq += 1
+    return VARIABLES.clips_seq
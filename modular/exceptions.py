@@ -40,3 +40,27 @@ class AliasInvalidFormat(AliasParsingError):
     """
     Exception raised when an alias is invalid format.
     """
+
+
+class RuleParsingError(Exception):
+    """
+    Base exception for all clip rule related exceptions.
+    """
+    def __init__(self, index):
+        """
+        :param index: rule index.
+        """
+        super(Exception).__init__()
+        self.index = index
+
+
+class RuleTargetAlreadyExists(RuleParsingError):
+    """
+    Exception raised when a rule for the app / scene already exists.
+    """
+
+
+class RuleInvalidFormat(RuleParsingError):
+    """
+    Exception raised when a rule is invalid format.
+    """
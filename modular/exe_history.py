@@ -0,0 +1,535 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from pathlib import Path
+from array import array
+from threading import Lock
+from collections import deque
+from bisect import bisect_right
+import time
+
+
+class ExeRegistry:
+    """
+    Interning table of executables.
+
+    Every distinct executable path gets a small integer ID, so histories store IDs instead of
+    `Path` objects, and path and stem of an executable are resolved only once.
+
+    Lookups are lock-free, only registering of a new executable is done under the lock.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.ids: dict[str, int] = {}  # {"path/to/executable": exe_id}
+        self.paths: list[Path] = []  # [Path(path/to/executable), ...], index is exe_id
+        self.stems: list[str] = []  # [executable stem, ...], index is exe_id
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def intern(self, path: str | Path) -> int:
+        """
+        Returns ID of the executable. If the executable is new, registers it.
+
+        :param path: Executable path.
+        :return: Executable ID.
+        """
+        key = str(path)
+        exe_id = self.ids.get(key)
+        if exe_id is not None:
+            return exe_id
+
+        with self.lock:
+            exe_id = self.ids.get(key)
+            if exe_id is None:
+                if len(self.paths) >= ExeHistory.GAP_ID:
+                    raise OverflowError("Too many executables registered.")
+
+                exe_id = len(self.paths)
+                path = Path(path)
+                self.paths.append(path)
+                self.stems.append(path.stem)
+                self.ids[key] = exe_id  # Published last, so lock-free readers never see an incomplete entry.
+        return exe_id
+
+
+class HistoryChunk:
+    """
+    Fixed-size block of history runs.
+
+    Chunks are append-only: a run is never changed after it was added, its end is the start
+    of the next run (or the history tail end for the last run). That's why chunks can be shared
+    between the history and its snapshots without copying.
+    """
+    __slots__ = ("epoch", "ids", "starts")
+
+    def __init__(self, epoch: int):
+        """
+        :param epoch: Sequence number of the first run of the chunk (among all runs ever added to the history).
+        """
+        self.epoch = epoch
+        self.ids = array('H')
+        self.starts = array('d')
+
+
+class FocusIndex:
+    """
+    Runs of a single executable with cumulative active time (prefix sums) before every run.
+
+    Lets to count how many seconds the executable was active within any time window with binary search.
+    Only the end of the last run can be changed (while the run is extended), so index can be shared
+    with snapshots. Trimmed runs are dropped by creating a new index, not by changing the current one.
+    """
+    __slots__ = ("starts", "ends", "cums", "head")
+
+    def __init__(self, starts: array | None = None, ends: array | None = None, cums: array | None = None):
+        self.starts = starts or array('d')
+        self.ends = ends or array('d')
+        self.cums = cums or array('d')  # Active seconds before every run.
+        self.head = 0  # Index of the oldest not-trimmed run.
+
+    def __len__(self) -> int:
+        return len(self.starts) - self.head
+
+    def push(self, start: float, end: float):
+        cum = self.cums[-1] + self.ends[-1] - self.starts[-1] if self.starts else 0.0
+        self.starts.append(start)
+        self.ends.append(end)
+        self.cums.append(cum)
+
+    def compacted(self) -> "FocusIndex":
+        """
+        Returns a new index without trimmed runs.
+        """
+        return FocusIndex(self.starts[self.head:], self.ends[self.head:], self.cums[self.head:])
+
+    def active_before(self, ts: float, head: int, size: int, tail_end: float) -> float:
+        """
+        Returns active seconds of the executable before `ts` (counted from the first stored run).
+
+        :param ts: Timestamp.
+        :param head: Index of the first run to consider.
+        :param size: Amount of runs to consider.
+        :param tail_end: Timestamp after which nothing is known yet (run ends are clipped to it).
+        """
+        i = bisect_right(self.starts, ts, head, size) - 1
+        if i < head:
+            return self.cums[head]
+        end = min(ts, self.ends[i], tail_end)
+        return self.cums[i] + max(0.0, end - self.starts[i])
+
+
+class ExeHistorySnapshot:
+    """
+    Frozen view of `ExeHistory`.
+
+    It references the same chunks as the history, plus a few scalars that describe
+    which runs were visible at the moment of the snapshot, so it can be read from any thread
+    while the history keeps growing.
+    """
+    def __init__(self,
+                 chunks: tuple[HistoryChunk, ...],
+                 last_chunk_size: int,
+                 head: int,
+                 cutoff: float,
+                 tail_end: float,
+                 totals: dict[int, float],
+                 total_time: float,
+                 ranking: list[int],
+                 indexes: dict[int, tuple[FocusIndex, int, int]]):
+        self.chunks = chunks
+        self.last_chunk_size = last_chunk_size
+        self.head = head
+        self.cutoff = cutoff
+        self.tail_end = tail_end
+        self.totals = totals
+        self.total_time = total_time
+        self.ranking = ranking  # Executable IDs sorted by active time (descending).
+        self.indexes = indexes  # {exe_id: (index, head, size)}
+
+    @property
+    def epoch(self) -> int:
+        """
+        Sequence number of the next run that would be added after this snapshot.
+        Two snapshots with the same epoch and tail end are identical.
+        """
+        return self.chunks[-1].epoch + self.last_chunk_size if self.chunks else 0
+
+    def __bool__(self) -> bool:
+        return bool(self.totals)
+
+    def most_common(self) -> int | None:
+        """
+        Returns ID of the executable that was active most of the time within the snapshot.
+        """
+        return self.ranking[0] if self.ranking else None
+
+    def top(self, amount: int, min_share: float = 0.0) -> list[int]:
+        """
+        Returns IDs of up to `amount` executables that were active most of the time within the snapshot
+        (the most active first). Costs O(amount).
+
+        :param amount: Max amount of executables.
+        :param min_share: Min share (0..1) of the snapshot active time. Executables with a smaller share are skipped
+            (except the most active one, which is always returned).
+        """
+        result = []
+        for exe_id in self.ranking[:amount]:
+            if self.totals[exe_id] <= 0 or (result and self.totals[exe_id] < self.total_time * min_share):
+                break
+            result.append(exe_id)
+        return result
+
+    def get_active_time(self, exe_id: int, start: float, end: float) -> float:
+        """
+        Returns how many seconds the executable was active between `start` and `end`.
+        Costs O(log N), where N is amount of the executable runs.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param start: Window start timestamp.
+        :param end: Window end timestamp.
+        """
+        if exe_id not in self.indexes:
+            return 0.0
+        index, head, size = self.indexes[exe_id]
+        start, end = max(start, self.cutoff), min(end, self.tail_end)
+        if end <= start:
+            return 0.0
+        return (index.active_before(end, head, size, self.tail_end)
+                - index.active_before(start, head, size, self.tail_end))
+
+    def most_common_between(self, start: float, end: float) -> int | None:
+        """
+        Returns ID of the executable that was active most of the time between `start` and `end`.
+        Costs O(E * log N), where E is amount of executables in the snapshot.
+
+        :param start: Window start timestamp.
+        :param end: Window end timestamp.
+        """
+        return next(iter(self.top_between(start, end, 1)), None)
+
+    def top_between(self, start: float, end: float, amount: int, min_share: float = 0.0) -> list[int]:
+        """
+        Returns IDs of up to `amount` executables that were active most of the time between `start` and `end`.
+        If the window covers the whole snapshot, costs O(amount), otherwise O(E * log N).
+
+        :param start: Window start timestamp.
+        :param end: Window end timestamp.
+        :param amount: Max amount of executables.
+        :param min_share: Min share (0..1) of the window active time. Executables with a smaller share are skipped
+            (except the most active one, which is always returned).
+        """
+        if start <= self.cutoff and end >= self.tail_end:
+            return self.top(amount, min_share)
+
+        times = {exe_id: self.get_active_time(exe_id, start, end) for exe_id in self.indexes}
+        total_time = sum(times.values())
+        ranking = sorted(times, key=times.get, reverse=True)[:amount]
+        return [exe_id for index, exe_id in enumerate(ranking)
+                if times[exe_id] > 0 and (index == 0 or times[exe_id] >= total_time * min_share)]
+
+    def iter_runs(self, include_gaps: bool = False):
+        """
+        Yields runs `(exe_id, start_ts, end_ts)` from the oldest to the newest.
+
+        :param include_gaps: Yield periods without samples as well (with `ExeHistory.GAP_ID` executable ID).
+        """
+        previous = None
+        for chunk_index, chunk in enumerate(self.chunks):
+            size = self.last_chunk_size if chunk_index == len(self.chunks) - 1 else len(chunk.ids)
+            first = self.head if chunk_index == 0 else 0
+            for i in range(first, size):
+                if previous is not None and (include_gaps or previous[0] != ExeHistory.GAP_ID):
+                    yield previous[0], previous[1], chunk.starts[i]
+                previous = (chunk.ids[i], max(chunk.starts[i], self.cutoff))
+
+        if previous is not None and (include_gaps or previous[0] != ExeHistory.GAP_ID):
+            yield previous[0], previous[1], self.tail_end
+
+
+class ExeHistory:
+    """
+    Timeline of active executables stored as runs of `(exe_id, start_ts, end_ts)`.
+
+    A new run is created only when the active executable changes (or sampling was interrupted),
+    otherwise the last run is just extended. Runs that are older than `max_time` seconds
+    (by wall-clock time) are trimmed, so memory depends on the amount of focus switches,
+    not on the replay buffer length.
+
+    Runs are stored in append-only chunks of compact arrays (`array('H')` for executable IDs,
+    `array('d')` for start timestamps). The end of a run is the start of the next one, periods
+    without samples are stored as runs with `GAP_ID`. All mutable state (trim position, tail end)
+    are scalars, so `snapshot` costs only a copy of chunks references and per-executable totals.
+
+    Total active time of every executable is updated on every extension / trim, and executables
+    are kept sorted by it (`ranking`, adjusted by swapping neighbours on every change, which is O(1)
+    in common case, since time changes are small), so the most recorded executables are available
+    without walking the timeline.
+    For arbitrary time windows every executable has its own `FocusIndex` (prefix sums of active time).
+
+    History is filled by the sampler thread and read by OBS thread, so all public methods are done under the lock.
+    """
+    GAP_ID = 0xFFFF
+
+    def __init__(self, max_time: float, max_gap: float = 3, chunk_size: int = 64):
+        """
+        :param max_time: Timeline length in seconds (usually replay buffer max time).
+        :param max_gap: Max time in seconds between two samples of the same run.
+            If the gap between samples is bigger, a new run is created.
+        :param chunk_size: Amount of runs in one chunk.
+        """
+        self.lock = Lock()
+        self.max_time = max_time
+        self.max_gap = max_gap
+        self.chunk_size = chunk_size
+        self.chunks: deque[HistoryChunk] = deque()
+        self.head = 0  # Index of the oldest run in the first chunk.
+        self.cutoff = float("-inf")  # Time before this timestamp is already trimmed.
+        self.tail_end = 0.0  # End of the last run (timestamp of the last sample).
+        self.epoch = 0  # Amount of runs ever added.
+        self.size = 0  # Amount of runs in the history (without gaps).
+        self.totals: dict[int, float] = {}  # {exe_id: active_seconds_amount}
+        self.total_time = 0.0  # Active seconds amount of all executables.
+        self.runs_amount: dict[int, int] = {}  # {exe_id: runs_amount}
+        self.indexes: dict[int, FocusIndex] = {}
+        self.ranking: list[int] = []  # Executable IDs sorted by active time (descending).
+        self.ranks: dict[int, int] = {}  # {exe_id: index_in_ranking}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return bool(self.size)
+
+    @property
+    def runs(self) -> list[tuple[int, float, float]]:
+        """
+        Returns all runs from the oldest to the newest.
+        """
+        return list(self.snapshot().iter_runs())
+
+    def append(self, exe_id: int, ts: float | None = None):
+        """
+        Adds a new sample to the timeline.
+
+        The time passed since the previous sample is attributed to the previous run.
+        If the executable has changed, this time is split in half between the previous run
+        and a new one, since the actual switch happened somewhere between two samples.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param ts: Sample timestamp (`time.time()`). If None, current time is used.
+        """
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            self._append(exe_id, ts)
+
+    def trim(self, now: float | None = None):
+        """
+        Removes (or cuts) runs that are older than `max_time` seconds.
+
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._trim(now)
+
+    def most_common(self, now: float | None = None) -> int | None:
+        """
+        Returns ID of the executable that was active most of the time within the timeline.
+
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._trim(now)
+            return self.ranking[0] if self.ranking else None
+
+    def top(self, amount: int, min_share: float = 0.0, now: float | None = None) -> list[int]:
+        """
+        Returns IDs of up to `amount` executables that were active most of the time within the timeline.
+
+        :param amount: Max amount of executables.
+        :param min_share: Min share (0..1) of the timeline active time. Executables with a smaller share are skipped
+            (except the most active one, which is always returned).
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        return self.snapshot(now).top(amount, min_share)
+
+    def set_max_time(self, max_time: float, now: float | None = None):
+        """
+        Changes timeline length (e.g. after replay buffer length was changed) without rebuilding the history.
+
+        :param max_time: New timeline length in seconds.
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self.max_time = max_time
+            self._trim(now)
+
+    def snapshot(self, now: float | None = None) -> ExeHistorySnapshot:
+        """
+        Returns frozen view of the history. Chunks are shared, not copied.
+
+        :param now: Current timestamp (`time.time()`), the history is trimmed to it before the snapshot.
+            If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._trim(now)
+            return ExeHistorySnapshot(chunks=tuple(self.chunks),
+                                      last_chunk_size=len(self.chunks[-1].ids) if self.chunks else 0,
+                                      head=self.head,
+                                      cutoff=self.cutoff,
+                                      tail_end=self.tail_end,
+                                      totals=dict(self.totals),
+                                      total_time=self.total_time,
+                                      ranking=self.ranking.copy(),
+                                      indexes={exe_id: (index, index.head, len(index.starts))
+                                               for exe_id, index in self.indexes.items()})
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+    def _append(self, exe_id: int, ts: float):
+        start = ts
+        if self.chunks:
+            last_id = self.chunks[-1].ids[-1]
+            delta = ts - self.tail_end
+            if delta < 0:  # System clock was changed, history timestamps are not valid anymore.
+                self._clear()
+            elif delta <= self.max_gap:
+                if last_id == exe_id:
+                    self._add_time(exe_id, delta)
+                    self.indexes[exe_id].ends[-1] = ts
+                    self.tail_end = ts
+                    self._trim(ts)
+                    return
+
+                start = (self.tail_end + ts) / 2
+                self._add_time(last_id, start - self.tail_end)
+                if last_id != self.GAP_ID:
+                    self.indexes[last_id].ends[-1] = start
+            elif last_id != self.GAP_ID:
+                self._push(self.GAP_ID, self.tail_end)
+
+        self._push(exe_id, start)
+        self.indexes[exe_id].push(start, ts)
+        self.tail_end = ts
+        self._add_time(exe_id, ts - start)
+        self._trim(ts)
+
+    def _push(self, exe_id: int, start: float):
+        """
+        Adds a new run to the last chunk (creates a new chunk if it's full).
+        """
+        if not self.chunks or len(self.chunks[-1].ids) >= self.chunk_size:
+            self.chunks.append(HistoryChunk(self.epoch))
+        chunk = self.chunks[-1]
+        chunk.ids.append(exe_id)
+        chunk.starts.append(start)
+        self.epoch += 1
+
+        if exe_id != self.GAP_ID:
+            self.size += 1
+            self.totals.setdefault(exe_id, 0)
+            self.runs_amount[exe_id] = self.runs_amount.get(exe_id, 0) + 1
+            if exe_id not in self.ranks:
+                self.indexes[exe_id] = FocusIndex()
+                self.ranks[exe_id] = len(self.ranking)
+                self.ranking.append(exe_id)
+
+    def _trim(self, now: float):
+        cutoff = now - self.max_time
+        if cutoff <= self.cutoff:
+            return
+
+        while self.chunks:
+            chunk = self.chunks[0]
+            exe_id = chunk.ids[self.head]
+            start = max(chunk.starts[self.head], self.cutoff)
+            if self.head + 1 < len(chunk.ids):
+                end = chunk.starts[self.head + 1]
+            elif len(self.chunks) > 1:
+                end = self.chunks[1].starts[0]
+            else:
+                end = self.tail_end
+
+            if end > cutoff:
+                if exe_id != self.GAP_ID and start < cutoff:
+                    self._add_time(exe_id, start - cutoff)
+                break
+
+            self.head += 1
+            if self.head == len(chunk.ids):
+                self.chunks.popleft()
+                self.head = 0
+
+            if exe_id == self.GAP_ID:
+                continue
+            self.size -= 1
+            self.runs_amount[exe_id] -= 1
+            if self.runs_amount[exe_id]:
+                self._add_time(exe_id, start - end)
+                index = self.indexes[exe_id]
+                index.head += 1
+                if index.head >= 32 and index.head * 2 >= len(index.starts):
+                    self.indexes[exe_id] = index.compacted()
+            else:
+                self.total_time -= self.totals[exe_id]
+                del self.runs_amount[exe_id], self.totals[exe_id], self.indexes[exe_id]
+                self._remove_from_ranking(exe_id)
+
+        self.cutoff = cutoff
+
+    def _clear(self):
+        self.chunks.clear()
+        self.head = 0
+        self.cutoff = float("-inf")
+        self.tail_end = 0.0
+        self.size = 0
+        self.totals.clear()
+        self.total_time = 0.0
+        self.runs_amount.clear()
+        self.indexes.clear()
+        self.ranking.clear()
+        self.ranks.clear()
+
+    def _add_time(self, exe_id: int, seconds: float):
+        """
+        Adds active time to the executable and moves it in the ranking.
+        """
+        totals, ranking, ranks = self.totals, self.ranking, self.ranks
+        totals[exe_id] += seconds
+        self.total_time += seconds
+        rank = ranks[exe_id]
+        if seconds > 0:
+            while rank and totals[ranking[rank - 1]] < totals[exe_id]:
+                ranking[rank] = ranking[rank - 1]
+                ranks[ranking[rank]] = rank
+                rank -= 1
+        else:
+            while rank + 1 < len(ranking) and totals[ranking[rank + 1]] > totals[exe_id]:
+                ranking[rank] = ranking[rank + 1]
+                ranks[ranking[rank]] = rank
+                rank += 1
+        ranking[rank] = exe_id
+        ranks[exe_id] = rank
+
+    def _remove_from_ranking(self, exe_id: int):
+        rank = self.ranks.pop(exe_id)
+        del self.ranking[rank]
+        for i in range(rank, len(self.ranking)):
+            self.ranks[self.ranking[i]] = i
@@ -0,0 +1,156 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+from threading import Thread, Lock
+from collections import deque
+from queue import Queue, Full
+import traceback
+import time
+
+
+class FinishedJob:
+    """
+    Result of a background job: the returned value or the raised exception.
+    """
+    __slots__ = ("result", "error", "trace", "latency")
+
+    def __init__(self, result=None, error: BaseException | None = None, trace: str = "",
+                 latency: float = 0.0):
+        """
+        :param result: Value returned by the job.
+        :param error: Exception raised by the job.
+        :param trace: Formatted traceback of the exception.
+        :param latency: Time from submitting to finishing the job in seconds.
+        """
+        self.result = result
+        self.error = error
+        self.trace = trace
+        self.latency = latency
+
+
+class ClipFinalizer:
+    """
+    Bounded queue of background jobs (moving clip files, creating links) and worker threads running them.
+
+    OBS calls frontend event callbacks on its UI thread, so slow file operations (e.g. a busy disk or antivirus
+    scanning a new file) would freeze OBS. The callback submits a job and returns at once. Results are collected
+    in `finished` and taken with `poll` on the main thread (e.g. by an obs timer), which is the only place
+    where OBS API can be used safely.
+    Workers are started on the first submitted job.
+    """
+    def __init__(self, workers: int = 2, max_size: int = 16):
+        """
+        :param workers: Amount of worker threads.
+        :param max_size: Max amount of queued jobs. If the queue is full, `submit` returns False.
+        """
+        self.workers_amount = workers
+        self.queue: Queue = Queue(maxsize=max_size)
+        self.finished: deque[FinishedJob] = deque()
+        self.workers: list[Thread] = []
+        self.lock = Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.done = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def depth(self) -> int:
+        """
+        Amount of queued jobs (not started yet).
+        """
+        return self.queue.qsize()
+
+    def submit(self, func, *args) -> bool:
+        """
+        Queues `func(*args)`. Returns False if the queue is full (the job is not queued).
+
+        :param func: Function to run in a worker thread. It must not use OBS API.
+        :param args: Function arguments.
+        """
+        self._start_workers()
+        try:
+            self.queue.put_nowait((func, args, time.perf_counter()))
+        except Full:
+            self.rejected += 1
+            return False
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def run(self, func, *args, submit_time: float | None = None) -> FinishedJob:
+        """
+        Runs `func(*args)` in the current thread (e.g. if the queue is full) and returns its result.
+
+        :param func: Function to run.
+        :param args: Function arguments.
+        :param submit_time: Time the job was submitted (`time.perf_counter()`). If None, the current time is used.
+        """
+        submit_time = time.perf_counter() if submit_time is None else submit_time
+        try:
+            job = FinishedJob(result=func(*args))
+        except Exception as e:
+            job = FinishedJob(error=e, trace=traceback.format_exc())
+        job.latency = time.perf_counter() - submit_time
+        with self.lock:
+            self.done += 1
+            self.failed += job.error is not None
+            self.total_latency += job.latency
+            self.max_latency = max(self.max_latency, job.latency)
+        return job
+
+    def poll(self) -> list[FinishedJob]:
+        """
+        Returns finished jobs (each job is returned once).
+        """
+        jobs = []
+        while self.finished:
+            jobs.append(self.finished.popleft())
+        return jobs
+
+    def stop(self, timeout: float | None = None):
+        """
+        Waits for queued jobs and stops the workers.
+
+        :param timeout: Max wait time for every worker in seconds.
+        """
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for _ in workers:
+            self.queue.put((None, (), 0.0))
+        for worker in workers:
+            worker.join(timeout)
+
+    def stats(self) -> dict:
+        return {"workers": len(self.workers), "depth": self.depth, "max_depth": self.max_depth,
+                "submitted": self.submitted, "rejected": self.rejected, "done": self.done, "failed": self.failed,
+                "avg_latency_ms": round(self.total_latency / self.done * 1000, 2) if self.done else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 2)}
+
+    def _start_workers(self):
+        if self.workers:
+            return
+        with self.lock:
+            while len(self.workers) < self.workers_amount:
+                worker = Thread(target=self._run, name=f"SmartReplaysFinalizer-{len(self.workers)}", daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def _run(self):
+        while True:
+            func, args, submit_time = self.queue.get()
+            if func is None:
+                return
+            self.finished.append(self.run(func, *args, submit_time=submit_time))
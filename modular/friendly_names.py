@@ -0,0 +1,197 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from pathlib import Path
+from threading import Lock
+import json
+import os
+import re
+
+
+class FriendlyNameCache:
+    """
+    Persistent cache of executables friendly names, keyed by file identity: {path: (size, mtime_ns, name)}.
+
+    Resolving a name (e.g. parsing the version resource of the executable) is slow, so resolved names
+    are stored in a JSON file. An entry is valid only while the executable size and modification time
+    are the same, so updated executables are resolved again.
+    The file is read on the first lookup and written in batches (every `batch_size` new entries and on `flush`).
+    Empty name means that the executable has no friendly name.
+    """
+    VERSION = 1
+
+    def __init__(self, path: str | Path, batch_size: int = 16, max_size: int = 4096):
+        """
+        :param path: Cache file path.
+        :param batch_size: Amount of new entries after which the cache is written.
+        :param max_size: Max amount of entries. The oldest entries are dropped on write.
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.lock = Lock()
+        self.entries: dict[str, list] | None = None  # {path: [size, mtime_ns, name]}, loaded lazily.
+        self.pending = 0  # Amount of entries that are not written yet.
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries or {})
+
+    def get(self, path: str, size: int, mtime_ns: int) -> str | None:
+        """
+        Returns cached name ("" if the executable has no name) or None if it's not cached or the file was changed.
+
+        :param path: Executable path.
+        :param size: Executable size.
+        :param mtime_ns: Executable modification time (ns).
+        """
+        with self.lock:
+            entry = self._load().get(path)
+            if entry is None or entry[0] != size or entry[1] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def put(self, path: str, size: int, mtime_ns: int, name: str):
+        """
+        Caches the name. The cache is written if there are `batch_size` unwritten entries.
+
+        :param path: Executable path.
+        :param size: Executable size.
+        :param mtime_ns: Executable modification time (ns).
+        :param name: Friendly name ("" if the executable has no name).
+        """
+        with self.lock:
+            entries = self._load()
+            entries.pop(path, None)  # Re-inserted at the end, so the oldest entries are dropped first.
+            entries[path] = [size, mtime_ns, name]
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self._write()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{len(self)} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+    def _load(self) -> dict[str, list]:
+        if self.entries is None:
+            self.entries = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self.entries = {path: entry for path, entry in data["entries"].items()
+                                    if isinstance(entry, list) and len(entry) == 3}
+            except (OSError, ValueError, KeyError, AttributeError):  # No cache yet or it's broken.
+                pass
+        return self.entries
+
+    def _write(self):
+        while len(self.entries) > self.max_size:
+            del self.entries[next(iter(self.entries))]
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:  # Names will be resolved again next time.
+            pass
+        self.pending = 0
+
+
+class FriendlyNameResolver:
+    """
+    Resolves friendly names of executables that have no aliases.
+
+    Sources (in priority order):
+        1. Game folder, if the executable is installed by a game store (e.g. `steamapps/common/Apex Legends/r5apex.exe`);
+        2. Executable metadata from the backend (version resource on Windows, `.desktop` entries on Linux).
+
+    Names are cleaned from trademark signs and prohibited characters and cached in `FriendlyNameCache`.
+    """
+    STORE_FOLDERS = (("steamapps", "common"), ("epic games",), ("gog games",), ("gog galaxy", "games"))
+    STORE_SERVICE_FOLDERS = {"launcher", "steamworks shared", "directxredist"}  # Case-folded, not games.
+    GENERIC_NAMES = {"bootstrappackagedgame", "microsoft windows operating system"}  # Case-folded.
+    TRADEMARKS_RE = re.compile(r"[©®™]|\((?:tm|r|c)\)", re.IGNORECASE)
+    SPACES_RE = re.compile(r"\s+")
+
+    def __init__(self, cache: FriendlyNameCache, prohibited_chars: str):
+        """
+        :param cache: Names cache.
+        :param prohibited_chars: Characters that are removed from names (names are used as file and folder names).
+        """
+        self.cache = cache
+        self.prohibited_chars_re = re.compile(f"[{re.escape(prohibited_chars)}]") if prohibited_chars else None
+
+    def resolve(self, executable_path: str | Path, backend) -> str | None:
+        """
+        Returns friendly name of the executable or None if it has no name.
+
+        :param executable_path: Executable path.
+        :param backend: `ForegroundBackend` used to read executable metadata.
+        """
+        path = str(executable_path)
+        try:
+            stat = os.stat(path)
+        except OSError:  # File identity is unknown, only folder heuristics can be used (they are not cached).
+            return self.get_store_folder_name(path) or None
+
+        name = self.cache.get(path, stat.st_size, stat.st_mtime_ns)
+        if name is None:
+            name = self.get_store_folder_name(path)
+            if not name:
+                try:
+                    name = self.clean_name(backend.get_executable_product_name(path))
+                except Exception:
+                    name = ""
+            self.cache.put(path, stat.st_size, stat.st_mtime_ns, name)
+        return name or None
+
+    def get_store_folder_name(self, executable_path: str | Path) -> str:
+        """
+        Returns name of the game folder if the executable is installed by a game store, otherwise an empty string.
+
+        :param executable_path: Executable path.
+        """
+        parts = [i for i in re.split(r"[\\/]+", str(executable_path)) if i]
+        folded = [i.casefold() for i in parts]
+        for store_parts in self.STORE_FOLDERS:
+            length = len(store_parts)
+            for index in range(len(folded) - length - 1):  # Game folder can't be the executable itself.
+                if (tuple(folded[index:index + length]) == store_parts
+                        and folded[index + length] not in self.STORE_SERVICE_FOLDERS):
+                    return self.clean_name(parts[index + length])
+        return ""
+
+    def clean_name(self, name: str) -> str:
+        """
+        Removes trademark signs and prohibited characters from the name.
+        Returns an empty string if the name is generic (e.g. Unreal Engine bootstrap executable).
+
+        :param name: Name.
+        """
+        name = self.TRADEMARKS_RE.sub("", name or "")
+        if self.prohibited_chars_re is not None:
+            name = self.prohibited_chars_re.sub(" ", name)
+        name = self.SPACES_RE.sub(" ", name).strip(" .")
+        return "" if name.casefold() in self.GENERIC_NAMES else name
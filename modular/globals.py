@@ -12,16 +12,54 @@
 #  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 #  GNU Affero General Public License for more details.
 
+from .exe_history import ExeHistory, ExeRegistry
+from .process_cache import ProcessCache
+from .backends import ForegroundBackend, create_backend
+from .sampler import ForegroundSampler
+from .session_log import SessionLog
+from .templates import ClipTemplate
+from .aliases import AliasMatcher, DisplayNameCache
+from .known_games import KnownGamesDB
+from .friendly_names import FriendlyNameCache, FriendlyNameResolver
+from .rules import ClipRules
+from .save_request import SaveRequest
+from .unique_names import UniqueNameAllocator
+from .finalizer import ClipFinalizer
+
 import sys
 from enum import Enum
-import ctypes
 from threading import Lock
 from pathlib import Path
-from collections import deque, defaultdict
+from collections import defaultdict
 import obspython as obs
 import re
 
-user32 = ctypes.windll.user32
+
+class ConfigTypes(Enum):
+    PROFILE = 0
+    APP = 1
+    USER = 2
+
+
+class ClipNamingModes(Enum):
+    CURRENT_PROCESS = 0
+    MOST_RECORDED_PROCESS = 1
+    CURRENT_SCENE = 2
+    TOP_PROCESSES = 3
+    MOST_RECORDED_SCENE = 4
+
+
+class VideoNamingModes(Enum):
+    CURRENT_PROCESS = 0
+    MOST_RECORDED_PROCESS = 1
+    CURRENT_SCENE = 2
+
+
+class PopupPathDisplayModes(Enum):
+    FULL_PATH = 0
+    FOLDER_AND_FILE = 1
+    JUST_FOLDER = 2
+    JUST_FILE = 3
 
 
 class CONSTANTS:
@@ -33,7 +71,36 @@ class CONSTANTS:
     VIDEOS_FORCE_MODE_LOCK = Lock()
     FILENAME_PROHIBITED_CHARS = r'/\:"<>*?|%'
     PATH_PROHIBITED_CHARS = r'"<>*?|%'
+    PROCESS_CACHE_SWEEP_INTERVAL = 30  # seconds
+    BUFFER_RESTART_START_TIMEOUT = 10  # seconds, replay buffer restart is considered failed if it doesn't start.
+    ADAPTIVE_SAMPLING_MIN_PERIOD = 0.25  # seconds
+    ADAPTIVE_SAMPLING_MAX_PERIOD = 4  # seconds
+    ADAPTIVE_SAMPLING_BACKOFF = 1.5
+    ADAPTIVE_SAMPLING_IDLE_THRESHOLD = 30  # seconds
+    TOP_APPS_SEPARATOR = "+"
+    DISPLAY_NAMES_CACHE_SIZE = 256
+    SAVE_PLAN_REFRESH_PERIOD = 500  # ms
+    # Naming modes, which names depend only on the current app / scene.
+    SAVE_PLAN_MODES = (ClipNamingModes.CURRENT_PROCESS.value, ClipNamingModes.CURRENT_SCENE.value)
+    SAVE_PLAN_VOLATILE_VARIABLES = {"APPS", "TITLE"}  # Can change without focus / scene change events.
+    SAVE_REQUEST_TIMEOUT = 60  # seconds, older save requests are discarded (e.g. OBS failed to save the clip).
+    CLIP_FINALIZER_WORKERS = 2
+    CLIP_FINALIZER_QUEUE_SIZE = 16
+    CLIP_FINALIZER_STOP_TIMEOUT = 10  # seconds
+    FINISHED_CLIPS_CHECK_PERIOD = 100  # ms
+    HOOKED_CAPTURE_SOURCES_IDS = ("game_capture", "window_capture")
+    SESSION_LOGS_FOLDER = Path(__file__).parent / "smart_replays_sessions"
+    SESSION_LOGS_MAX_AMOUNT = 30
+    KNOWN_GAMES_DB_PATH = Path(__file__).parent / "smart_replays_known_games.db"
+    FRIENDLY_NAMES_CACHE_PATH = Path(__file__).parent / "smart_replays_names_cache.json"
+    FRIENDLY_NAMES_CACHE_BATCH = 16
     DEFAULT_FILENAME_FORMAT = "%NAME_%d.%m.%Y_%H-%M-%S"
+    DEFAULT_FOLDER_FORMAT = "%NAME"
+    RULES_NAMING_MODES = {"active": ClipNamingModes.CURRENT_PROCESS.value,
+                          "most-recorded": ClipNamingModes.MOST_RECORDED_PROCESS.value,
+                          "scene": ClipNamingModes.CURRENT_SCENE.value,
+                          "top-apps": ClipNamingModes.TOP_PROCESSES.value,
+                          "most-recorded-scene": ClipNamingModes.MOST_RECORDED_SCENE.value}
     DEFAULT_ALIASES = (
         {"value": "C:\\Windows\\explorer.exe > Desktop", "selected": False, "hidden": False},
         {"value": f"{sys.executable} > OBS", "selected": False, "hidden": False}
@@ -42,38 +109,45 @@ class CONSTANTS:
 
 class VARIABLES:
     update_available: bool = False
-    clip_exe_history: deque[Path, ...] | None = None
-    video_exe_history: defaultdict[Path, int] | None = None  # {Path(path/to/executable): active_seconds_amount
+    exe_registry: ExeRegistry = ExeRegistry()
+    backend: ForegroundBackend = create_backend()
+    process_cache: ProcessCache = ProcessCache()
+    clip_exe_history: ExeHistory | None = None
+    sampler: ForegroundSampler | None = None
+    session_log: SessionLog | None = None
+    buffer_start_time: float | None = None  # Timestamp of the last replay buffer start.
+    buffer_restarting: bool = False  # Replay buffer is being restarted by the script, exe history should be kept.
+    current_scene_name: str | None = None  # Cached name of the current scene, updated on scene events.
+    scene_ids: dict[str, int] = {}  # {scene_name: scene_id}
+    scene_names: list[str] = []  # [scene_name, ...], index is scene_id
+    scene_history: ExeHistory | None = None  # Timeline of scenes (scene IDs instead of executable IDs).
+    hooks_scene_name: str | None = None  # Name of the scene, which capture sources are subscribed to.
+    capture_sources: list[str] = []  # Names of subscribed capture sources.
+    hooked_executables: dict[str, int] = {}  # {capture_source_name: exe_id}
+    video_exe_history: defaultdict[int, int] | None = None  # {exe_id: active_seconds_amount}
     exe_path_on_video_stopping_event: Path | None = None
     aliases: dict[Path, str] = {}
+    alias_matcher: AliasMatcher = AliasMatcher()
+    aliases_generation: int = 0  # Incremented every time aliases are reloaded.
+    display_names: DisplayNameCache = DisplayNameCache(CONSTANTS.DISPLAY_NAMES_CACHE_SIZE)
+    known_games: KnownGamesDB = KnownGamesDB(CONSTANTS.KNOWN_GAMES_DB_PATH)  # Opened on the first lookup.
+    friendly_names: FriendlyNameResolver = FriendlyNameResolver(
+        FriendlyNameCache(CONSTANTS.FRIENDLY_NAMES_CACHE_PATH, CONSTANTS.FRIENDLY_NAMES_CACHE_BATCH),
+        CONSTANTS.FILENAME_PROHIBITED_CHARS
+    )
+    clip_rules: ClipRules = ClipRules()
+    compiled_templates: dict[tuple[str, bool], ClipTemplate] = {}  # {(template, is_folder_template): compiled}
+    clips_seq: int = 0  # Last clip number (%SEQ) given to a save request.
     script_settings = None
     hotkey_ids: dict = {}
     force_mode = None
-
-
-class ConfigTypes(Enum):
-    PROFILE = 0
-    APP = 1
-    USER = 2
-
-
-class ClipNamingModes(Enum):
-    CURRENT_PROCESS = 0
-    MOST_RECORDED_PROCESS = 1
-    CURRENT_SCENE = 2
-
-
-class VideoNamingModes(Enum):
-    CURRENT_PROCESS = 0
-    MOST_RECORDED_PROCESS = 1
-    CURRENT_SCENE = 2
-
-
-class PopupPathDisplayModes(Enum):
-    FULL_PATH = 0
-    FOLDER_AND_FILE = 1
-    JUST_FOLDER = 2
-    JUST_FILE = 3
+    unique_names: UniqueNameAllocator = UniqueNameAllocator()
+    finalizer: ClipFinalizer = ClipFinalizer(workers=CONSTANTS.CLIP_FINALIZER_WORKERS,
+                                             max_size=CONSTANTS.CLIP_FINALIZER_QUEUE_SIZE)
+    save_request: SaveRequest | None = None  # Clip destination generated at the moment of the save request.
+    save_plan: SaveRequest | None = None  # Clip destination generated in advance for the current app and scene.
+    save_plan_dirty: bool = True  # Focus, scene, aliases or settings changed since the plan was generated.
+    last_sampled_exe_id: int | None = None
 
 
 class PropertiesNames:
@@ -83,6 +157,7 @@ class PropertiesNames:
     GR_SOUND_NOTIFICATION_SETTINGS = "sound_notification_settings"
     GR_POPUP_NOTIFICATION_SETTINGS = "popup_notification_settings"
     GR_ALIASES_SETTINGS = "aliases_settings"
+    GR_RULES_SETTINGS = "rules_settings"
     GR_OTHER_SETTINGS = "other_settings"
 
     # Clips path settings
@@ -90,9 +165,13 @@ class PropertiesNames:
     TXT_CLIPS_BASE_PATH_WARNING = "clips_base_path_warning"
     PROP_CLIPS_NAMING_MODE = "clips_naming_mode"
     TXT_CLIPS_HOTKEY_TIP = "clips_hotkey_tip"
+    PROP_CLIPS_TOP_APPS_AMOUNT = "clips_top_apps_amount"
+    PROP_CLIPS_TOP_APPS_MIN_SHARE = "clips_top_apps_min_share"
     PROP_CLIPS_FILENAME_TEMPLATE = "clips_filename_template"
     TXT_CLIPS_FILENAME_TEMPLATE_ERR = "clips_filename_template_err"
     PROP_CLIPS_SAVE_TO_FOLDER = "clips_save_to_folder"
+    PROP_CLIPS_FOLDER_TEMPLATE = "clips_folder_template"
+    TXT_CLIPS_FOLDER_TEMPLATE_ERR = "clips_folder_template_err"
     PROP_CLIPS_ONLY_FORCE_MODE = "clips_only_force_mode" # todo
     PROP_CLIPS_CREATE_LINKS = "clips_create_links"
     PROP_CLIPS_LINKS_FOLDER_PATH = "clips_links_folder_path"
@@ -132,6 +211,12 @@ class PropertiesNames:
     TXT_ALIASES_INVALID_FORMAT = "aliases_invalid_format_err"
     TXT_ALIASES_INVALID_CHARACTERS = "aliases_invalid_characters_err"
 
+    # Clip rules settings
+    PROP_RULES_LIST = "rules_list"
+    TXT_RULES_DESC = "rules_desc"
+    TXT_RULES_INVALID_FORMAT = "rules_invalid_format_err"
+    TXT_RULES_TARGET_EXISTS = "rules_target_exists_err"
+
     # Export / Import aliases section
     PROP_ALIASES_EXPORT_PATH = "aliases_export_path"
     BTN_ALIASES_EXPORT = "aliases_export_btn"
@@ -142,11 +227,17 @@ class PropertiesNames:
     PROP_RESTART_BUFFER = "restart_buffer"
     PROP_RESTART_BUFFER_LOOP = "restart_buffer_loop"
     TXT_RESTART_BUFFER_LOOP = "restart_buffer_loop_desc"
+    PROP_SAMPLING_PERIOD = "sampling_period"
+    PROP_ADAPTIVE_SAMPLING = "adaptive_sampling"
+    PROP_USE_CAPTURE_HOOKS = "use_capture_hooks"
+    PROP_SESSION_LOG = "session_log"
 
     # Hotkeys
     HK_SAVE_BUFFER_MODE_1 = "save_buffer_force_mode_1"
     HK_SAVE_BUFFER_MODE_2 = "save_buffer_force_mode_2"
     HK_SAVE_BUFFER_MODE_3 = "save_buffer_force_mode_3"
+    HK_SAVE_BUFFER_MODE_4 = "save_buffer_force_mode_4"
+    HK_SAVE_BUFFER_MODE_5 = "save_buffer_force_mode_5"
     HK_SAVE_VIDEO_MODE_1 = "save_video_force_mode_1"
     HK_SAVE_VIDEO_MODE_2 = "save_video_force_mode_2"
     HK_SAVE_VIDEO_MODE_3 = "save_video_force_mode_3"
@@ -28,7 +28,13 @@ def load_hotkeys():
          lambda pressed: save_buffer_with_force_mode(ClipNamingModes.MOST_RECORDED_PROCESS) if pressed else None),
 
         (PN.HK_SAVE_BUFFER_MODE_3, "[Smart Replays] Save buffer (active scene)",
-         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.CURRENT_SCENE) if pressed else None)
+         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.CURRENT_SCENE) if pressed else None),
+
+        (PN.HK_SAVE_BUFFER_MODE_4, "[Smart Replays] Save buffer (most recorded exes)",
+         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.TOP_PROCESSES) if pressed else None),
+
+        (PN.HK_SAVE_BUFFER_MODE_5, "[Smart Replays] Save buffer (most recorded scene)",
+         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.MOST_RECORDED_SCENE) if pressed else None)
     )
 
     for key_name, key_desc, key_callback in keys:
@@ -0,0 +1,180 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from pathlib import Path
+from threading import Lock
+from bisect import bisect_left
+import struct
+import mmap
+import os
+
+
+class KnownGamesDB:
+    """
+    Read-only database of known games titles: {executable name: title}, e.g. `r5apex > Apex Legends`.
+
+    The database is a sorted binary file (see `compile_known_games`), which is memory-mapped on the first lookup
+    and searched by bisection, so only the touched pages are loaded and nothing is parsed at the script start.
+
+    File layout: header (magic, version, reserved, entries amount), entries offsets `<I` sorted by key,
+    then entries `key\\0title\\0` (UTF-8). Keys are case-folded executable names without `.exe` extension.
+    """
+    MAGIC = b"SRKG"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHI")
+    OFFSET = struct.Struct("<I")
+
+    def __init__(self, path: str | Path):
+        """
+        :param path: Database file path. The file is opened lazily, it may not exist.
+        """
+        self.path = Path(path)
+        self.lock = Lock()
+        self.file = None
+        self.mm: mmap.mmap | None = None
+        self.size = 0
+        self.error: str | None = None  # Why the database is unavailable.
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def normalize_key(name: str | Path) -> str:
+        """
+        Converts executable name or path to the database key: case-folded name without `.exe` extension.
+
+        :param name: Executable name, stem or path.
+        """
+        name = str(name).replace("\\", "/").rsplit("/", 1)[-1].strip().casefold()
+        return name[:-4] if name.endswith(".exe") else name
+
+    def find(self, name: str | Path) -> str | None:
+        """
+        Returns title of the game or None if the executable is not in the database (or the database is unavailable).
+
+        :param name: Executable name, stem or path.
+        """
+        key = self.normalize_key(name).encode("utf-8")
+        if not key or (mm := self._open()) is None:
+            return None
+
+        self.lookups += 1
+        index = bisect_left(range(self.size), key, key=self._key_at)
+        if index == self.size or self._key_at(index) != key:
+            return None
+
+        self.hits += 1
+        start = mm.find(b"\0", self._offset_at(index)) + 1
+        return mm[start:mm.find(b"\0", start)].decode("utf-8")
+
+    def close(self):
+        with self.lock:
+            if self.mm is not None:
+                self.mm.close()
+            if self.file is not None:
+                self.file.close()
+            self.mm = self.file = None
+            self.size = 0
+            self.error = None
+
+    def stats(self) -> str:
+        if self.error:
+            return f"unavailable ({self.error})"
+        return f"{self.size} entries, {self.lookups} lookups, {self.hits} hits"
+
+    def _open(self) -> mmap.mmap | None:
+        if self.mm is not None or self.error is not None:
+            return self.mm
+
+        with self.lock:
+            if self.mm is not None or self.error is not None:
+                return self.mm
+            try:
+                self.file = open(self.path, "rb")
+                mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:  # ValueError: empty file.
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.error = str(e)
+                return None
+
+            magic, version, _, size = self.HEADER.unpack_from(mm) if len(mm) >= self.HEADER.size else (b"", 0, 0, 0)
+            if magic != self.MAGIC or version != self.VERSION or len(mm) < self.HEADER.size + size * self.OFFSET.size:
+                mm.close()
+                self.file.close()
+                self.file = None
+                self.error = f"{self.path} is not a known games database"
+                return None
+
+            self.size = size
+            self.mm = mm
+            return mm
+
+    def _offset_at(self, index: int) -> int:
+        return self.OFFSET.unpack_from(self.mm, self.HEADER.size + index * self.OFFSET.size)[0]
+
+    def _key_at(self, index: int) -> bytes:
+        offset = self._offset_at(index)
+        return self.mm[offset:self.mm.find(b"\0", offset)]
+
+
+def compile_known_games(source: str | Path, target: str | Path, prohibited_chars: str = r'/\:"<>*?|%') -> int:
+    """
+    Compiles known games text list into the binary database (see `KnownGamesDB`).
+
+    Source lines format: `executable > Title` (executable name with or without `.exe`, case-insensitive).
+    Empty lines and lines starting with `#` are skipped.
+    The target file is replaced atomically.
+    If the source has invalid lines, duplicated executables or prohibited characters in titles, raises ValueError.
+
+    :param source: Text list path.
+    :param target: Database path.
+    :param prohibited_chars: Characters that are not allowed in titles (titles are used as file and folder names).
+    :return: Amount of entries.
+    """
+    entries: dict[bytes, bytes] = {}
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = [i.strip() for i in line.rsplit(">", 1)]
+            if len(parts) != 2 or not all(parts):
+                raise ValueError(f"{source}:{line_no}: expected `executable > Title`, got `{line}`.")
+            key, title = KnownGamesDB.normalize_key(parts[0]).encode("utf-8"), parts[1]
+            if any(i in title for i in prohibited_chars):
+                raise ValueError(f"{source}:{line_no}: prohibited characters in `{line}`.")
+            if key in entries:
+                raise ValueError(f"{source}:{line_no}: {parts[0]} is already in the list.")
+            entries[key] = title.encode("utf-8")
+
+    keys = sorted(entries)
+    offsets, blob = [], bytearray()
+    data_start = KnownGamesDB.HEADER.size + len(keys) * KnownGamesDB.OFFSET.size
+    for key in keys:
+        offsets.append(data_start + len(blob))
+        blob += key + b"\0" + entries[key] + b"\0"
+
+    target = Path(target)
+    tmp_path = target.with_name(target.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(KnownGamesDB.HEADER.pack(KnownGamesDB.MAGIC, KnownGamesDB.VERSION, 0, len(keys)))
+        f.write(struct.pack(f"<{len(keys)}I", *offsets))
+        f.write(blob)
+    os.replace(tmp_path, target)
+    return len(keys)
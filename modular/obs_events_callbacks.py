@@ -14,79 +14,137 @@
 
 from .globals import VARIABLES, PN, CONSTANTS, PopupPathDisplayModes
 from .tech import _print
-from .obs_related import get_replay_buffer_max_time, restart_replay_buffering
+from .obs_related import get_replay_buffer_max_time, update_current_scene
 from .script_helpers import notify
-from .other_callbacks import restart_replay_buffering_callback, append_clip_exe_history, append_video_exe_history
-from .save_buffer import move_clip_file
+from .other_callbacks import (restart_replay_buffering_callback,
+                              append_video_exe_history,
+                              get_max_sampling_period,
+                              start_clip_exe_sampler,
+                              stop_clip_exe_sampler,
+                              open_session_log,
+                              save_plan_callback,
+                              finish_clip_saving)
+from .save_buffer import finalize_clip, prepare_clip_finalization, reset_save_plan
+from .exe_history import ExeHistory
+from .capture_hooks import subscribe_capture_hooks
 from pathlib import Path
 
 import obspython as obs
-from collections import deque, defaultdict
-from threading import Thread
+from collections import defaultdict
 import traceback
+import time
 
 
 def on_buffer_recording_started_callback(event):
     """
-    Resets and starts recording executables history.
-    Starts replay buffer auto restart loop.
+    Resets and starts recording executables history
+    (if replay buffer was restarted by the script, the existing history is kept).
+    Starts replay buffer auto restart loop and save plan refreshing.
     """
     if event is not obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_STARTED:
         return
 
-    # Reset and restart exe history
-    VARIABLES.clip_exe_history = deque([], maxlen=get_replay_buffer_max_time())
-    _print(f"Exe history deque created. Maxlen={VARIABLES.clip_exe_history.maxlen}.")
-    obs.timer_add(append_clip_exe_history, 1000)
+    VARIABLES.buffer_start_time = time.time()
+
+    if VARIABLES.buffer_restarting and VARIABLES.clip_exe_history is not None:
+        VARIABLES.clip_exe_history.set_max_time(get_replay_buffer_max_time())
+        _print(f"Exe history kept after restart. Max time={VARIABLES.clip_exe_history.max_time}s.")
+    else:
+        VARIABLES.clip_exe_history = ExeHistory(max_time=get_replay_buffer_max_time(),
+                                                max_gap=max(3.0, get_max_sampling_period() * 2))
+        _print(f"Exe history created. Max time={VARIABLES.clip_exe_history.max_time}s.")
+
+    if VARIABLES.buffer_restarting and VARIABLES.scene_history is not None:
+        VARIABLES.scene_history.set_max_time(get_replay_buffer_max_time())
+    else:
+        # Scene is active until the next scene switch, so there are no gaps between switches.
+        VARIABLES.scene_history = ExeHistory(max_time=get_replay_buffer_max_time(), max_gap=float("inf"))
+    update_current_scene()
+    VARIABLES.buffer_restarting = False
+
+    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_SESSION_LOG):
+        open_session_log()
+    if VARIABLES.sampler is None:
+        start_clip_exe_sampler()
 
     # Start replay buffer auto restart loop.
     if restart_loop_time := obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_RESTART_BUFFER_LOOP):
         obs.timer_add(restart_replay_buffering_callback, restart_loop_time * 1000)
 
+    VARIABLES.save_plan_dirty = True  # %BUFLEN could change.
+    obs.timer_remove(save_plan_callback)
+    obs.timer_add(save_plan_callback, CONSTANTS.SAVE_PLAN_REFRESH_PERIOD)
+
 
 def on_buffer_recording_stopped_callback(event):
     """
-    Stops recording executables history.
-    Stops replay buffer auto restart loop.
+    Stops recording executables history (unless replay buffer is being restarted by the script).
+    Stops replay buffer auto restart loop and save plan refreshing.
     """
     if event is not obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_STOPPED:
         return
 
-    obs.timer_remove(append_clip_exe_history)
     obs.timer_remove(restart_replay_buffering_callback)
-    VARIABLES.clip_exe_history.clear()
+    if VARIABLES.buffer_restarting:
+        _print("Replay buffer is restarting, exe history is kept.")
+        return
+
+    stop_clip_exe_sampler()
+    obs.timer_remove(save_plan_callback)
+    reset_save_plan()
+    if VARIABLES.session_log is not None:
+        VARIABLES.session_log.flush()
+    if VARIABLES.clip_exe_history is not None:
+        VARIABLES.clip_exe_history.clear()
+    if VARIABLES.scene_history is not None:
+        VARIABLES.scene_history.clear()
+    VARIABLES.friendly_names.cache.flush()
+    _print(f"Process cache: {VARIABLES.process_cache.stats()}.")
+    _print(f"Display names cache: {VARIABLES.display_names.stats()}.")
 
 
 def on_buffer_save_callback(event):
     if event is not obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_SAVED:
         return
 
-    path_display_type = obs.obs_data_get_int(VARIABLES.script_settings,
-                                             PN.PROP_POPUP_PATH_DISPLAY_MODE)
-    path_display_type = PopupPathDisplayModes(path_display_type)
-
     _print(f"{'SAVING BUFFER':->50}")
 
     try:
-        clip_name, path = move_clip_file(mode=VARIABLES.force_mode)
-        if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_RESTART_BUFFER):
-            # IMPORTANT
-            # I don't know why, but it seems like stopping and starting replay buffering should be in the separate thread.
-            # Otherwise it can "stuck" on stopping.
-            Thread(target=restart_replay_buffering, daemon=True).start()
-
-        if VARIABLES.force_mode:
-            VARIABLES.force_mode = None
-            CONSTANTS.CLIPS_FORCE_MODE_LOCK.release()
-
-        notify(True, path, path_display_mode=path_display_type)
+        args = prepare_clip_finalization(VARIABLES.force_mode)
+        # Rendering the destination and file operations are done by the finalizer workers,
+        # results are handled by `finished_clips_callback`.
+        if not VARIABLES.finalizer.submit(finalize_clip, *args):
+            _print(f"Clip finalization queue is full, the clip is moved right now: {VARIABLES.finalizer.stats()}.")
+            finish_clip_saving(VARIABLES.finalizer.run(finalize_clip, *args))
     except:
         _print("An error occurred while moving file to the new destination.")
         _print(traceback.format_exc())
-        notify(False, Path(), path_display_mode=path_display_type)
+        path_display_type = obs.obs_data_get_int(VARIABLES.script_settings,
+                                                 PN.PROP_POPUP_PATH_DISPLAY_MODE)
+        notify(False, Path(), path_display_mode=PopupPathDisplayModes(path_display_type))
+    finally:
+        if VARIABLES.force_mode:
+            VARIABLES.force_mode = None
+            CONSTANTS.CLIPS_FORCE_MODE_LOCK.release()
     _print("-" * 50)
 
 
+def on_scene_changed_callback(event):
+    """
+    Updates cached current scene name, records the scene switch in the scene timeline
+    and resubscribes to capture sources of the new current scene.
+    """
+    if event not in (obs.OBS_FRONTEND_EVENT_SCENE_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_SCENE_LIST_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_FINISHED_LOADING):
+        return
+
+    update_current_scene()
+    subscribe_capture_hooks()
+    VARIABLES.save_plan_dirty = True
+
+
 def on_video_recording_started_callback(event):  # todo: for future updates
     if event is not obs.OBS_FRONTEND_EVENT_RECORDING_STARTED:
         return
@@ -12,7 +12,7 @@
 #  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 #  GNU Affero General Public License for more details.
 
-from .globals import PN, CONSTANTS, ConfigTypes
+from .globals import VARIABLES, PN, CONSTANTS, ConfigTypes
 from .tech import _print
 
 from pathlib import Path
@@ -78,6 +78,16 @@ def get_last_replay_file_name() -> str:
 def get_current_scene_name() -> str:
     """
     Returns the current OBS scene name.
+    The name is cached and updated on scene events (see `update_current_scene`).
+    """
+    if VARIABLES.current_scene_name is None:
+        VARIABLES.current_scene_name = query_current_scene_name()
+    return VARIABLES.current_scene_name
+
+
+def query_current_scene_name() -> str:
+    """
+    Returns the current OBS scene name (queries OBS, doesn't use cache).
     """
     current_scene = obs.obs_frontend_get_current_scene()
     name = obs.obs_source_get_name(current_scene)
@@ -85,6 +95,53 @@ def get_current_scene_name() -> str:
     return name
 
 
+def get_scene_id(scene_name: str) -> int:
+    """
+    Returns ID of the scene name (registers the name if it's new).
+
+    :param scene_name: Scene name.
+    """
+    if (scene_id := VARIABLES.scene_ids.get(scene_name)) is None:
+        scene_id = VARIABLES.scene_ids[scene_name] = len(VARIABLES.scene_names)
+        VARIABLES.scene_names.append(scene_name)
+    return scene_id
+
+
+def update_current_scene(ts: float | None = None):
+    """
+    Updates cached current scene name and records the scene switch in the scene timeline.
+
+    :param ts: Switch timestamp (`time.time()`). If None, current time is used.
+    """
+    ts = time.time() if ts is None else ts
+    name = query_current_scene_name()
+    history = VARIABLES.scene_history
+    if history is not None:
+        if VARIABLES.current_scene_name is not None:  # Previous scene was active up to this moment.
+            history.append(get_scene_id(VARIABLES.current_scene_name), ts)
+        history.append(get_scene_id(name), ts)
+    VARIABLES.current_scene_name = name
+
+
+def get_most_recorded_scene_name(clip_span: tuple[float, float] | None = None) -> str:
+    """
+    Returns the name of the scene that was active most of the time during the clip recording.
+    If there is no scene timeline, returns the current scene name.
+
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole scene timeline is used.
+    """
+    history = VARIABLES.scene_history
+    if history is None:
+        return get_current_scene_name()
+
+    history.append(get_scene_id(get_current_scene_name()))  # Current scene is still active.
+    if clip_span is not None:
+        scene_id = history.snapshot().most_common_between(*clip_span)
+    else:
+        scene_id = history.most_common()
+    return VARIABLES.scene_names[scene_id] if scene_id is not None else get_current_scene_name()
+
+
 def get_replay_buffer_max_time() -> int:
     """
     Returns replay buffer max time from OBS config (in seconds).
@@ -96,6 +153,21 @@ def get_replay_buffer_max_time() -> int:
         return get_obs_config("AdvOut", "RecRBTime", int)
 
 
+def get_clip_span_until(end: float) -> tuple[float, float]:
+    """
+    Returns time span (start and end timestamps) that is covered by the clip ending at `end`
+    (`max_time` seconds before, but not earlier than the replay buffer start).
+
+    :param end: Clip end timestamp (`time.time()`).
+    """
+    history = VARIABLES.clip_exe_history
+    max_time = history.max_time if history is not None else get_replay_buffer_max_time()
+    start = end - max_time
+    if VARIABLES.buffer_start_time is not None:
+        start = min(max(start, VARIABLES.buffer_start_time), end)
+    return start, end
+
+
 def get_base_path(script_settings: Any | None = None) -> Path:
     """
     Returns the base path for clips, either from the script settings or OBS config.
@@ -120,8 +192,12 @@ def get_base_path(script_settings: Any | None = None) -> Path:
 def restart_replay_buffering():
     """
     Restarts replay buffering, obviously -_-
+
+    Exe history and its sampler are kept during the restart (see `VARIABLES.buffer_restarting`).
+    If replay buffering doesn't start, the flag is cleared, so the next manual start doesn't keep the old history.
     """
     _print("Stopping replay buffering...")
+    VARIABLES.buffer_restarting = True
     replay_output = obs.obs_frontend_get_replay_buffer_output()
     obs.obs_frontend_replay_buffer_stop()
 
@@ -130,4 +206,12 @@ def restart_replay_buffering():
     _print("Replay buffering stopped.")
     _print("Starting replay buffering...")
     obs.obs_frontend_replay_buffer_start()
+
+    deadline = time.time() + CONSTANTS.BUFFER_RESTART_START_TIMEOUT
+    while not obs.obs_frontend_replay_buffer_active():
+        if time.time() > deadline:
+            VARIABLES.buffer_restarting = False
+            _print("Replay buffering failed to start.")
+            return
+        time.sleep(0.1)
     _print("Replay buffering started.")
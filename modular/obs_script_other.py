@@ -14,29 +14,45 @@
 
 from .globals import VARIABLES, CONSTANTS, ClipNamingModes, VideoNamingModes, PopupPathDisplayModes, PN
 
-from .tech import _print
+from .tech import _print, warm_process_cache
 from .obs_related import get_base_path
-from .other_callbacks import restart_replay_buffering_callback, append_clip_exe_history
+from .other_callbacks import (restart_replay_buffering_callback,
+                              stop_clip_exe_sampler,
+                              save_plan_callback,
+                              finished_clips_callback,
+                              open_session_log,
+                              close_session_log,
+                              get_sampling_period,
+                              get_max_sampling_period)
 from .obs_events_callbacks import (on_buffer_save_callback,
                                    on_buffer_recording_started_callback,
                                    on_buffer_recording_stopped_callback,
+                                   on_scene_changed_callback,
                                    on_video_recording_started_callback,
                                    on_video_recording_stopping_callback,
                                    on_video_recording_stopped_callback)
 from .updates_check import check_updates
-from .script_helpers import load_aliases
+from .script_helpers import load_aliases, load_rules
+from .exceptions import RuleParsingError, AliasParsingError
 from .hotkeys import load_hotkeys
+from .capture_hooks import subscribe_capture_hooks, unsubscribe_capture_hooks
+from .save_buffer import reset_save_plan
 
 import obspython as obs
+import traceback
 import json
+import re
 
 
 def script_defaults(s):
     _print("Loading default values...")
     obs.obs_data_set_default_string(s, PN.PROP_CLIPS_BASE_PATH, str(get_base_path()))
     obs.obs_data_set_default_int(s, PN.PROP_CLIPS_NAMING_MODE, ClipNamingModes.CURRENT_PROCESS.value)
+    obs.obs_data_set_default_int(s, PN.PROP_CLIPS_TOP_APPS_AMOUNT, 2)
+    obs.obs_data_set_default_int(s, PN.PROP_CLIPS_TOP_APPS_MIN_SHARE, 25)
     obs.obs_data_set_default_string(s, PN.PROP_CLIPS_FILENAME_TEMPLATE, CONSTANTS.DEFAULT_FILENAME_FORMAT)
     obs.obs_data_set_default_bool(s, PN.PROP_CLIPS_SAVE_TO_FOLDER, True)
+    obs.obs_data_set_default_string(s, PN.PROP_CLIPS_FOLDER_TEMPLATE, CONSTANTS.DEFAULT_FOLDER_FORMAT)
     obs.obs_data_set_default_string(s, PN.PROP_CLIPS_LINKS_FOLDER_PATH, str(get_base_path() / '_links'))
 
     # obs.obs_data_set_default_int(s, PN.PROP_VIDEOS_NAMING_MODE, VideoNamingModes.MOST_RECORDED_PROCESS.value)
@@ -50,6 +66,10 @@ def script_defaults(s):
     obs.obs_data_set_default_int(s, PN.PROP_POPUP_PATH_DISPLAY_MODE, PopupPathDisplayModes.FULL_PATH.value)
 
     obs.obs_data_set_default_int(s, PN.PROP_RESTART_BUFFER_LOOP, 3600)
+    obs.obs_data_set_default_int(s, PN.PROP_SAMPLING_PERIOD, 1000)
+    obs.obs_data_set_default_bool(s, PN.PROP_ADAPTIVE_SAMPLING, True)
+    obs.obs_data_set_default_bool(s, PN.PROP_USE_CAPTURE_HOOKS, True)
+    obs.obs_data_set_default_bool(s, PN.PROP_SESSION_LOG, False)
     obs.obs_data_set_default_bool(s, PN.PROP_RESTART_BUFFER, True)
 
     arr = obs.obs_data_array_create()
@@ -65,7 +85,30 @@ def script_update(settings):
     _print("Updating script...")
 
     VARIABLES.script_settings = settings
-    _print(obs.obs_data_get_json(VARIABLES.script_settings))
+    VARIABLES.compiled_templates = {}
+    VARIABLES.save_plan_dirty = True
+    json_settings = obs.obs_data_get_json(VARIABLES.script_settings)
+    _print(json_settings)
+    try:
+        load_rules(json.loads(json_settings))
+    except RuleParsingError as e:
+        _print(f"Clip rule #{e.index + 1} is invalid, clip rules are not updated.")
+    except re.error:
+        _print("Clip rules can't be compiled, clip rules are not updated.")
+        _print(traceback.format_exc())
+
+    if VARIABLES.sampler is not None:
+        VARIABLES.sampler.period = get_sampling_period()
+        VARIABLES.sampler.adaptive = obs.obs_data_get_bool(settings, PN.PROP_ADAPTIVE_SAMPLING)
+    if VARIABLES.clip_exe_history is not None:
+        VARIABLES.clip_exe_history.max_gap = max(3.0, get_max_sampling_period() * 2)
+
+    if obs.obs_data_get_bool(settings, PN.PROP_USE_CAPTURE_HOOKS) != bool(VARIABLES.hooks_scene_name):
+        subscribe_capture_hooks()
+    if not obs.obs_data_get_bool(settings, PN.PROP_SESSION_LOG):
+        close_session_log()
+    elif VARIABLES.sampler is not None:
+        open_session_log()
     _print("Script updated")
 
 
@@ -84,16 +127,24 @@ def script_load(script_settings):
     # VARIABLES.update_available = check_updates(CONSTANTS.VERSION)  # todo: for future updates
 
     json_settings = json.loads(obs.obs_data_get_json(script_settings))
-    load_aliases(json_settings)
+    try:
+        load_aliases(json_settings)
+    except AliasParsingError as e:
+        # E.g. a regex alias saved by an older version, which is rejected now.
+        _print(f"Alias #{e.index + 1} is invalid, aliases are not loaded.")
+    warm_process_cache()
 
     obs.obs_frontend_add_event_callback(on_buffer_save_callback)
     obs.obs_frontend_add_event_callback(on_buffer_recording_started_callback)
     obs.obs_frontend_add_event_callback(on_buffer_recording_stopped_callback)
+    obs.obs_frontend_add_event_callback(on_scene_changed_callback)
 
     # obs.obs_frontend_add_event_callback(on_video_recording_started_callback)  # todo: for future updates
     # obs.obs_frontend_add_event_callback(on_video_recording_stopping_callback)  # todo: for future updates
     # obs.obs_frontend_add_event_callback(on_video_recording_stopped_callback)  # todo: for future updates
     load_hotkeys()
+    subscribe_capture_hooks()
+    obs.timer_add(finished_clips_callback, CONSTANTS.FINISHED_CLIPS_CHECK_PERIOD)
 
     if obs.obs_frontend_replay_buffer_active():
         on_buffer_recording_started_callback(obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_STARTED)
@@ -102,8 +153,24 @@ def script_load(script_settings):
 
 
 def script_unload():
-    obs.timer_remove(append_clip_exe_history)
+    obs.timer_remove(finished_clips_callback)
+    VARIABLES.finalizer.stop(CONSTANTS.CLIP_FINALIZER_STOP_TIMEOUT)
+    for job in VARIABLES.finalizer.poll():
+        _print(f"Clip finalized while unloading: {job.result or job.trace}")
+    stop_clip_exe_sampler()
+    close_session_log()
+    unsubscribe_capture_hooks()
     obs.timer_remove(restart_replay_buffering_callback)
+    obs.timer_remove(save_plan_callback)
+    reset_save_plan()
+    _print(f"Process cache: {VARIABLES.process_cache.stats()}.")
+    _print(f"Display names cache: {VARIABLES.display_names.stats()}.")
+    _print(f"Known games database: {VARIABLES.known_games.stats()}.")
+    _print(f"Friendly names cache: {VARIABLES.friendly_names.cache.stats()}.")
+    _print(f"Unique names: {VARIABLES.unique_names.stats()}.")
+    _print(f"Clip finalizer: {VARIABLES.finalizer.stats()}.")
+    VARIABLES.friendly_names.cache.flush()
+    VARIABLES.known_games.close()
 
     _print("Script unloaded.")
 
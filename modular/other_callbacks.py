@@ -13,13 +13,22 @@
 #  GNU Affero General Public License for more details.
 
 
-from .globals import VARIABLES
+from .globals import VARIABLES, CONSTANTS, PN, PopupPathDisplayModes
 from .obs_related import get_replay_buffer_max_time, restart_replay_buffering
-from .tech import get_time_since_last_input, get_active_window_pid, get_executable_path, _print
+from .tech import get_time_since_last_input, get_active_executable_path, _print
+from .sampler import ForegroundSampler
+from .capture_hooks import get_hooked_exe_id
+from .session_log import SessionLog, analyze_session_log
+from .save_buffer import refresh_save_plan, mark_plan_folder_created
+from .script_helpers import notify
+from .finalizer import FinishedJob
 
 import obspython as obs
 from threading import Thread
 from contextlib import suppress
+from datetime import datetime
+from pathlib import Path
+import traceback
 
 
 def restart_replay_buffering_callback():
@@ -48,14 +57,164 @@ def restart_replay_buffering_callback():
     # I don't re-add this callback to timer again, cz it will be automatically added in on buffering start callback.
 
 
+def save_plan_callback():
+    """
+    Refreshes the save plan if focus, scene, aliases or settings changed.
+
+    This callback is only called by the obs timer (the plan is not refreshed in the sampler thread,
+    cz generating it uses OBS API).
+    """
+    if VARIABLES.save_plan_dirty:
+        refresh_save_plan()
+
+
+def finished_clips_callback():
+    """
+    Handles clips finalized by `ClipFinalizer` workers (notifications and buffer restart use OBS API).
+
+    This callback is only called by the obs timer.
+    """
+    for job in VARIABLES.finalizer.poll():
+        finish_clip_saving(job)
+
+
+def finish_clip_saving(job: FinishedJob):
+    """
+    Notifies about the finalized clip, updates the save plan and restarts replay buffer (if it's enabled).
+    Must be called on the main thread.
+
+    :param job: Finished `finalize_clip` job.
+    """
+    path_display_type = obs.obs_data_get_int(VARIABLES.script_settings,
+                                             PN.PROP_POPUP_PATH_DISPLAY_MODE)
+    path_display_type = PopupPathDisplayModes(path_display_type)
+
+    if job.error is not None:
+        _print("An error occurred while moving file to the new destination.")
+        _print(job.trace)
+        notify(False, Path(), path_display_mode=path_display_type)
+        return
+
+    clip_name, path, folder = job.result
+    mark_plan_folder_created(folder)
+    _print(f"Clip {path} finalized in {job.latency * 1000:.1f}ms.")
+    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_RESTART_BUFFER):
+        # IMPORTANT
+        # I don't know why, but it seems like stopping and starting replay buffering should be in the separate thread.
+        # Otherwise it can "stuck" on stopping.
+        Thread(target=restart_replay_buffering, daemon=True).start()
+
+    notify(True, path, path_display_mode=path_display_type)
+
+
 def append_clip_exe_history():
     """
     Adds current active executable path in clip exe history.
+    If a capture source of the current scene is hooked to an app, its executable is used without polling the OS.
+
+    This callback is called by the sampler thread (not by OBS).
+
+    :return: ID of the active executable (used by the sampler to detect focus changes).
     """
     with suppress(Exception):
-        pid = get_active_window_pid()
-        exe = get_executable_path(pid)
-        VARIABLES.clip_exe_history.appendleft(exe)
+        exe_id = get_hooked_exe_id()
+        if exe_id is None:
+            exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+        VARIABLES.clip_exe_history.append(exe_id)
+        if exe_id != VARIABLES.last_sampled_exe_id:
+            VARIABLES.last_sampled_exe_id = exe_id
+            VARIABLES.save_plan_dirty = True
+        if VARIABLES.session_log is not None:
+            VARIABLES.session_log.append(exe_id, VARIABLES.exe_registry.paths[exe_id])
+        return exe_id
+
+
+def get_sampling_period() -> float:
+    """
+    Returns active executable sampling period from the script settings (in seconds).
+    """
+    return max(100, obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_SAMPLING_PERIOD)) / 1000
+
+
+def get_max_sampling_period() -> float:
+    """
+    Returns max possible time between two samples (in seconds) with the current settings.
+    """
+    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_ADAPTIVE_SAMPLING):
+        return CONSTANTS.ADAPTIVE_SAMPLING_MAX_PERIOD
+    return get_sampling_period()
+
+
+def start_clip_exe_sampler():
+    """
+    Starts (or restarts) background thread that fills clip exe history.
+    """
+    stop_clip_exe_sampler()
+    VARIABLES.sampler = ForegroundSampler(
+        callback=append_clip_exe_history,
+        period=get_sampling_period(),
+        adaptive=obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_ADAPTIVE_SAMPLING),
+        min_period=CONSTANTS.ADAPTIVE_SAMPLING_MIN_PERIOD,
+        max_period=CONSTANTS.ADAPTIVE_SAMPLING_MAX_PERIOD,
+        backoff=CONSTANTS.ADAPTIVE_SAMPLING_BACKOFF,
+        idle_callback=get_time_since_last_input,
+        idle_threshold=CONSTANTS.ADAPTIVE_SAMPLING_IDLE_THRESHOLD
+    )
+    VARIABLES.sampler.start()
+    _print(f"Exe sampler started. Adaptive={VARIABLES.sampler.adaptive}, period={VARIABLES.sampler.period}s.")
+
+
+def stop_clip_exe_sampler():
+    """
+    Stops background thread that fills clip exe history.
+    """
+    if VARIABLES.sampler is None:
+        return
+
+    VARIABLES.sampler.stop()
+    _print(f"Exe sampler stopped: {VARIABLES.sampler.stats()}.")
+    VARIABLES.sampler = None
+
+
+def open_session_log():
+    """
+    Creates a new session log of active executables (if it's not opened yet) and removes the oldest ones.
+    """
+    if VARIABLES.session_log is not None:
+        return
+
+    folder = CONSTANTS.SESSION_LOGS_FOLDER
+    try:
+        folder.mkdir(parents=True, exist_ok=True)
+        logs = sorted(folder.glob("*.srlog"))
+        for old_log in logs[:max(0, len(logs) - CONSTANTS.SESSION_LOGS_MAX_AMOUNT + 1)]:
+            old_log.unlink()
+            old_log.with_name(old_log.name + ".paths").unlink(missing_ok=True)
+
+        VARIABLES.session_log = SessionLog(folder / f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.srlog")
+        _print(f"Session log opened: {VARIABLES.session_log.path}.")
+    except:
+        _print("An error occurred while opening session log.")
+        _print(traceback.format_exc())
+
+
+def close_session_log():
+    """
+    Closes the current session log and prints the most active executables of the session.
+    """
+    if VARIABLES.session_log is None:
+        return
+
+    session_log, VARIABLES.session_log = VARIABLES.session_log, None
+    session_log.close()
+    try:
+        stats = analyze_session_log(session_log.path, max_gap=max(3.0, get_max_sampling_period() * 2))
+        _print(f"Session log closed: {len(session_log)} samples.")
+        for path, seconds in stats.top():
+            _print(f"    {path}: {seconds / 60:.1f} min.")
+    except:
+        _print("An error occurred while analyzing session log.")
+        _print(traceback.format_exc())
 
 
 def append_video_exe_history():
@@ -63,6 +222,5 @@ def append_video_exe_history():
     Adds current active executable path in video exe history.
     """
     with suppress(Exception):
-        pid = get_active_window_pid()
-        exe = get_executable_path(pid)
-        VARIABLES.video_exe_history[exe] += 1
+        exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+        VARIABLES.video_exe_history[exe_id] += 1
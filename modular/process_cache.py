@@ -0,0 +1,81 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+class ProcessCache:
+    """
+    Cache of executable paths of processes, keyed by process ID.
+
+    Every entry also stores process creation time. Since process IDs are reused by the system,
+    an entry is valid only if the creation time of the process with the same ID matches.
+
+    The last foreground window and its process ID are remembered as well,
+    so while the foreground window doesn't change, nothing has to be resolved again.
+
+    The cache is used from the sampler thread and from OBS thread, so `last` is replaced as a whole tuple
+    and entries are never iterated directly.
+    """
+    def __init__(self):
+        self.entries: dict[int, tuple[int, str]] = {}  # {pid: (creation_time, "path/to/executable")}
+        self.last: tuple[int, int] | None = None  # (window, pid) of the last active window.
+        self.last_sweep: float = 0  # `time.monotonic()` of the last removal of exited processes.
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def last_pid(self) -> int | None:
+        last = self.last
+        return last[1] if last else None
+
+    def get(self, pid: int, creation_time: int) -> str | None:
+        """
+        Returns cached executable path of the process.
+
+        :param pid: Process ID.
+        :param creation_time: Process creation time.
+        :return: Executable path or None, if the process is not cached or PID was reused by another process.
+        """
+        entry = self.entries.get(pid)
+        if entry is None or entry[0] != creation_time:
+            return None
+        return entry[1]
+
+    def put(self, pid: int, creation_time: int, path: str):
+        self.entries[pid] = (creation_time, path)
+
+    def retain(self, alive_pids: set[int]) -> int:
+        """
+        Removes entries of processes that have exited.
+
+        :param alive_pids: IDs of currently running processes.
+        :return: Amount of removed entries.
+        """
+        exited = [pid for pid in list(self.entries) if pid not in alive_pids]
+        for pid in exited:
+            self.entries.pop(pid, None)
+
+        if self.last_pid is not None and self.last_pid not in alive_pids:
+            self.last = None
+        return len(exited)
+
+    def clear(self):
+        self.entries.clear()
+        self.last = None
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{len(self.entries)} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
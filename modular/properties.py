@@ -19,7 +19,9 @@ from .properties_callbacks import (open_github_callback,
                                    export_aliases_to_json_callback,
                                    check_base_path_callback,
                                    check_filename_template_callback,
+                                   check_folder_template_callback,
                                    update_aliases_callback,
+                                   update_rules_callback,
                                    update_links_path_prop_visibility,
                                    check_clips_links_folder_path_callback)
 from .obs_related import get_base_path
@@ -31,6 +33,17 @@ import sys
 variables_tip = """<table>
 <tr><th align='left'>%NAME</th><td> - name of the clip.</td></tr>
 
+<tr><th align='left'>%SCENE</th><td> - name of the current scene.</td></tr>
+
+<tr><th align='left'>%TITLE</th><td> - title of the active window.</td></tr>
+
+<tr><th align='left'>%BUFLEN</th><td> - replay buffer length (in seconds).</td></tr>
+
+<tr><th align='left'>%SEQ</th><td> - clip number (since OBS start).</td></tr>
+
+<tr><th align='left'>%APPS</th><td> - names of the apps that were active most of the time during the clip recording.<br/>
+Example: Game+Discord</td></tr>
+
 <tr><th align='left'>%a</th><td> - Weekday as locale’s abbreviated name.<br/>
 Example: Sun, Mon, …, Sat (en_US); So, Mo, …, Sa (de_DE)</td></tr>
 
@@ -140,6 +153,32 @@ def setup_clip_paths_settings(group_obj):
         name="the name of the current scene;",
         val=ClipNamingModes.CURRENT_SCENE.value
     )
+    obs.obs_property_list_add_int(
+        p=clip_naming_mode_prop,
+        name="the names of apps (.exe file names) that were active most of the time during the clip recording;",
+        val=ClipNamingModes.TOP_PROCESSES.value
+    )
+    obs.obs_property_list_add_int(
+        p=clip_naming_mode_prop,
+        name="the name of a scene that was active most of the time during the clip recording;",
+        val=ClipNamingModes.MOST_RECORDED_SCENE.value
+    )
+
+    obs.obs_properties_add_int_slider(
+        props=group_obj,
+        name=PN.PROP_CLIPS_TOP_APPS_AMOUNT,
+        description="Max apps in the name",
+        min=1, max=5,
+        step=1
+    )
+
+    obs.obs_properties_add_int_slider(
+        props=group_obj,
+        name=PN.PROP_CLIPS_TOP_APPS_MIN_SHARE,
+        description="Min share of the clip for other apps (%)",
+        min=1, max=100,
+        step=1
+    )
 
     t = obs.obs_properties_add_text(
         props=group_obj,
@@ -175,6 +214,24 @@ def setup_clip_paths_settings(group_obj):
         description="Sort clips into folders by application or scene",
     )
 
+    folder_format_prop = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.PROP_CLIPS_FOLDER_TEMPLATE,
+        description="Folder name format",
+        type=obs.OBS_TEXT_DEFAULT
+    )
+    obs.obs_property_set_long_description(
+        folder_format_prop,
+        "Use / to create nested folders, e.g. %NAME/%Y-%m.\n" + variables_tip)
+
+    t = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_CLIPS_FOLDER_TEMPLATE_ERR,
+        description="<font color=\"red\"><pre> Invalid format!</pre></font>",
+        type=obs.OBS_TEXT_INFO
+    )
+    obs.obs_property_set_visible(t, False)
+
     # ----- Create links -----
     create_links_prop = obs.obs_properties_add_bool(
         props=group_obj,
@@ -210,6 +267,7 @@ def setup_clip_paths_settings(group_obj):
     # ----- Callbacks -----
     obs.obs_property_set_modified_callback(base_path_prop, check_base_path_callback)
     obs.obs_property_set_modified_callback(filename_format_prop, check_filename_template_callback)
+    obs.obs_property_set_modified_callback(folder_format_prop, check_folder_template_callback)
     obs.obs_property_set_modified_callback(create_links_prop, update_links_path_prop_visibility)
     obs.obs_property_set_modified_callback(links_path_prop, check_clips_links_folder_path_callback)
 
@@ -370,7 +428,12 @@ def setup_aliases_settings(group_obj):
         description="Executable (.exe) files often have names that don't match the actual game title "
                     "(e.g., the game is called Deadlock, but the .exe file is named project8.exe)."
                     "You can create an alias for the executable file or folder. "
-                    "Smart Replays will use this alias for renaming, rather than the .exe file name.",
+                    "Smart Replays will use this alias for renaming, rather than the .exe file name.\n"
+                    "Instead of a path you can use an executable name (valorant.exe), "
+                    "a glob (* - any characters within a folder name, ** - any characters, ? - any character) "
+                    "or a regex with re: prefix. Values captured by a regex can be used in the alias: {1} or {name}. "
+                    "More in the README.\n"
+                    "Example: re:.*\\\\(\\w+)-Win64-Shipping\\.exe > {1}",
         type=obs.OBS_TEXT_INFO
     )
 
@@ -401,6 +464,7 @@ def setup_aliases_settings(group_obj):
     <div style="font-size: 14px">
     <span style="color: red">Invalid format.<br></span>
     <span style="color: orange">Required format: DISK:\\path\\to\\folder\\or\\executable > ClipName<br></span>
+    <span style="color: orange">Glob or regex (re:) path must be valid, regex global flags are allowed only at its start.<br></span>
     <span style="color: lightgreen">Example: C:\\Program Files\\Minecraft > Minecraft</span>
     </div>""",
         type=obs.OBS_TEXT_INFO
@@ -464,6 +528,62 @@ def setup_aliases_settings(group_obj):
     obs.obs_property_set_modified_callback(aliases_list, update_aliases_callback)
 
 
+def setup_rules_settings(group_obj):
+    obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_RULES_DESC,
+        description="Clip rules override naming mode, file name template, folder and links "
+                    "for individual apps (same format as aliases) or scenes (scene:SceneName). "
+                    "If both app and scene rules match, the scene rule takes precedence. "
+                    "Hotkeys naming modes take precedence over rules.",
+        type=obs.OBS_TEXT_INFO
+    )
+
+    err_text_1 = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_RULES_INVALID_FORMAT,
+        description="""
+    <div style="font-size: 14px">
+    <span style="color: red">Invalid rule.<br></span>
+    <span style="color: orange">Required format: app or scene:SceneName > key=value; key=value<br>
+    Keys: mode (active, most-recorded, scene, top-apps, most-recorded-scene), template, folder (template or off), links (on, off).<br></span>
+    <span style="color: lightgreen">Example: scene:Ranked > template=%NAME_ranked_%d.%m.%Y_%H-%M-%S; folder=Ranked/%NAME</span>
+    </div>""",
+        type=obs.OBS_TEXT_INFO
+    )
+
+    err_text_2 = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_RULES_TARGET_EXISTS,
+        description="""<div style="font-size: 14px; color: red">This app / scene already has a rule.</div>""",
+        type=obs.OBS_TEXT_INFO
+    )
+
+    obs.obs_property_set_visible(err_text_1, False)
+    obs.obs_property_set_visible(err_text_2, False)
+
+    rules_list = obs.obs_properties_add_editable_list(
+        props=group_obj,
+        name=PN.PROP_RULES_LIST,
+        description="",
+        type=obs.OBS_EDITABLE_LIST_TYPE_STRINGS,
+        filter=None,
+        default_path=None
+    )
+
+    t = obs.obs_properties_add_text(
+        props=group_obj,
+        name="rules_format",
+        description="Format:  app or scene:SceneName > key=value; key=value\n"
+                    "Example: C:\\Windows\\explorer.exe > links=off",
+        type=obs.OBS_TEXT_INFO
+    )
+    obs.obs_property_text_set_info_type(t, obs.OBS_TEXT_INFO_WARNING)
+
+    # ----- Callbacks -----
+    obs.obs_property_set_modified_callback(rules_list, update_rules_callback)
+
+
 def setup_other_settings(group_obj):
     obs.obs_properties_add_text(
         props=group_obj,
@@ -488,6 +608,32 @@ To disable scheduled restarts, set the value to 0.""",
         description="Restart replay buffer after clip saving"
     )
 
+    obs.obs_properties_add_int(
+        props=group_obj,
+        name=PN.PROP_SAMPLING_PERIOD,
+        description="Check active app every (ms)",
+        min=100, max=5000,
+        step=100
+    )
+
+    obs.obs_properties_add_bool(
+        props=group_obj,
+        name=PN.PROP_ADAPTIVE_SAMPLING,
+        description="Adaptive active app checking (more often after app switching, less often while playing or idle)"
+    )
+
+    obs.obs_properties_add_bool(
+        props=group_obj,
+        name=PN.PROP_USE_CAPTURE_HOOKS,
+        description="Use the app captured by Game / Window Capture instead of the active window"
+    )
+
+    obs.obs_properties_add_bool(
+        props=group_obj,
+        name=PN.PROP_SESSION_LOG,
+        description="Keep session log of active apps (survives OBS crashes, stored in the script's folder, last 30 kept)"
+    )
+
 
 def script_properties():
     p = obs.obs_properties_create()  # main properties object
@@ -511,6 +657,7 @@ def script_properties():
     notification_gr = obs.obs_properties_create()
     popup_gr = obs.obs_properties_create()
     aliases_gr = obs.obs_properties_create()
+    rules_gr = obs.obs_properties_create()
     other_gr = obs.obs_properties_create()
 
     obs.obs_properties_add_group(p, PN.GR_CLIPS_PATH_SETTINGS, "Clip path settings", obs.OBS_GROUP_NORMAL, clip_path_gr)
@@ -518,6 +665,7 @@ def script_properties():
     obs.obs_properties_add_group(p, PN.GR_SOUND_NOTIFICATION_SETTINGS, "Sound notifications", obs.OBS_GROUP_CHECKABLE, notification_gr)
     obs.obs_properties_add_group(p, PN.GR_POPUP_NOTIFICATION_SETTINGS, "Popup notifications", obs.OBS_GROUP_CHECKABLE, popup_gr)
     obs.obs_properties_add_group(p, PN.GR_ALIASES_SETTINGS, "Aliases", obs.OBS_GROUP_NORMAL, aliases_gr)
+    obs.obs_properties_add_group(p, PN.GR_RULES_SETTINGS, "Clip rules", obs.OBS_GROUP_NORMAL, rules_gr)
     obs.obs_properties_add_group(p, PN.GR_OTHER_SETTINGS, "Other", obs.OBS_GROUP_NORMAL, other_gr)
 
     # ------ Setup properties ------
@@ -526,6 +674,7 @@ def script_properties():
     setup_notifications_settings(notification_gr)
     setup_popup_notification_settings(popup_gr)
     setup_aliases_settings(aliases_gr)
+    setup_rules_settings(rules_gr)
     setup_other_settings(other_gr)
 
     return p
\ No newline at end of file
@@ -14,9 +14,9 @@
 
 from .exceptions import *
 from .globals import VARIABLES, CONSTANTS, PN
-from .clipname_gen import gen_filename
+from .clipname_gen import check_clip_template
 from .obs_related import get_base_path
-from .script_helpers import load_aliases
+from .script_helpers import load_aliases, load_rules
 
 from datetime import datetime
 from pathlib import Path
@@ -88,6 +88,42 @@ def update_aliases_callback(p, prop, data):
     return True
 
 
+def update_rules_callback(p, prop, data):
+    """
+    Checks the list of clip rules and updates rules menu (shows / hides error texts).
+    Invalid rule is removed from the list.
+    """
+    invalid_format_err_text = obs.obs_properties_get(p, PN.TXT_RULES_INVALID_FORMAT)
+    target_exists_err_text = obs.obs_properties_get(p, PN.TXT_RULES_TARGET_EXISTS)
+
+    settings_json: dict = json.loads(obs.obs_data_get_json(data))
+    if not settings_json:
+        return False
+
+    try:
+        load_rules(settings_json)
+        obs.obs_property_set_visible(invalid_format_err_text, False)
+        obs.obs_property_set_visible(target_exists_err_text, False)
+        return True
+
+    except RuleParsingError as e:
+        obs.obs_property_set_visible(invalid_format_err_text, isinstance(e, RuleInvalidFormat))
+        obs.obs_property_set_visible(target_exists_err_text, isinstance(e, RuleTargetAlreadyExists))
+        index = e.index
+
+    # If error in parsing
+    settings_json[PN.PROP_RULES_LIST].pop(index)
+    new_rules_array = obs.obs_data_array_create()
+
+    for index, rule in enumerate(settings_json[PN.PROP_RULES_LIST]):
+        rule_data = obs.obs_data_create_from_json(json.dumps(rule))
+        obs.obs_data_array_insert(new_rules_array, index, rule_data)
+
+    obs.obs_data_set_array(data, PN.PROP_RULES_LIST, new_rules_array)
+    obs.obs_data_array_release(new_rules_array)
+    return True
+
+
 def check_filename_template_callback(p, prop, data):
     """
     Checks filename template.
@@ -95,11 +131,20 @@ def check_filename_template_callback(p, prop, data):
     """
     error_text = obs.obs_properties_get(p, PN.TXT_CLIPS_FILENAME_TEMPLATE_ERR)
 
-    try:
-        gen_filename("clipname", obs.obs_data_get_string(data, PN.PROP_CLIPS_FILENAME_TEMPLATE))
-        obs.obs_property_set_visible(error_text, False)
-    except:
-        obs.obs_property_set_visible(error_text, True)
+    template = obs.obs_data_get_string(data, PN.PROP_CLIPS_FILENAME_TEMPLATE)
+    obs.obs_property_set_visible(error_text, not check_clip_template(template))
+    return True
+
+
+def check_folder_template_callback(p, prop, data):
+    """
+    Checks clips folder template.
+    If template is invalid, shows warning.
+    """
+    error_text = obs.obs_properties_get(p, PN.TXT_CLIPS_FOLDER_TEMPLATE_ERR)
+
+    template = obs.obs_data_get_string(data, PN.PROP_CLIPS_FOLDER_TEMPLATE)
+    obs.obs_property_set_visible(error_text, not check_clip_template(template, folder=True))
     return True
 
 
@@ -0,0 +1,136 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from .aliases import AliasMatcher
+
+from pathlib import Path
+
+
+class ClipRule:
+    """
+    Overrides of clip settings. `None` means that the setting is not overridden.
+    """
+    __slots__ = ("mode", "template", "save_to_folder", "folder_template", "create_links")
+
+    def __init__(self,
+                 mode: int | None = None,
+                 template: str | None = None,
+                 save_to_folder: bool | None = None,
+                 folder_template: str | None = None,
+                 create_links: bool | None = None):
+        """
+        :param mode: Clip naming mode (`ClipNamingModes` value).
+        :param template: Clip filename template.
+        :param save_to_folder: Save clip to a folder.
+        :param folder_template: Clip folder template.
+        :param create_links: Create hard link of the clip.
+        """
+        self.mode = mode
+        self.template = template
+        self.save_to_folder = save_to_folder
+        self.folder_template = folder_template
+        self.create_links = create_links
+
+    def __repr__(self) -> str:
+        overrides = ", ".join(f"{i}={getattr(self, i)!r}" for i in self.__slots__ if getattr(self, i) is not None)
+        return f"ClipRule({overrides})"
+
+    def merged(self, other: "ClipRule | None") -> "ClipRule":
+        """
+        Returns a new rule with overrides of this rule, overridden by overrides of the `other` rule.
+        """
+        if other is None:
+            return self
+        return ClipRule(*(getattr(self, i) if getattr(other, i) is None else getattr(other, i)
+                          for i in self.__slots__))
+
+
+class ClipRules:
+    """
+    Per-app and per-scene clip rules compiled into a dispatch table.
+
+    App rules targets have the same format as aliases paths (executable / folder path, executable name,
+    glob or regex, see `AliasMatcher`), scene rules are matched by the exact scene name.
+    If both app and scene rules match, scene rule overrides app rule.
+
+    A lookup is a dict lookup of the executable ID (app rules are resolved once per executable
+    until rules are reloaded) and a dict lookup of the scene name, so it doesn't depend on the amount of rules.
+    """
+    def __init__(self):
+        self.app_rules: list[ClipRule] = []
+        self.apps = AliasMatcher()  # Alias of the target is the index of the rule in `app_rules`.
+        self.scenes: dict[str, ClipRule] = {}  # {scene name: rule}
+        self.resolved: dict[int, ClipRule | None] = {}  # {exe_id: app rule}
+
+    def __len__(self) -> int:
+        return len(self.app_rules) + len(self.scenes)
+
+    @property
+    def has_app_rules(self) -> bool:
+        return bool(self.app_rules)
+
+    @property
+    def has_scene_rules(self) -> bool:
+        return bool(self.scenes)
+
+    def add_app_rule(self, target: str, rule: ClipRule) -> bool:
+        """
+        Adds an app rule. Returns False if there is already a rule for the target.
+        Raises `re.error` if the target is an invalid regex.
+        App rules are not matched until `compile` is called.
+
+        :param target: Executable path, folder path, executable name, glob or regex (with `re:` prefix).
+        :param rule: Rule.
+        """
+        if not self.apps.add(target, str(len(self.app_rules))):
+            return False
+        self.app_rules.append(rule)
+        return True
+
+    def add_scene_rule(self, scene: str, rule: ClipRule) -> bool:
+        """
+        Adds a scene rule. Returns False if there is already a rule for the scene.
+
+        :param scene: Scene name.
+        :param rule: Rule.
+        """
+        if scene in self.scenes:
+            return False
+        self.scenes[scene] = rule
+        return True
+
+    def compile(self):
+        self.apps.compile()
+        self.resolved.clear()
+
+    def find(self, exe_id: int | None, executable_path: str | Path | None, scene: str | None) -> ClipRule | None:
+        """
+        Returns rule of the app and scene (merged, if both have rules) or None if there are no rules for them.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param executable_path: Executable path.
+        :param scene: Scene name.
+        """
+        app_rule = None
+        if exe_id is not None and self.app_rules:
+            try:
+                app_rule = self.resolved[exe_id]
+            except KeyError:
+                index = self.apps.find(executable_path)
+                app_rule = self.resolved[exe_id] = self.app_rules[int(index)] if index is not None else None
+
+        scene_rule = self.scenes.get(scene) if scene is not None else None
+        if app_rule is None:
+            return scene_rule
+        return app_rule.merged(scene_rule)
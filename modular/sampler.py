@@ -0,0 +1,124 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from threading import Thread, Event
+from contextlib import suppress
+import time
+
+
+class ForegroundSampler(Thread):
+    """
+    Background thread that calls the sampling callback.
+
+    OBS runs script timers on its graphics thread, so sampling in `obs.timer_add` callbacks
+    competes with frame rendering. This thread uses monotonic clock and doesn't accumulate
+    a drift: if a tick was missed, the next one is scheduled from the current time.
+
+    In fixed mode the callback is called every `period` seconds.
+    In adaptive mode the period drops to `min_period` right after the sampled value changes
+    (focus change), and then grows by `backoff` times on every sample with the same value
+    up to `max_period`. If user is idle for `idle_threshold` seconds, `max_period` is used at once.
+    """
+    def __init__(self,
+                 callback,
+                 period: float,
+                 adaptive: bool = False,
+                 min_period: float = 0.25,
+                 max_period: float = 4,
+                 backoff: float = 1.5,
+                 idle_callback=None,
+                 idle_threshold: float = 30):
+        """
+        :param callback: Function without parameters that takes a sample and returns sampled value
+            (used to detect changes in adaptive mode).
+        :param period: Sampling period in seconds (fixed mode).
+        :param adaptive: Use adaptive sampling period.
+        :param min_period: Min sampling period in seconds (adaptive mode).
+        :param max_period: Max sampling period in seconds (adaptive mode).
+        :param backoff: Period multiplier for every sample without changes (adaptive mode).
+        :param idle_callback: Function without parameters that returns user idle time in seconds (adaptive mode).
+        :param idle_threshold: Idle time in seconds after which `max_period` is used (adaptive mode).
+        """
+        super().__init__(name="SmartReplaysSampler", daemon=True)
+        self.callback = callback
+        self.period = period
+        self.adaptive = adaptive
+        self.min_period = min_period
+        self.max_period = max_period
+        self.backoff = backoff
+        self.idle_callback = idle_callback
+        self.idle_threshold = idle_threshold
+
+        self.samples_amount = 0
+        self.cpu_time = 0.0  # CPU time consumed by this thread (in seconds).
+        self.started_at: float | None = None
+        self._last_value = None
+        self._stop_event = Event()
+
+    def run(self):
+        self.started_at = time.monotonic()
+        cpu_started_at = time.thread_time()
+        next_tick = self.started_at
+        period = self.min_period if self.adaptive else self.period
+
+        while not self._stop_event.is_set():
+            value = None
+            with suppress(Exception):
+                value = self.callback()
+            self.samples_amount += 1
+            period = self._get_next_period(value, period)
+            self.cpu_time = time.thread_time() - cpu_started_at
+
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick, delay = time.monotonic(), 0
+            self._stop_event.wait(delay)
+
+    def stop(self, timeout: float | None = 2):
+        """
+        Stops the thread and waits for it to finish.
+
+        :param timeout: Max time to wait in seconds.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self) -> str:
+        """
+        Returns sampling statistics (polls and CPU time per hour) as a string.
+        """
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0
+        hours = elapsed / 3600 or 1
+        return (f"mode={'adaptive' if self.adaptive else 'fixed'}, {self.samples_amount} polls in {elapsed:.0f}s "
+                f"({self.samples_amount / hours:.0f} polls/h), "
+                f"CPU time {self.cpu_time * 1000:.1f}ms ({self.cpu_time * 1000 / hours:.1f}ms/h)")
+
+    def _get_next_period(self, value, period: float) -> float:
+        if not self.adaptive:
+            return self.period
+
+        if value != self._last_value:
+            self._last_value = value
+            return self.min_period
+
+        if period >= self.max_period:
+            return self.max_period
+
+        if self.idle_callback is not None:
+            with suppress(Exception):
+                if self.idle_callback() >= self.idle_threshold:
+                    return self.max_period
+        return min(period * self.backoff, self.max_period)
@@ -13,47 +13,310 @@
 #  GNU Affero General Public License for more details.
 
 from .globals import VARIABLES, CONSTANTS, PN, ClipNamingModes
-from .obs_related import get_last_replay_file_name, get_base_path
-from .clipname_gen import gen_clip_base_name, gen_filename, ensure_unique_filename
+from .obs_related import get_last_replay_file_name, get_base_path, get_clip_span_until, get_current_scene_name
+from .clipname_gen import (gen_clip_base_name, compile_clip_template, gen_template_values,
+                           get_clip_settings, get_current_exe_id, get_exe_display_name, reserve_clip_seq)
 from .tech import _print, create_hard_link
+from .save_request import SaveRequest
+from .rules import ClipRule
+from .templates import ClipTemplate
 
 from pathlib import Path
+from datetime import datetime
 import obspython as obs
+import traceback
+import time
 import os
 
 
-def move_clip_file(mode: ClipNamingModes | None = None) -> tuple[str, Path]:
+def prepare_save_request(mode: ClipNamingModes | None = None,
+                         clip_span: tuple[float, float] | None = None,
+                         use_plan: bool = True,
+                         seq: int | None = None,
+                         render: bool = True) -> SaveRequest:
+    """
+    Captures clip naming inputs (app, scene, exe history) and generates the clip destination.
+    If the save plan is valid for the current app, scene and naming mode, its name and folder are reused.
+
+    :param mode: Clip naming mode. If None, the mode is taken from the clip settings.
+    :param clip_span: Start and end timestamps of the clip. If None, the clip is considered to end right now.
+    :param use_plan: Reuse the save plan (see `refresh_save_plan`).
+    :param seq: Clip number (%SEQ). If None, the next number is reserved (see `reserve_clip_seq`).
+    :param render: Render the destination right away. If False, it's rendered later (see `render_save_request`).
+    """
+    ts = time.time()
+    clip_span = get_clip_span_until(ts) if clip_span is None else clip_span
+    seq = reserve_clip_seq() if seq is None else seq
+    if use_plan and (plan := get_save_plan(mode)) is not None:
+        return request_from_plan(plan, mode, ts, clip_span, seq)
+
+    clip_settings = get_clip_settings()
+    clip_name = gen_clip_base_name(clip_settings.mode if mode is None else mode, clip_span=clip_span)
+    templates = compile_clip_templates(clip_settings)
+    return create_save_request(mode, ts, clip_span, clip_settings, clip_name, templates, seq, render)
+
+
+def compile_clip_templates(clip_settings: ClipRule) -> list[ClipTemplate]:
+    """
+    Returns compiled file name template and folder template (if clip is saved to a folder).
+
+    :param clip_settings: Clip settings.
+    """
+    templates = [compile_clip_template(clip_settings.template)]
+    if clip_settings.save_to_folder:
+        templates.append(compile_clip_template(clip_settings.folder_template, folder=True))
+    return templates
+
+
+def create_save_request(mode: ClipNamingModes | None,
+                        ts: float,
+                        clip_span: tuple[float, float] | None,
+                        clip_settings: ClipRule,
+                        clip_name: str,
+                        templates: list[ClipTemplate],
+                        seq: int,
+                        render: bool = True) -> SaveRequest:
+    """
+    Generates the templates values and creates save request.
+
+    :param mode: Forced clip naming mode or None.
+    :param ts: Request timestamp.
+    :param clip_span: Start and end timestamps of the clip.
+    :param clip_settings: Clip settings.
+    :param clip_name: Base name of the clip.
+    :param templates: Compiled templates (see `compile_clip_templates`).
+    :param seq: Clip number (%SEQ).
+    :param render: Render the destination right away (see `render_save_request`).
+    """
+    request = SaveRequest(mode=None if mode is None else ClipNamingModes(mode).value,
+                          ts=ts,
+                          clip_span=clip_span,
+                          clip_settings=clip_settings,
+                          clip_name=clip_name,
+                          values=gen_template_values(clip_name, templates, clip_span, seq),
+                          templates=templates,
+                          base_folder=Path(get_base_path(script_settings=VARIABLES.script_settings)))
+    if render:
+        render_save_request(request)
+    return request
+
+
+def render_save_request(request: SaveRequest):
+    """
+    Renders the destination folder and file name of the save request from its templates and values.
+    Doesn't use OBS API, so it can be run by `ClipFinalizer` workers.
+
+    :param request: Save request.
+    """
+    dt = datetime.fromtimestamp(request.ts)
+    request.folder = request.base_folder
+    if len(request.templates) > 1:
+        request.folder = request.folder.joinpath(*request.templates[1].render_parts(request.values, dt))
+    request.filename = request.templates[0].render(request.values, dt)
+
+
+def request_from_plan(plan: SaveRequest,
+                      mode: ClipNamingModes | None,
+                      ts: float,
+                      clip_span: tuple[float, float],
+                      seq: int) -> SaveRequest:
+    """
+    Creates save request from the save plan: only date parts and %SEQ of the templates are rendered again.
+
+    :param plan: Valid save plan.
+    :param mode: Forced clip naming mode or None.
+    :param ts: Request timestamp.
+    :param clip_span: Start and end timestamps of the clip.
+    :param seq: Clip number (%SEQ).
+    """
+    values = plan.values
+    if "SEQ" in values:
+        values = dict(values, SEQ=str(seq))
+    request = SaveRequest(mode=None if mode is None else ClipNamingModes(mode).value,
+                          ts=ts,
+                          clip_span=clip_span,
+                          clip_settings=plan.clip_settings,
+                          clip_name=plan.clip_name,
+                          values=values,
+                          templates=plan.templates,
+                          base_folder=plan.base_folder)
+    render_save_request(request)
+    request.folder_exists = plan.folder_exists and request.folder == plan.folder
+    return request
+
+
+def get_save_plan_key() -> tuple[int, str]:
+    """
+    Returns inputs the save plan depends on (besides settings and aliases, which mark the plan as dirty).
+    """
+    return get_current_exe_id(), get_current_scene_name()
+
+
+def get_save_plan(mode: ClipNamingModes | None = None) -> SaveRequest | None:
+    """
+    Returns the save plan if it's up-to-date and generated for the same naming mode, otherwise returns None.
+
+    :param mode: Clip naming mode. If None, the mode from the clip settings of the plan is used.
+    """
+    plan = VARIABLES.save_plan
+    if plan is None or VARIABLES.save_plan_dirty:
+        return None
+    if mode is not None and ClipNamingModes(mode).value != plan.clip_settings.mode:
+        return None
+    if plan.key != get_save_plan_key():
+        return None
+    return plan
+
+
+def refresh_save_plan():
+    """
+    Generates the clip destination for the current app and scene in advance (see `gen_save_plan`).
+    """
+    VARIABLES.save_plan_dirty = False
+    VARIABLES.save_plan = None
+    try:
+        VARIABLES.save_plan = gen_save_plan()
+    except:
+        _print("An error occurred while generating the save plan.")
+        _print(traceback.format_exc())
+        return
+    _print(f"Save plan refreshed: {VARIABLES.save_plan or 'not used for the current clip settings'}.")
+
+
+def gen_save_plan() -> SaveRequest | None:
+    """
+    Returns the clip destination for the current app and scene.
+    Returns None if the destination depends on something other than the current app and scene
+    (exe history, window title), such clips are named on demand.
+    The folder is not created here, only by the first save with the plan (see `move_clip_file`).
+    """
+    key = get_save_plan_key()
+    clip_settings = get_clip_settings(log=False)
+    if clip_settings.mode not in CONSTANTS.SAVE_PLAN_MODES:
+        return None
+    templates = compile_clip_templates(clip_settings)
+    if any(template.variables & CONSTANTS.SAVE_PLAN_VOLATILE_VARIABLES for template in templates):
+        return None
+
+    if clip_settings.mode == ClipNamingModes.CURRENT_PROCESS.value:
+        clip_name = get_exe_display_name(key[0], log=False)
+    else:
+        clip_name = key[1]
+    plan = create_save_request(None, time.time(), None, clip_settings, clip_name, templates, VARIABLES.clips_seq + 1)
+    if key != get_save_plan_key():  # Focus changed while the plan was generated.
+        return None
+    plan.key = key
+    return plan
+
+
+def reset_save_plan():
+    """
+    Drops the save plan, it's generated again on the next refresh.
+    """
+    VARIABLES.save_plan = None
+    VARIABLES.save_plan_dirty = True
+
+
+def prepare_clip_finalization(mode: ClipNamingModes | None = None) -> tuple:
+    """
+    Captures everything needed to finalize the last saved clip (see `finalize_clip`): the save request,
+    the saved clip path and the links folder.
+    If there is no pending save request, the save plan is used. If the plan is not valid either,
+    a new request is created: clip settings, base name, base folder and templates values are resolved here
+    (the clip is considered to end right now, OBS has just written it), only its rendering is left for the worker.
+    Uses OBS API, so it must be called on the main thread.
+
+    :param mode: Clip naming mode (used only if there is no pending save request).
+    """
     old_file_path = get_last_replay_file_name()
     _print(f"Old clip file path: {old_file_path}")
+    links_folder = obs.obs_data_get_string(VARIABLES.script_settings, PN.PROP_CLIPS_LINKS_FOLDER_PATH)
 
-    clip_name = gen_clip_base_name(mode)
-    ext = old_file_path.split(".")[-1]
-    filename_template = obs.obs_data_get_string(VARIABLES.script_settings,
-                                                PN.PROP_CLIPS_FILENAME_TEMPLATE)
-    filename = gen_filename(clip_name, filename_template) + f".{ext}"
+    if (request := take_save_request()) is not None:
+        _print(f"Clip destination was generated {request.age():.2f}s before saving.")
+    elif (plan := get_save_plan(mode)) is not None:
+        ts = time.time()
+        request = request_from_plan(plan, mode, ts, get_clip_span_until(ts), reserve_clip_seq())
+    else:
+        request = prepare_save_request(mode, use_plan=False, render=False)
+    return request, old_file_path, links_folder
 
-    new_folder = Path(get_base_path(script_settings=VARIABLES.script_settings))
-    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_CLIPS_SAVE_TO_FOLDER):
-        new_folder = new_folder / clip_name
 
-    os.makedirs(str(new_folder), exist_ok=True)
-    new_path = new_folder / filename
-    new_path = ensure_unique_filename(new_path)
-    _print(f"New clip file path: {new_path}")
+def finalize_clip(request: SaveRequest, old_file_path: str, links_folder: str) -> tuple[str, Path, Path]:
+    """
+    Renders the clip destination (if it's not rendered yet) and moves the clip.
+    Run by `ClipFinalizer` workers, arguments are taken from `prepare_clip_finalization`.
+    Doesn't use OBS API and doesn't touch the save plan (it's updated by `finish_clip_saving` on the main thread).
+
+    :param request: Save request.
+    :param old_file_path: Saved clip path.
+    :param links_folder: Folder for the hard link (used if it's enabled in the clip settings).
+    :return: Base name of the clip, its new path and its folder (which exists now).
+    """
+    if request.filename is None:
+        render_save_request(request)
+    return move_clip_file(request, old_file_path, links_folder if request.clip_settings.create_links else None)
 
-    os.rename(old_file_path, str(new_path))
-    _print("Clip file successfully moved.")
-    os.utime(new_folder)
 
-    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_CLIPS_CREATE_LINKS):
-        links_folder = obs.obs_data_get_string(VARIABLES.script_settings, PN.PROP_CLIPS_LINKS_FOLDER_PATH)
+def move_clip_file(request: SaveRequest,
+                   old_file_path: str,
+                   links_folder: str | None = None) -> tuple[str, Path, Path]:
+    """
+    Moves the saved clip to its destination and creates its hard link.
+    Doesn't use OBS API and doesn't touch the save plan, so it can be run by `ClipFinalizer` workers.
+
+    :param request: Save request with the rendered destination.
+    :param old_file_path: Saved clip path.
+    :param links_folder: Folder for the hard link. If None, the link is not created.
+    :return: Base name of the clip, its new path and its folder (which exists now).
+    """
+    ext = old_file_path.split(".")[-1]
+
+    if not request.folder_exists:
+        os.makedirs(str(request.folder), exist_ok=True)
+    try:
+        new_path = VARIABLES.unique_names.move(old_file_path, request.folder, request.filename, ext)
+    except FileNotFoundError:
+        if not os.path.exists(old_file_path):
+            raise
+        # Folder of the plan was removed after the previous save.
+        os.makedirs(str(request.folder), exist_ok=True)
+        new_path = VARIABLES.unique_names.move(old_file_path, request.folder, request.filename, ext)
+    _print(f"Clip file successfully moved: {new_path}.")
+    os.utime(request.folder)
+
+    if links_folder is not None:
         create_hard_link(new_path, links_folder)
-    return clip_name, new_path
+    return request.clip_name, new_path, request.folder
+
+
+def mark_plan_folder_created(folder: Path):
+    """
+    Marks the save plan folder as existing if the clip was moved into it,
+    so the next saves with the plan skip creating the folder.
+    Must be called on the main thread.
+
+    :param folder: Folder of the finalized clip.
+    """
+    if (plan := VARIABLES.save_plan) is not None and plan.folder == folder:
+        plan.folder_exists = True
+
+
+def take_save_request() -> SaveRequest | None:
+    """
+    Returns and resets the pending save request. Returns None if there is no request or it's outdated.
+    """
+    request, VARIABLES.save_request = VARIABLES.save_request, None
+    if request is not None and request.age() > CONSTANTS.SAVE_REQUEST_TIMEOUT:
+        _print(f"{request} is outdated, the clip destination will be generated again.")
+        return None
+    return request
 
 
 def save_buffer_with_force_mode(mode: ClipNamingModes):
     """
     Sends a request to save the replay buffer and setting a specific clip naming mode.
+    The clip destination is generated right away (see `SaveRequest`), only renaming is left for the saved event.
     Can only be called using hotkeys.
     """
     if not obs.obs_frontend_replay_buffer_active():
@@ -64,4 +327,11 @@ def save_buffer_with_force_mode(mode: ClipNamingModes):
 
     CONSTANTS.CLIPS_FORCE_MODE_LOCK.acquire()
     VARIABLES.force_mode = mode
+    try:
+        VARIABLES.save_request = prepare_save_request(mode)
+        _print(f"Clip destination generated: {VARIABLES.save_request}.")
+    except:
+        VARIABLES.save_request = None
+        _print("An error occurred while generating the clip destination, it will be generated after saving.")
+        _print(traceback.format_exc())
     obs.obs_frontend_replay_buffer_save()
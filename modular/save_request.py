@@ -0,0 +1,90 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from .rules import ClipRule
+from .templates import ClipTemplate
+
+from pathlib import Path
+import time
+
+
+class SaveRequest:
+    """
+    Clip naming inputs and results captured at the moment of the save request (e.g. hotkey press).
+
+    The clip destination is generated before OBS writes the clip file, so it's based on the app, scene
+    and exe history at the moment the user asked to save the clip (not after OBS finished writing it,
+    when the user may have already switched to another app), and only the file renaming is left
+    for the moment the clip is saved.
+    The file extension is known only after saving, so `filename` has no extension.
+
+    The same class is used for the save plan: the destination generated in advance for the current app and scene.
+    A plan is reused while its `key` (the inputs it was generated for) matches the current ones, only the date parts
+    of the templates are rendered again.
+    """
+    __slots__ = ("mode", "ts", "clip_span", "clip_settings", "clip_name", "folder", "filename",
+                 "values", "templates", "base_folder", "key", "folder_exists")
+
+    def __init__(self,
+                 mode: int | None,
+                 ts: float,
+                 clip_span: tuple[float, float],
+                 clip_settings: ClipRule,
+                 clip_name: str,
+                 folder: Path | None = None,
+                 filename: str | None = None,
+                 values: dict[str, str] | None = None,
+                 templates: list[ClipTemplate] | None = None,
+                 base_folder: Path | None = None,
+                 key: tuple | None = None,
+                 folder_exists: bool = False):
+        """
+        :param mode: Forced clip naming mode (`ClipNamingModes` value) or None.
+        :param ts: Request timestamp (`time.time()`).
+        :param clip_span: Start and end timestamps of the clip.
+        :param clip_settings: Clip settings the destination was generated with.
+        :param clip_name: Base name of the clip.
+        :param folder: Destination folder (None until rendered, see `render_save_request`).
+        :param filename: Destination file name without extension (None until rendered).
+        :param values: Templates variables values.
+        :param templates: Compiled filename template and folder template (if clip is saved to a folder).
+        :param base_folder: Clips base folder.
+        :param key: Inputs the destination depends on (`(exe_id, scene_name)`) or None if it can't be reused.
+        :param folder_exists: Destination folder is known to exist.
+        """
+        self.mode = mode
+        self.ts = ts
+        self.clip_span = clip_span
+        self.clip_settings = clip_settings
+        self.clip_name = clip_name
+        self.folder = folder
+        self.filename = filename
+        self.values = values or {}
+        self.templates = templates or []
+        self.base_folder = base_folder
+        self.key = key
+        self.folder_exists = folder_exists
+
+    def __repr__(self) -> str:
+        if self.filename is None:
+            return f"SaveRequest(clip_name={self.clip_name!r}, path=None)"
+        return f"SaveRequest(clip_name={self.clip_name!r}, path={str(self.folder / self.filename)!r})"
+
+    def age(self, now: float | None = None) -> float:
+        """
+        Returns seconds passed since the request.
+
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        return (time.time() if now is None else now) - self.ts
@@ -14,15 +14,20 @@
 
 from .globals import (VARIABLES, CONSTANTS, PN)
 
-from .exceptions import AliasInvalidFormat, AliasInvalidCharacters, AliasPathAlreadyExists
+from .exceptions import (AliasInvalidFormat, AliasInvalidCharacters, AliasPathAlreadyExists,
+                         RuleInvalidFormat, RuleTargetAlreadyExists)
 from .globals import ConfigTypes, PopupPathDisplayModes
 from .obs_related import get_obs_config
 from .tech import play_sound, _print
+from .aliases import AliasMatcher
+from .rules import ClipRule, ClipRules
+from .templates import ClipTemplate
 
 from pathlib import Path
 import os
 import obspython as obs
 import subprocess
+import re
 
 
 def notify(success: bool, clip_path: Path, path_display_mode: PopupPathDisplayModes):
@@ -58,7 +63,8 @@ def notify(success: bool, clip_path: Path, path_display_mode: PopupPathDisplayMo
 
 def load_aliases(script_settings_dict: dict):
     """
-    Loads aliases to `VARIABLES.aliases`.
+    Loads aliases to `VARIABLES.aliases` and compiles `VARIABLES.alias_matcher` from them.
+    Alias path can be an executable / folder path, an executable name, a glob or a regex (see `AliasMatcher`).
     Raises exception if path or name are invalid.
 
     :param script_settings_dict: Script settings as dict.
@@ -66,26 +72,112 @@ def load_aliases(script_settings_dict: dict):
     _print("Loading aliases...")
 
     new_aliases = {}
+    new_alias_matcher = AliasMatcher(CONSTANTS.FILENAME_PROHIBITED_CHARS)
     aliases_list = script_settings_dict.get(PN.PROP_ALIASES_LIST)
     if aliases_list is None:
         aliases_list = CONSTANTS.DEFAULT_ALIASES
 
     for index, i in enumerate(aliases_list):
         value = i.get("value")
-        spl = value.split(">", 1)
+        spl = value.rsplit(">", 1)  # Alias name can't contain ">", but globs and regexes can.
         try:
             path, name = spl[0].strip(), spl[1].strip()
         except IndexError:
             raise AliasInvalidFormat(index)
 
-        path = os.path.expandvars(path)
-        if any(i in path for i in CONSTANTS.PATH_PROHIBITED_CHARS) or any(i in name for i in CONSTANTS.FILENAME_PROHIBITED_CHARS):
+        is_pattern = AliasMatcher.is_pattern(path)
+        if not is_pattern:
+            path = os.path.expandvars(path)
+        if (any(i in name for i in CONSTANTS.FILENAME_PROHIBITED_CHARS) or
+                (not is_pattern and any(i in path for i in CONSTANTS.PATH_PROHIBITED_CHARS))):
             raise AliasInvalidCharacters(index)
 
-        if Path(path) in new_aliases.keys():
-            raise AliasPathAlreadyExists(index)
+        try:
+            if not new_alias_matcher.add(path, name):
+                raise AliasPathAlreadyExists(index)
+        except re.error:
+            raise AliasInvalidFormat(index)
 
-        new_aliases[Path(path)] = name
+        if not is_pattern:
+            new_aliases[Path(path)] = name
 
+    new_alias_matcher.compile()
+    VARIABLES.alias_matcher = new_alias_matcher
     VARIABLES.aliases = new_aliases
+    VARIABLES.aliases_generation += 1  # Invalidates display names cache.
+    VARIABLES.save_plan_dirty = True
     _print(f"{len(VARIABLES.aliases)} aliases are loaded.")
+
+
+def load_rules(script_settings_dict: dict):
+    """
+    Loads clip rules and compiles them to `VARIABLES.clip_rules`.
+    Rule format: `target > key=value; key=value`, where target is an app (same format as alias path)
+    or `scene:SceneName`. Keys: `mode`, `template`, `folder` (template or `off`), `links` (`on` / `off`).
+    Raises exception if a rule is invalid.
+
+    :param script_settings_dict: Script settings as dict.
+    """
+    _print("Loading clip rules...")
+
+    new_rules = ClipRules()
+    for index, i in enumerate(script_settings_dict.get(PN.PROP_RULES_LIST) or []):
+        spl = i.get("value", "").rsplit(">", 1)  # Templates can't contain ">", but globs can.
+        if len(spl) != 2 or not spl[0].strip():
+            raise RuleInvalidFormat(index)
+        target, rule = spl[0].strip(), parse_clip_rule(spl[1], index)
+
+        if target.casefold().startswith("scene:"):
+            added = new_rules.add_scene_rule(target[6:].strip(), rule)
+        else:
+            if not AliasMatcher.is_pattern(target):
+                target = os.path.expandvars(target)
+            try:
+                # Patterns are validated in the form they take in the combined regex (see `AliasMatcher.add`),
+                # so `compile` doesn't fail on them.
+                added = new_rules.add_app_rule(target, rule)
+            except re.error:
+                raise RuleInvalidFormat(index)
+        if not added:
+            raise RuleTargetAlreadyExists(index)
+
+    new_rules.compile()
+    VARIABLES.clip_rules = new_rules
+    _print(f"{len(VARIABLES.clip_rules)} clip rules are loaded.")
+
+
+def parse_clip_rule(text: str, index: int) -> ClipRule:
+    """
+    Parses clip rule overrides (`key=value; key=value`).
+    Raises `RuleInvalidFormat` if overrides are invalid.
+
+    :param text: Overrides.
+    :param index: Rule index.
+    """
+    rule = ClipRule()
+    for item in text.split(";"):
+        if not item.strip():
+            continue
+        key, _, value = (i.strip() for i in item.partition("="))
+        key = key.casefold()
+        try:
+            if key == "mode":
+                rule.mode = CONSTANTS.RULES_NAMING_MODES[value.casefold()]
+            elif key == "template":
+                ClipTemplate(value, CONSTANTS.FILENAME_PROHIBITED_CHARS)
+                rule.template = value
+            elif key == "folder" and value.casefold() == "off":
+                rule.save_to_folder = False
+            elif key == "folder":
+                ClipTemplate(value, CONSTANTS.FILENAME_PROHIBITED_CHARS, separators="/\\")
+                rule.save_to_folder, rule.folder_template = True, value
+            elif key == "links":
+                rule.create_links = {"on": True, "off": False}[value.casefold()]
+            else:
+                raise KeyError(key)
+        except (KeyError, ValueError, SyntaxError):
+            raise RuleInvalidFormat(index)
+
+    if all(getattr(rule, i) is None for i in ClipRule.__slots__):
+        raise RuleInvalidFormat(index)
+    return rule
@@ -0,0 +1,260 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from pathlib import Path
+from threading import Lock
+import struct
+import mmap
+import time
+import sys
+import os
+
+
+class SessionLog:
+    """
+    Append-only binary log of focus samples `(timestamp_ms, exe_id)` written through a memory-mapped file.
+
+    Samples are written to the mapped memory, so they're in the OS page cache right after `append`
+    and survive OBS crash (OS flushes the pages on its own). The file is grown by `grow_by` records at once,
+    unused records are zeroed, so the actual amount of records can be recovered even if the header
+    was not updated before a crash.
+
+    Executable paths are stored in the append-only text sidecar (`<log>.paths`: `exe_id<TAB>path` lines),
+    since executable IDs are valid only within the session.
+
+    File layout: header (magic, version, record size, records amount), then records `<qq`.
+    """
+    MAGIC = b"SRSL"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHq")
+    RECORD = struct.Struct("<qq")
+
+    def __init__(self, path: str | Path, grow_by: int = 65536):
+        """
+        :param path: Log file path. If the file exists, new records are appended to it.
+        :param grow_by: Amount of records the file is grown by when it's full.
+        """
+        self.path = Path(path)
+        self.paths_path = self.path.with_name(self.path.name + ".paths")
+        self.grow_by = grow_by
+        self.lock = Lock()
+
+        exists = self.path.exists() and self.path.stat().st_size >= self.HEADER.size
+        self.file = open(self.path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(self.HEADER.size + grow_by * self.RECORD.size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        if not exists:
+            self.HEADER.pack_into(self.mm, 0, self.MAGIC, self.VERSION, self.RECORD.size, 0)
+
+        try:
+            self.size = get_session_log_size(self.mm)
+        except ValueError:
+            self.close()
+            raise ValueError(f"{self.path} is not a session log.")
+        self.capacity = (len(self.mm) - self.HEADER.size) // self.RECORD.size
+        struct.pack_into("<q", self.mm, 8, self.size)
+
+        self.known_ids: set[int] = set(read_session_log_paths(self.paths_path))
+        self.paths_file = open(self.paths_path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, exe_id: int, path: str | Path, ts: float | None = None):
+        """
+        Writes a sample to the log.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param path: Executable path (written to the sidecar the first time the ID is seen).
+        :param ts: Sample timestamp (`time.time()`). If None, current time is used.
+        """
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            if self.mm.closed:
+                return
+            if exe_id not in self.known_ids:
+                self.paths_file.write(f"{exe_id}\t{path}\n")
+                self.paths_file.flush()
+                self.known_ids.add(exe_id)
+
+            if self.size >= self.capacity:
+                self._grow()
+            self.RECORD.pack_into(self.mm, self.HEADER.size + self.size * self.RECORD.size, int(ts * 1000), exe_id)
+            self.size += 1
+            struct.pack_into("<q", self.mm, 8, self.size)
+
+    def flush(self):
+        with self.lock:
+            if not self.mm.closed:
+                self.mm.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.mm.closed:
+                self.mm.flush()
+                self.mm.close()
+            self.file.close()
+            if hasattr(self, "paths_file"):
+                self.paths_file.close()
+
+    def _grow(self):
+        self.mm.flush()
+        self.mm.close()  # Mapped file cannot be resized on Windows.
+        self.capacity += self.grow_by
+        self.file.truncate(self.HEADER.size + self.capacity * self.RECORD.size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+
+class SessionStats:
+    """
+    Per-executable active time of a session log.
+    """
+    def __init__(self, paths: dict[int, str], totals: dict[int, float], hourly: dict[int, dict[int, float]]):
+        """
+        :param paths: {exe_id: executable_path}
+        :param totals: {exe_id: active_seconds_amount}
+        :param hourly: {hour_timestamp: {exe_id: active_seconds_amount}}
+        """
+        self.paths = paths
+        self.totals = totals
+        self.hourly = hourly
+
+    def top(self, amount: int = 5) -> list[tuple[str, float]]:
+        """
+        Returns `amount` executables with the biggest active time: [(executable_path, active_seconds_amount), ...]
+        """
+        ids = sorted(self.totals, key=self.totals.get, reverse=True)[:amount]
+        return [(self.paths.get(i, f"#{i}"), self.totals[i]) for i in ids]
+
+
+def get_session_log_size(buffer) -> int:
+    """
+    Returns the actual amount of records in the session log.
+    Header may be behind if OBS crashed right after writing a record, so the following non-zero records are counted too
+    (records are written sequentially, so the first zero record is found with binary search).
+
+    :param buffer: Session log content (e.g. `mmap`).
+    """
+    magic, version, record_size, size = SessionLog.HEADER.unpack_from(buffer, 0)
+    if magic != SessionLog.MAGIC or version != SessionLog.VERSION or record_size != SessionLog.RECORD.size:
+        raise ValueError
+
+    capacity = (len(buffer) - SessionLog.HEADER.size) // record_size
+    low, high = min(size, capacity), capacity
+    while low < high:
+        middle = (low + high) // 2
+        if SessionLog.RECORD.unpack_from(buffer, SessionLog.HEADER.size + middle * record_size)[0]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def read_session_log_paths(paths_path: str | Path) -> dict[int, str]:
+    """
+    Reads session log sidecar with executable paths.
+
+    :param paths_path: Sidecar path (`<log>.paths`).
+    :return: {exe_id: executable_path}
+    """
+    paths = {}
+    if not os.path.exists(paths_path):
+        return paths
+
+    with open(paths_path, "r", encoding="utf-8") as f:
+        for line in f:
+            exe_id, sep, path = line.rstrip("\n").partition("\t")
+            if sep and exe_id.isdigit():
+                paths[int(exe_id)] = path
+    return paths
+
+
+def analyze_session_log(path: str | Path, max_gap: float = 3) -> SessionStats:
+    """
+    Computes per-executable totals and per-hour histograms of the session log.
+
+    The log is mapped into memory and read without copying: as a NumPy structured array if NumPy is available,
+    otherwise as a `memoryview` of int64 values. Time between two samples is attributed to the first one,
+    but not more than `max_gap` seconds (sampling was interrupted).
+
+    :param path: Log file path.
+    :param max_gap: Max time in seconds between two samples of the same run.
+    """
+    path = Path(path)
+    paths = read_session_log_paths(path.with_name(path.name + ".paths"))
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        try:
+            size = get_session_log_size(mm)
+        except ValueError:
+            raise ValueError(f"{path} is not a session log.")
+
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is not None:
+            totals, hourly = _analyze_numpy(np, mm, size, max_gap)
+        else:
+            totals, hourly = _analyze_memoryview(mm, size, max_gap)
+    return SessionStats(paths, totals, hourly)
+
+
+def _analyze_numpy(np, buffer, size: int, max_gap: float):
+    records = np.frombuffer(buffer, dtype=[("ts", "<i8"), ("exe_id", "<i8")],
+                            count=size, offset=SessionLog.HEADER.size)
+    try:
+        if size < 2:
+            return {}, {}
+        durations = np.clip(np.diff(records["ts"]) / 1000, 0, max_gap)
+        exe_ids = records["exe_id"][:-1].copy()
+        hours = records["ts"][:-1] // 3_600_000
+    finally:
+        del records  # Release the buffer, so the mapping can be closed.
+
+    first_hour = int(hours.min())
+    hours_amount = int(hours.max()) - first_hour + 1
+    totals = np.bincount(exe_ids, weights=durations)
+    exe_amount = len(totals)
+    hourly = np.bincount((hours - first_hour) * exe_amount + exe_ids, weights=durations,
+                         minlength=hours_amount * exe_amount).reshape(hours_amount, exe_amount)
+
+    totals_dict = {int(i): float(totals[i]) for i in np.flatnonzero(totals)}
+    hourly_dict = {}
+    for hour_index, row in enumerate(hourly):
+        if len(ids := np.flatnonzero(row)):
+            hourly_dict[(first_hour + hour_index) * 3600] = {int(i): float(row[i]) for i in ids}
+    return totals_dict, hourly_dict
+
+
+def _analyze_memoryview(buffer, size: int, max_gap: float):
+    view = memoryview(buffer)[SessionLog.HEADER.size:SessionLog.HEADER.size + size * SessionLog.RECORD.size]
+    values = view.cast("q")
+    if sys.byteorder != "little":
+        values = [int.from_bytes(view[i:i + 8], "little", signed=True) for i in range(0, len(view), 8)]
+
+    totals, hourly = {}, {}
+    try:
+        for i in range(0, 2 * size - 2, 2):
+            ts, exe_id = values[i], values[i + 1]
+            duration = max(0, min((values[i + 2] - ts) / 1000, max_gap))
+            totals[exe_id] = totals.get(exe_id, 0) + duration
+            hour = hourly.setdefault(ts // 3_600_000 * 3600, {})
+            hour[exe_id] = hour.get(exe_id, 0) + duration
+    finally:
+        if isinstance(values, memoryview):
+            values.release()
+        view.release()
+    return totals, hourly
@@ -12,20 +12,15 @@
 #  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 #  GNU Affero General Public License for more details.
 
-from .globals import user32
+from .globals import VARIABLES, CONSTANTS
+from .backends import ForegroundBackend
 
-import ctypes
-from ctypes import wintypes
-import winsound
 from pathlib import Path
 from datetime import datetime
 from contextlib import suppress
+import time
 import os
 
-class LASTINPUTINFO(ctypes.Structure):
-    _fields_ = [("cbSize", wintypes.UINT),
-                ("dwTime", wintypes.DWORD)]
-
 
 def _print(*values, sep: str | None = None, end: str | None = None, file=None, flush: bool = False):
     str_time = datetime.now().strftime(f"%d.%m.%Y %H:%M:%S")
@@ -36,56 +31,118 @@ def get_active_window_pid() -> int | None:
     """
     Gets process ID of the current active window.
     """
-    hwnd = user32.GetForegroundWindow()
-    pid = wintypes.DWORD()
-    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-    return pid.value
+    return VARIABLES.backend.get_active_window_pid()
+
 
+def get_active_window_title() -> str:
+    """
+    Gets title of the current active window.
+    """
+    backend = VARIABLES.backend
+    return backend.get_window_title(backend.get_active_window())
+
+
+def get_active_executable_path() -> str:
+    """
+    Gets executable path of the current active window's process.
 
-def get_executable_path(pid: int) -> Path:
+    Uses `VARIABLES.process_cache`: while the active window doesn't change, it costs a single
+    active window request. Otherwise, the process is validated by its creation time,
+    and the executable path is resolved only if the process is not cached yet.
+    """
+    backend = VARIABLES.backend
+    cache = VARIABLES.process_cache
+    window = backend.get_active_window()
+    last = cache.last
+    if window and last and window == last[0] and (entry := cache.entries.get(last[1])):
+        cache.hits += 1
+        return entry[1]
+
+    pid = backend.get_window_pid(window)
+    creation_time = backend.get_process_creation_time(pid)
+    path = cache.get(pid, creation_time)
+    if path is not None:
+        cache.hits += 1
+    else:
+        cache.misses += 1
+        path = backend.get_executable_path(pid)
+        cache.put(pid, creation_time, path)
+        if time.monotonic() - cache.last_sweep > CONSTANTS.PROCESS_CACHE_SWEEP_INTERVAL:
+            with suppress(Exception):
+                sweep_process_cache()
+
+    cache.last = (window, pid)
+    return path
+
+
+def warm_process_cache():
+    """
+    Fills `VARIABLES.process_cache` with all currently running processes
+    (the ones which executable path can be accessed).
+    """
+    backend = VARIABLES.backend
+    cache = VARIABLES.process_cache
+    try:
+        pids = backend.get_running_process_ids()
+    except Exception:
+        _print("Cannot warm process cache: failed to enumerate processes.")
+        return
+
+    for pid in pids:
+        with suppress(Exception):
+            cache.put(pid, backend.get_process_creation_time(pid), backend.get_executable_path(pid))
+    cache.last_sweep = time.monotonic()
+    _print(f"Process cache warmed: {len(cache)} processes.")
+
+
+def sweep_process_cache():
+    """
+    Removes exited processes from `VARIABLES.process_cache`.
+    """
+    cache = VARIABLES.process_cache
+    removed = cache.retain(VARIABLES.backend.get_running_process_ids())
+    cache.last_sweep = time.monotonic()
+    if removed:
+        _print(f"{removed} exited processes removed from process cache.")
+
+
+def get_executable_path(pid: int) -> str:
     """
     Gets path of process's executable.
+    Returns a plain string, so it can be interned in `ExeRegistry` without creating a `Path` on every call.
 
     :param pid: process ID.
     :return: Executable path.
     """
-    process_handle = ctypes.windll.kernel32.OpenProcess(0x0400 | 0x0010, False, pid)
-    # PROCESS_QUERY_INFORMATION | PROCESS_VM_READ
-
-    if not process_handle:
-        raise OSError(f"Process {pid} does not exist.")
-
-    filename_buffer = ctypes.create_unicode_buffer(260)  # Windows path is 260 characters max.
-    result = ctypes.windll.psapi.GetModuleFileNameExW(process_handle, None, filename_buffer, 260)
-    ctypes.windll.kernel32.CloseHandle(process_handle)
-    if result:
-        return Path(filename_buffer.value)
-    else:
-        raise RuntimeError(f"Cannot get executable path for process {pid}.")
+    return VARIABLES.backend.get_executable_path(pid)
 
 
 def play_sound(path: str | Path):
     """
-    Plays sound using windows engine.
+    Plays sound using OS engine.
 
     :param path: path to sound (.wav)
     """
     with suppress(Exception):
-        winsound.PlaySound(str(path), winsound.SND_ASYNC)
+        VARIABLES.backend.play_sound(path)
 
 
 def get_time_since_last_input() -> int:
     """
     Gets the time (in seconds) since the last mouse or keyboard input.
     """
-    last_input_info = LASTINPUTINFO()
-    last_input_info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+    return VARIABLES.backend.get_time_since_last_input()
+
+
+def set_backend(backend: ForegroundBackend):
+    """
+    Replaces OS backend (e.g. with `SyntheticBackend` for benchmarks) and resets process cache.
 
-    if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(last_input_info)):
-        current_time = ctypes.windll.kernel32.GetTickCount()
-        idle_time_ms = current_time - last_input_info.dwTime
-        return idle_time_ms // 1000
-    return 0
+    :param backend: New backend.
+    """
+    VARIABLES.backend = backend
+    VARIABLES.process_cache.clear()
+    _print(f"Backend changed to {backend.name}.")
 
 
 def create_hard_link(file_path: Path | str, links_folder: Path | str) -> None:
@@ -0,0 +1,120 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+
+from datetime import datetime
+import re
+
+
+class ClipTemplate:
+    """
+    File name / folder template compiled into a list of segments.
+
+    Template is parsed once: script variables (`%NAME`, `%APPS`, `%SCENE`, `%TITLE`, `%BUFLEN`, `%SEQ`)
+    become variable segments, everything else becomes either a static text segment or a `strftime` segment
+    (if it contains date directives). Date directives and prohibited characters are validated at compile time,
+    so rendering is just joining the segments. Prohibited characters in variables values are replaced with `_`.
+
+    If `separators` are set (folder templates, e.g. `%NAME/%Y-%m`), the template is split into several parts
+    (one part per folder). Parts can't be `.` / `..` (or other names of dots and spaces), so a clip can't be saved
+    outside the base folder: such template parts are rejected, such rendered parts (e.g. `%NAME` is `..`)
+    get their dots replaced with `_`.
+    """
+    VARIABLES_RE = re.compile(r"%(APPS|NAME|SCENE|TITLE|BUFLEN|SEQ)")
+    SAMPLE_DATETIME = datetime(2000, 12, 31, 23, 59, 59)
+    TEXT, DATE, VARIABLE = range(3)
+
+    def __init__(self, template: str, prohibited_chars: str, separators: str = ""):
+        """
+        Raises ValueError if the template is empty or has invalid date directives.
+        Raises SyntaxError if the template (or its date directives output) contains prohibited characters.
+
+        :param template: Template string.
+        :param prohibited_chars: Characters that are not allowed in a rendered part.
+        :param separators: Characters that split the template into parts (folders).
+        """
+        if not template:
+            raise ValueError
+
+        self.template = template
+        self.variables: set[str] = set()  # Names of variables used in the template (without %).
+        self.parts: list[list[tuple[int, str]]] = []
+        self.replacement_table = str.maketrans({i: "_" for i in prohibited_chars + separators})
+
+        raw_parts = re.split(f"[{re.escape(separators)}]", template) if separators else [template]
+        for raw_part in raw_parts:
+            if not raw_part.strip(" ."):
+                raise ValueError
+            self.parts.append(self._compile_part(raw_part, prohibited_chars))
+
+    def uses(self, variable: str) -> bool:
+        """
+        Checks if the template uses the variable.
+
+        :param variable: Variable name (without %), e.g. `SCENE`.
+        """
+        return variable in self.variables
+
+    def render_parts(self, values: dict[str, str], dt: datetime | None = None) -> list[str]:
+        """
+        Renders every part of the template.
+
+        :param values: Variables values: {variable_name: value}. Missing variables are rendered as empty strings.
+        :param dt: Optional datetime object; uses current time if None.
+        """
+        dt = dt or datetime.now()
+        table = self.replacement_table
+        result = []
+        for part in self.parts:
+            rendered = []
+            for kind, value in part:
+                if kind == self.TEXT:
+                    rendered.append(value)
+                elif kind == self.DATE:
+                    rendered.append(dt.strftime(value))
+                else:
+                    rendered.append(str(values.get(value, "")).translate(table))
+            rendered = "".join(rendered)
+            if rendered and not rendered.strip(" ."):
+                rendered = rendered.replace(".", "_")
+            result.append(rendered)
+        return result
+
+    def render(self, values: dict[str, str], dt: datetime | None = None) -> str:
+        """
+        Renders the template as a single string (parts are joined with `/`).
+
+        :param values: Variables values: {variable_name: value}.
+        :param dt: Optional datetime object; uses current time if None.
+        """
+        return "/".join(self.render_parts(values, dt))
+
+    def _compile_part(self, raw_part: str, prohibited_chars: str) -> list[tuple[int, str]]:
+        segments = []
+        for index, chunk in enumerate(self.VARIABLES_RE.split(raw_part)):
+            if index % 2:
+                self.variables.add(chunk)
+                segments.append((self.VARIABLE, chunk))
+                continue
+            if not chunk:
+                continue
+
+            try:
+                sample = self.SAMPLE_DATETIME.strftime(chunk)
+            except Exception as e:
+                raise ValueError from e
+
+            if any(i in sample for i in prohibited_chars):
+                raise SyntaxError
+            segments.append((self.DATE if "%" in chunk else self.TEXT, chunk))
+        return segments
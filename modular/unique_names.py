@@ -0,0 +1,132 @@
+#  OBS Smart Replays is an OBS script that allows more flexible replay buffer management:
+#  set the clip name depending on the current window, set the file name format, etc.
+#  Copyright (C) 2024 qvvonk
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Affero General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Affero General Public License for more details.
+from pathlib import Path
+from threading import Lock
+from contextlib import suppress
+import os
+import re
+
+
+class UniqueNameAllocator:
+    """
+    Moves files to unique paths: `name.ext`, `name (1).ext`, `name (2).ext`, ...
+
+    A path is claimed atomically, so an existing file is never overwritten, even by a concurrent save:
+    the file is hard-linked to the new path and the old name is removed (`os.link` fails if the path exists).
+    If hard links are not supported (e.g. FAT file systems), the new path is reserved with exclusive creation
+    and then replaced with the file.
+
+    Highest used suffixes are cached per folder and name, so the next free path is claimed at the first try.
+    The folder is listed only on the first collision of the name (instead of checking `(1)`, `(2)`, ... one by one).
+    The cache only holds hints, not reservations: if a cached suffix is taken, the folder is listed again,
+    and if files are deleted, numbering just continues from the cached suffix.
+    """
+    def __init__(self, max_size: int = 256):
+        """
+        :param max_size: Max amount of cached folders. The oldest folders are dropped first.
+        """
+        self.max_size = max_size
+        self.lock = Lock()
+        self.suffixes: dict[str, dict[str, int]] = {}  # {folder: {normalized file name: highest used suffix}}
+        self.no_links: set[str] = set()  # Folders on file systems without hard links.
+        self.claims = 0
+        self.collisions = 0
+        self.scans = 0
+
+    def move(self, src: str | Path, folder: str | Path, stem: str, ext: str) -> Path:
+        """
+        Moves `src` to a unique path in `folder` and returns the new path.
+        If `src` or `folder` doesn't exist, raises FileNotFoundError.
+
+        :param src: File to move.
+        :param folder: Destination folder.
+        :param stem: Destination file name without extension.
+        :param ext: Destination file extension (without dot).
+        """
+        folder = str(folder)
+        key = os.path.normcase(f"{stem}.{ext}")
+        with self.lock:
+            suffix = self._next_suffix(folder, key)
+            while True:
+                path = Path(folder, f"{stem}.{ext}" if not suffix else f"{stem} ({suffix}).{ext}")
+                self.claims += 1
+                try:
+                    self._claim(str(src), str(path), folder)
+                except FileExistsError:
+                    self.collisions += 1
+                    suffix = max(suffix, self._scan(folder, stem, ext)) + 1
+                    continue
+                self._remember(folder, key, suffix)
+                return path
+
+    def stats(self) -> dict:
+        return {"folders": len(self.suffixes), "claims": self.claims,
+                "collisions": self.collisions, "scans": self.scans}
+
+    def _next_suffix(self, folder: str, key: str) -> int:
+        """
+        Returns the suffix that is probably free: the next after the highest used one, or 0 (no suffix).
+        """
+        used = self.suffixes.get(folder, {}).get(key)
+        return 0 if used is None else used + 1
+
+    def _remember(self, folder: str, key: str, suffix: int):
+        names = self.suffixes.pop(folder, None)  # Re-inserted at the end, so the oldest folders are dropped first.
+        if names is None:
+            names = {}
+            while len(self.suffixes) >= self.max_size:
+                self.suffixes.pop(next(iter(self.suffixes)))
+        self.suffixes[folder] = names
+        names[key] = max(suffix, names.get(key, 0))
+
+    def _scan(self, folder: str, stem: str, ext: str) -> int:
+        """
+        Returns the highest suffix of the files named `stem (N).ext` in the folder (0 if there are none).
+        """
+        self.scans += 1
+        flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+        pattern = re.compile(rf"{re.escape(stem)} \((\d+)\)\.{re.escape(ext)}", flags)
+        highest = 0
+        with suppress(OSError), os.scandir(folder) as entries:
+            for entry in entries:
+                if match := pattern.fullmatch(entry.name):
+                    highest = max(highest, int(match.group(1)))
+        return highest
+
+    def _claim(self, src: str, dst: str, folder: str):
+        """
+        Moves `src` to `dst`. If `dst` exists, raises FileExistsError.
+        """
+        if folder not in self.no_links:
+            try:
+                os.link(src, dst)
+            except (FileExistsError, FileNotFoundError):
+                raise
+            except OSError:
+                self.no_links.add(folder)  # Different drives or no hard links support.
+            else:
+                try:
+                    os.unlink(src)
+                except OSError:
+                    os.unlink(dst)
+                    raise
+                return
+
+        os.close(os.open(dst, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        try:
+            os.replace(src, dst)
+        except OSError:
+            with suppress(OSError):
+                os.unlink(dst)
+            raise
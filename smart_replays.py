@@ -16,24 +16,34 @@ import tkinter as tk
 import time
 import sys
 import ctypes
+import subprocess
+import shlex
+import os
+import struct
+import mmap
 import re
 import json
 import traceback
 import webbrowser
-import os
-import winsound
-import subprocess
 from tkinter import font as f
-from enum import Enum
+from pathlib import Path
+from array import array
 from threading import Lock
 from threading import Thread
-from pathlib import Path
+from threading import Event
 from collections import deque
+from collections import OrderedDict
 from collections import defaultdict
-from urllib.request import urlopen
-from datetime import datetime
+from bisect import bisect_right
+from bisect import bisect_left
 from ctypes import wintypes
+from ctypes.util import find_library
 from contextlib import suppress
+from datetime import datetime
+from queue import Queue
+from queue import Full
+from enum import Enum
+from urllib.request import urlopen
 from typing import Any
 
 if __name__ != '__main__':
@@ -201,60 +211,2763 @@ if __name__ == '__main__':
     sys.exit(0)
 
 
-# -------------------- globals.py --------------------
-user32 = ctypes.windll.user32
+# -------------------- exe_history.py --------------------
+class ExeRegistry:
+    """
+    Interning table of executables.
 
+    Every distinct executable path gets a small integer ID, so histories store IDs instead of
+    `Path` objects, and path and stem of an executable are resolved only once.
 
-class CONSTANTS:
-    VERSION = "1.0.8.2"
-    OBS_VERSION_STRING = obs.obs_get_version_string()
-    OBS_VERSION_RE = re.compile(r'(\d+)\.(\d+)\.(\d+)')
-    OBS_VERSION = [int(i) for i in OBS_VERSION_RE.match(OBS_VERSION_STRING).groups()]
-    CLIPS_FORCE_MODE_LOCK = Lock()
-    VIDEOS_FORCE_MODE_LOCK = Lock()
-    FILENAME_PROHIBITED_CHARS = r'/\:"<>*?|%'
-    PATH_PROHIBITED_CHARS = r'"<>*?|%'
-    DEFAULT_FILENAME_FORMAT = "%NAME_%d.%m.%Y_%H-%M-%S"
-    DEFAULT_ALIASES = (
-        {"value": "C:\\Windows\\explorer.exe > Desktop", "selected": False, "hidden": False},
-        {"value": f"{sys.executable} > OBS", "selected": False, "hidden": False}
-    )
+    Lookups are lock-free, only registering of a new executable is done under the lock.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.ids: dict[str, int] = {}  # {"path/to/executable": exe_id}
+        self.paths: list[Path] = []  # [Path(path/to/executable), ...], index is exe_id
+        self.stems: list[str] = []  # [executable stem, ...], index is exe_id
 
+    def __len__(self) -> int:
+        return len(self.paths)
 
-class VARIABLES:
-    update_available: bool = False
-    clip_exe_history: deque[Path, ...] | None = None
-    video_exe_history: defaultdict[Path, int] | None = None  # {Path(path/to/executable): active_seconds_amount
-    exe_path_on_video_stopping_event: Path | None = None
-    aliases: dict[Path, str] = {}
-    script_settings = None
-    hotkey_ids: dict = {}
-    force_mode = None
+    def intern(self, path: str | Path) -> int:
+        """
+        Returns ID of the executable. If the executable is new, registers it.
 
+        :param path: Executable path.
+        :return: Executable ID.
+        """
+        key = str(path)
+        exe_id = self.ids.get(key)
+        if exe_id is not None:
+            return exe_id
+
+        with self.lock:
+            exe_id = self.ids.get(key)
+            if exe_id is None:
+                if len(self.paths) >= ExeHistory.GAP_ID:
+                    raise OverflowError("Too many executables registered.")
+
+                exe_id = len(self.paths)
+                path = Path(path)
+                self.paths.append(path)
+                self.stems.append(path.stem)
+                self.ids[key] = exe_id  # Published last, so lock-free readers never see an incomplete entry.
+        return exe_id
+
+
+class HistoryChunk:
+    """
+    Fixed-size block of history runs.
 
-class ConfigTypes(Enum):
-    PROFILE = 0
-    APP = 1
-    USER = 2
+    Chunks are append-only: a run is never changed after it was added, its end is the start
+    of the next run (or the history tail end for the last run). That's why chunks can be shared
+    between the history and its snapshots without copying.
+    """
+    __slots__ = ("epoch", "ids", "starts")
 
+    def __init__(self, epoch: int):
+        """
+        :param epoch: Sequence number of the first run of the chunk (among all runs ever added to the history).
+        """
+        self.epoch = epoch
+        self.ids = array('H')
+        self.starts = array('d')
 
-class ClipNamingModes(Enum):
-    CURRENT_PROCESS = 0
-    MOST_RECORDED_PROCESS = 1
-    CURRENT_SCENE = 2
 
+class FocusIndex:
+    """
+    Runs of a single executable with cumulative active time (prefix sums) before every run.
 
-class VideoNamingModes(Enum):
-    CURRENT_PROCESS = 0
-    MOST_RECORDED_PROCESS = 1
-    CURRENT_SCENE = 2
+    Lets to count how many seconds the executable was active within any time window with binary search.
+    Only the end of the last run can be changed (while the run is extended), so index can be shared
+    with snapshots. Trimmed runs are dropped by creating a new index, not by changing the current one.
+    """
+    __slots__ = ("starts", "ends", "cums", "head")
 
+    def __init__(self, starts: array | None = None, ends: array | None = None, cums: array | None = None):
+        self.starts = starts or array('d')
+        self.ends = ends or array('d')
+        self.cums = cums or array('d')  # Active seconds before every run.
+        self.head = 0  # Index of the oldest not-trimmed run.
 
-class PopupPathDisplayModes(Enum):
-    FULL_PATH = 0
-    FOLDER_AND_FILE = 1
-    JUST_FOLDER = 2
-    JUST_FILE = 3
+    def __len__(self) -> int:
+        return len(self.starts) - self.head
+
+    def push(self, start: float, end: float):
+        cum = self.cums[-1] + self.ends[-1] - self.starts[-1] if self.starts else 0.0
+        self.starts.append(start)
+        self.ends.append(end)
+        self.cums.append(cum)
+
+    def compacted(self) -> "FocusIndex":
+        """
+        Returns a new index without trimmed runs.
+        """
+        return FocusIndex(self.starts[self.head:], self.ends[self.head:], self.cums[self.head:])
+
+    def active_before(self, ts: float, head: int, size: int, tail_end: float) -> float:
+        """
+        Returns active seconds of the executable before `ts` (counted from the first stored run).
+
+        :param ts: Timestamp.
+        :param head: Index of the first run to consider.
+        :param size: Amount of runs to consider.
+        :param tail_end: Timestamp after which nothing is known yet (run ends are clipped to it).
+        """
+        i = bisect_right(self.starts, ts, head, size) - 1
+        if i < head:
+            return self.cums[head]
+        end = min(ts, self.ends[i], tail_end)
+        return self.cums[i] + max(0.0, end - self.starts[i])
+
+
+class ExeHistorySnapshot:
+    """
+    Frozen view of `ExeHistory`.
+
+    It references the same chunks as the history, plus a few scalars that describe
+    which runs were visible at the moment of the snapshot, so it can be read from any thread
+    while the history keeps growing.
+    """
+    def __init__(self,
+                 chunks: tuple[HistoryChunk, ...],
+                 last_chunk_size: int,
+                 head: int,
+                 cutoff: float,
+                 tail_end: float,
+                 totals: dict[int, float],
+                 total_time: float,
+                 ranking: list[int],
+                 indexes: dict[int, tuple[FocusIndex, int, int]]):
+        self.chunks = chunks
+        self.last_chunk_size = last_chunk_size
+        self.head = head
+        self.cutoff = cutoff
+        self.tail_end = tail_end
+        self.totals = totals
+        self.total_time = total_time
+        self.ranking = ranking  # Executable IDs sorted by active time (descending).
+        self.indexes = indexes  # {exe_id: (index, head, size)}
+
+    @property
+    def epoch(self) -> int:
+        """
+        Sequence number of the next run that would be added after this snapshot.
+        Two snapshots with the same epoch and tail end are identical.
+        """
+        return self.chunks[-1].epoch + self.last_chunk_size if self.chunks else 0
+
+    def __bool__(self) -> bool:
+        return bool(self.totals)
+
+    def most_common(self) -> int | None:
+        """
+        Returns ID of the executable that was active most of the time within the snapshot.
+        """
+        return self.ranking[0] if self.ranking else None
+
+    def top(self, amount: int, min_share: float = 0.0) -> list[int]:
+        """
+        Returns IDs of up to `amount` executables that were active most of the time within the snapshot
+        (the most active first). Costs O(amount).
+
+        :param amount: Max amount of executables.
+        :param min_share: Min share (0..1) of the snapshot active time. Executables with a smaller share are skipped
+            (except the most active one, which is always returned).
+        """
+        result = []
+        for exe_id in self.ranking[:amount]:
+            if self.totals[exe_id] <= 0 or (result and self.totals[exe_id] < self.total_time * min_share):
+                break
+            result.append(exe_id)
+        return result
+
+    def get_active_time(self, exe_id: int, start: float, end: float) -> float:
+        """
+        Returns how many seconds the executable was active between `start` and `end`.
+        Costs O(log N), where N is amount of the executable runs.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param start: Window start timestamp.
+        :param end: Window end timestamp.
+        """
+        if exe_id not in self.indexes:
+            return 0.0
+        index, head, size = self.indexes[exe_id]
+        start, end = max(start, self.cutoff), min(end, self.tail_end)
+        if end <= start:
+            return 0.0
+        return (index.active_before(end, head, size, self.tail_end)
+                - index.active_before(start, head, size, self.tail_end))
+
+    def most_common_between(self, start: float, end: float) -> int | None:
+        """
+        Returns ID of the executable that was active most of the time between `start` and `end`.
+        Costs O(E * log N), where E is amount of executables in the snapshot.
+
+        :param start: Window start timestamp.
+        :param end: Window end timestamp.
+        """
+        return next(iter(self.top_between(start, end, 1)), None)
+
+    def top_between(self, start: float, end: float, amount: int, min_share: float = 0.0) -> list[int]:
+        """
+        Returns IDs of up to `amount` executables that were active most of the time between `start` and `end`.
+        If the window covers the whole snapshot, costs O(amount), otherwise O(E * log N).
+
+        :param start: Window start timestamp.
+        :param end: Window end timestamp.
+        :param amount: Max amount of executables.
+        :param min_share: Min share (0..1) of the window active time. Executables with a smaller share are skipped
+            (except the most active one, which is always returned).
+        """
+        if start <= self.cutoff and end >= self.tail_end:
+            return self.top(amount, min_share)
+
+        times = {exe_id: self.get_active_time(exe_id, start, end) for exe_id in self.indexes}
+        total_time = sum(times.values())
+        ranking = sorted(times, key=times.get, reverse=True)[:amount]
+        return [exe_id for index, exe_id in enumerate(ranking)
+                if times[exe_id] > 0 and (index == 0 or times[exe_id] >= total_time * min_share)]
+
+    def iter_runs(self, include_gaps: bool = False):
+        """
+        Yields runs `(exe_id, start_ts, end_ts)` from the oldest to the newest.
+
+        :param include_gaps: Yield periods without samples as well (with `ExeHistory.GAP_ID` executable ID).
+        """
+        previous = None
+        for chunk_index, chunk in enumerate(self.chunks):
+            size = self.last_chunk_size if chunk_index == len(self.chunks) - 1 else len(chunk.ids)
+            first = self.head if chunk_index == 0 else 0
+            for i in range(first, size):
+                if previous is not None and (include_gaps or previous[0] != ExeHistory.GAP_ID):
+                    yield previous[0], previous[1], chunk.starts[i]
+                previous = (chunk.ids[i], max(chunk.starts[i], self.cutoff))
+
+        if previous is not None and (include_gaps or previous[0] != ExeHistory.GAP_ID):
+            yield previous[0], previous[1], self.tail_end
+
+
+class ExeHistory:
+    """
+    Timeline of active executables stored as runs of `(exe_id, start_ts, end_ts)`.
+
+    A new run is created only when the active executable changes (or sampling was interrupted),
+    otherwise the last run is just extended. Runs that are older than `max_time` seconds
+    (by wall-clock time) are trimmed, so memory depends on the amount of focus switches,
+    not on the replay buffer length.
+
+    Runs are stored in append-only chunks of compact arrays (`array('H')` for executable IDs,
+    `array('d')` for start timestamps). The end of a run is the start of the next one, periods
+    without samples are stored as runs with `GAP_ID`. All mutable state (trim position, tail end)
+    are scalars, so `snapshot` costs only a copy of chunks references and per-executable totals.
+
+    Total active time of every executable is updated on every extension / trim, and executables
+    are kept sorted by it (`ranking`, adjusted by swapping neighbours on every change, which is O(1)
+    in common case, since time changes are small), so the most recorded executables are available
+    without walking the timeline.
+    For arbitrary time windows every executable has its own `FocusIndex` (prefix sums of active time).
+
+    History is filled by the sampler thread and read by OBS thread, so all public methods are done under the lock.
+    """
+    GAP_ID = 0xFFFF
+
+    def __init__(self, max_time: float, max_gap: float = 3, chunk_size: int = 64):
+        """
+        :param max_time: Timeline length in seconds (usually replay buffer max time).
+        :param max_gap: Max time in seconds between two samples of the same run.
+            If the gap between samples is bigger, a new run is created.
+        :param chunk_size: Amount of runs in one chunk.
+        """
+        self.lock = Lock()
+        self.max_time = max_time
+        self.max_gap = max_gap
+        self.chunk_size = chunk_size
+        self.chunks: deque[HistoryChunk] = deque()
+        self.head = 0  # Index of the oldest run in the first chunk.
+        self.cutoff = float("-inf")  # Time before this timestamp is already trimmed.
+        self.tail_end = 0.0  # End of the last run (timestamp of the last sample).
+        self.epoch = 0  # Amount of runs ever added.
+        self.size = 0  # Amount of runs in the history (without gaps).
+        self.totals: dict[int, float] = {}  # {exe_id: active_seconds_amount}
+        self.total_time = 0.0  # Active seconds amount of all executables.
+        self.runs_amount: dict[int, int] = {}  # {exe_id: runs_amount}
+        self.indexes: dict[int, FocusIndex] = {}
+        self.ranking: list[int] = []  # Executable IDs sorted by active time (descending).
+        self.ranks: dict[int, int] = {}  # {exe_id: index_in_ranking}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return bool(self.size)
+
+    @property
+    def runs(self) -> list[tuple[int, float, float]]:
+        """
+        Returns all runs from the oldest to the newest.
+        """
+        return list(self.snapshot().iter_runs())
+
+    def append(self, exe_id: int, ts: float | None = None):
+        """
+        Adds a new sample to the timeline.
+
+        The time passed since the previous sample is attributed to the previous run.
+        If the executable has changed, this time is split in half between the previous run
+        and a new one, since the actual switch happened somewhere between two samples.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param ts: Sample timestamp (`time.time()`). If None, current time is used.
+        """
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            self._append(exe_id, ts)
+
+    def trim(self, now: float | None = None):
+        """
+        Removes (or cuts) runs that are older than `max_time` seconds.
+
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._trim(now)
+
+    def most_common(self, now: float | None = None) -> int | None:
+        """
+        Returns ID of the executable that was active most of the time within the timeline.
+
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._trim(now)
+            return self.ranking[0] if self.ranking else None
+
+    def top(self, amount: int, min_share: float = 0.0, now: float | None = None) -> list[int]:
+        """
+        Returns IDs of up to `amount` executables that were active most of the time within the timeline.
+
+        :param amount: Max amount of executables.
+        :param min_share: Min share (0..1) of the timeline active time. Executables with a smaller share are skipped
+            (except the most active one, which is always returned).
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        return self.snapshot(now).top(amount, min_share)
+
+    def set_max_time(self, max_time: float, now: float | None = None):
+        """
+        Changes timeline length (e.g. after replay buffer length was changed) without rebuilding the history.
+
+        :param max_time: New timeline length in seconds.
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self.max_time = max_time
+            self._trim(now)
+
+    def snapshot(self, now: float | None = None) -> ExeHistorySnapshot:
+        """
+        Returns frozen view of the history. Chunks are shared, not copied.
+
+        :param now: Current timestamp (`time.time()`), the history is trimmed to it before the snapshot.
+            If None, current time is used.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._trim(now)
+            return ExeHistorySnapshot(chunks=tuple(self.chunks),
+                                      last_chunk_size=len(self.chunks[-1].ids) if self.chunks else 0,
+                                      head=self.head,
+                                      cutoff=self.cutoff,
+                                      tail_end=self.tail_end,
+                                      totals=dict(self.totals),
+                                      total_time=self.total_time,
+                                      ranking=self.ranking.copy(),
+                                      indexes={exe_id: (index, index.head, len(index.starts))
+                                               for exe_id, index in self.indexes.items()})
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+    def _append(self, exe_id: int, ts: float):
+        start = ts
+        if self.chunks:
+            last_id = self.chunks[-1].ids[-1]
+            delta = ts - self.tail_end
+            if delta < 0:  # System clock was changed, history timestamps are not valid anymore.
+                self._clear()
+            elif delta <= self.max_gap:
+                if last_id == exe_id:
+                    self._add_time(exe_id, delta)
+                    self.indexes[exe_id].ends[-1] = ts
+                    self.tail_end = ts
+                    self._trim(ts)
+                    return
+
+                start = (self.tail_end + ts) / 2
+                self._add_time(last_id, start - self.tail_end)
+                if last_id != self.GAP_ID:
+                    self.indexes[last_id].ends[-1] = start
+            elif last_id != self.GAP_ID:
+                self._push(self.GAP_ID, self.tail_end)
+
+        self._push(exe_id, start)
+        self.indexes[exe_id].push(start, ts)
+        self.tail_end = ts
+        self._add_time(exe_id, ts - start)
+        self._trim(ts)
+
+    def _push(self, exe_id: int, start: float):
+        """
+        Adds a new run to the last chunk (creates a new chunk if it's full).
+        """
+        if not self.chunks or len(self.chunks[-1].ids) >= self.chunk_size:
+            self.chunks.append(HistoryChunk(self.epoch))
+        chunk = self.chunks[-1]
+        chunk.ids.append(exe_id)
+        chunk.starts.append(start)
+        self.epoch += 1
+
+        if exe_id != self.GAP_ID:
+            self.size += 1
+            self.totals.setdefault(exe_id, 0)
+            self.runs_amount[exe_id] = self.runs_amount.get(exe_id, 0) + 1
+            if exe_id not in self.ranks:
+                self.indexes[exe_id] = FocusIndex()
+                self.ranks[exe_id] = len(self.ranking)
+                self.ranking.append(exe_id)
+
+    def _trim(self, now: float):
+        cutoff = now - self.max_time
+        if cutoff <= self.cutoff:
+            return
+
+        while self.chunks:
+            chunk = self.chunks[0]
+            exe_id = chunk.ids[self.head]
+            start = max(chunk.starts[self.head], self.cutoff)
+            if self.head + 1 < len(chunk.ids):
+                end = chunk.starts[self.head + 1]
+            elif len(self.chunks) > 1:
+                end = self.chunks[1].starts[0]
+            else:
+                end = self.tail_end
+
+            if end > cutoff:
+                if exe_id != self.GAP_ID and start < cutoff:
+                    self._add_time(exe_id, start - cutoff)
+                break
+
+            self.head += 1
+            if self.head == len(chunk.ids):
+                self.chunks.popleft()
+                self.head = 0
+
+            if exe_id == self.GAP_ID:
+                continue
+            self.size -= 1
+            self.runs_amount[exe_id] -= 1
+            if self.runs_amount[exe_id]:
+                self._add_time(exe_id, start - end)
+                index = self.indexes[exe_id]
+                index.head += 1
+                if index.head >= 32 and index.head * 2 >= len(index.starts):
+                    self.indexes[exe_id] = index.compacted()
+            else:
+                self.total_time -= self.totals[exe_id]
+                del self.runs_amount[exe_id], self.totals[exe_id], self.indexes[exe_id]
+                self._remove_from_ranking(exe_id)
+
+        self.cutoff = cutoff
+
+    def _clear(self):
+        self.chunks.clear()
+        self.head = 0
+        self.cutoff = float("-inf")
+        self.tail_end = 0.0
+        self.size = 0
+        self.totals.clear()
+        self.total_time = 0.0
+        self.runs_amount.clear()
+        self.indexes.clear()
+        self.ranking.clear()
+        self.ranks.clear()
+
+    def _add_time(self, exe_id: int, seconds: float):
+        """
+        Adds active time to the executable and moves it in the ranking.
+        """
+        totals, ranking, ranks = self.totals, self.ranking, self.ranks
+        totals[exe_id] += seconds
+        self.total_time += seconds
+        rank = ranks[exe_id]
+        if seconds > 0:
+            while rank and totals[ranking[rank - 1]] < totals[exe_id]:
+                ranking[rank] = ranking[rank - 1]
+                ranks[ranking[rank]] = rank
+                rank -= 1
+        else:
+            while rank + 1 < len(ranking) and totals[ranking[rank + 1]] > totals[exe_id]:
+                ranking[rank] = ranking[rank + 1]
+                ranks[ranking[rank]] = rank
+                rank += 1
+        ranking[rank] = exe_id
+        ranks[exe_id] = rank
+
+    def _remove_from_ranking(self, exe_id: int):
+        rank = self.ranks.pop(exe_id)
+        del self.ranking[rank]
+        for i in range(rank, len(self.ranking)):
+            self.ranks[self.ranking[i]] = i
+
+
+# -------------------- process_cache.py --------------------
+class ProcessCache:
+    """
+    Cache of executable paths of processes, keyed by process ID.
+
+    Every entry also stores process creation time. Since process IDs are reused by the system,
+    an entry is valid only if the creation time of the process with the same ID matches.
+
+    The last foreground window and its process ID are remembered as well,
+    so while the foreground window doesn't change, nothing has to be resolved again.
+
+    The cache is used from the sampler thread and from OBS thread, so `last` is replaced as a whole tuple
+    and entries are never iterated directly.
+    """
+    def __init__(self):
+        self.entries: dict[int, tuple[int, str]] = {}  # {pid: (creation_time, "path/to/executable")}
+        self.last: tuple[int, int] | None = None  # (window, pid) of the last active window.
+        self.last_sweep: float = 0  # `time.monotonic()` of the last removal of exited processes.
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def last_pid(self) -> int | None:
+        last = self.last
+        return last[1] if last else None
+
+    def get(self, pid: int, creation_time: int) -> str | None:
+        """
+        Returns cached executable path of the process.
+
+        :param pid: Process ID.
+        :param creation_time: Process creation time.
+        :return: Executable path or None, if the process is not cached or PID was reused by another process.
+        """
+        entry = self.entries.get(pid)
+        if entry is None or entry[0] != creation_time:
+            return None
+        return entry[1]
+
+    def put(self, pid: int, creation_time: int, path: str):
+        self.entries[pid] = (creation_time, path)
+
+    def retain(self, alive_pids: set[int]) -> int:
+        """
+        Removes entries of processes that have exited.
+
+        :param alive_pids: IDs of currently running processes.
+        :return: Amount of removed entries.
+        """
+        exited = [pid for pid in list(self.entries) if pid not in alive_pids]
+        for pid in exited:
+            self.entries.pop(pid, None)
+
+        if self.last_pid is not None and self.last_pid not in alive_pids:
+            self.last = None
+        return len(exited)
+
+    def clear(self):
+        self.entries.clear()
+        self.last = None
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{len(self.entries)} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+
+# -------------------- backends.py --------------------
+class LASTINPUTINFO(ctypes.Structure):
+    _fields_ = [("cbSize", wintypes.UINT),
+                ("dwTime", wintypes.DWORD)]
+
+
+class XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [("window", ctypes.c_ulong),
+                ("state", ctypes.c_int),
+                ("kind", ctypes.c_int),
+                ("til_or_since", ctypes.c_ulong),
+                ("idle", ctypes.c_ulong),
+                ("eventMask", ctypes.c_ulong)]
+
+
+class ForegroundBackend:
+    """
+    Base class of OS-specific process and window introspection.
+
+    Everything the script needs to know about the system (active window, its process,
+    process executable, user idle time, sound playback) goes through a backend,
+    so the naming pipeline doesn't depend on a specific OS.
+    """
+    name = "base"
+
+    def get_active_window(self) -> int:
+        """
+        Returns handle (or any other unique ID) of the current active window.
+        """
+        raise NotImplementedError
+
+    def get_window_pid(self, window: int) -> int:
+        """
+        Returns process ID of the window.
+
+        :param window: Window handle (from `get_active_window`).
+        """
+        raise NotImplementedError
+
+    def get_active_window_pid(self) -> int:
+        """
+        Returns process ID of the current active window.
+        """
+        return self.get_window_pid(self.get_active_window())
+
+    def get_window_title(self, window: int) -> str:
+        """
+        Returns title of the window.
+
+        :param window: Window handle (from `get_active_window`).
+        """
+        return ""
+
+    def get_executable_product_name(self, path: str | Path) -> str:
+        """
+        Returns product name of the executable from its metadata (e.g. version resource), or an empty string.
+        It can be slow, results should be cached.
+
+        :param path: Executable path.
+        """
+        return ""
+
+    def get_process_creation_time(self, pid: int) -> int:
+        """
+        Returns process creation time (in any units, used only to tell apart processes with the same ID).
+
+        :param pid: Process ID.
+        """
+        raise NotImplementedError
+
+    def get_executable_path(self, pid: int) -> str:
+        """
+        Returns path of process's executable.
+
+        :param pid: Process ID.
+        """
+        raise NotImplementedError
+
+    def get_running_process_ids(self) -> set[int]:
+        """
+        Returns IDs of all currently running processes.
+        """
+        raise NotImplementedError
+
+    def get_time_since_last_input(self) -> int:
+        """
+        Returns the time (in seconds) since the last mouse or keyboard input.
+        """
+        return 0
+
+    def play_sound(self, path: str | Path):
+        """
+        Plays sound (.wav) asynchronously.
+
+        :param path: Path to sound.
+        """
+
+
+class WindowsBackend(ForegroundBackend):
+    """
+    Windows backend (user32, kernel32, psapi, version).
+    """
+    name = "windows"
+    VERSION_INFO_FIELDS = ("ProductName", "FileDescription")
+    VERSION_INFO_TRANSLATIONS = ("040904b0", "040904e4", "000004b0")  # English (Unicode / Windows-1252), neutral.
+
+    def __init__(self):
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.psapi = ctypes.windll.psapi
+        self.version = ctypes.windll.version
+
+    def get_active_window(self) -> int:
+        return self.user32.GetForegroundWindow()
+
+    def get_window_pid(self, window: int) -> int:
+        pid = wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(window, ctypes.byref(pid))
+        return pid.value
+
+    def get_window_title(self, window: int) -> str:
+        length = self.user32.GetWindowTextLengthW(window)
+        title_buffer = ctypes.create_unicode_buffer(length + 1)
+        self.user32.GetWindowTextW(window, title_buffer, length + 1)
+        return title_buffer.value
+
+    def get_executable_product_name(self, path: str | Path) -> str:
+        size = self.version.GetFileVersionInfoSizeW(str(path), None)
+        if not size:
+            return ""
+        info = ctypes.create_string_buffer(size)
+        if not self.version.GetFileVersionInfoW(str(path), 0, size, info):
+            return ""
+
+        value, length = ctypes.c_void_p(), wintypes.UINT()
+        translations = []
+        if (self.version.VerQueryValueW(info, "\\VarFileInfo\\Translation", ctypes.byref(value), ctypes.byref(length))
+                and length.value >= 4):
+            language, codepage = (wintypes.WORD * 2).from_address(value.value)
+            translations.append(f"{language:04x}{codepage:04x}")
+        translations.extend(self.VERSION_INFO_TRANSLATIONS)
+
+        for field in self.VERSION_INFO_FIELDS:
+            for translation in translations:
+                if (self.version.VerQueryValueW(info, f"\\StringFileInfo\\{translation}\\{field}",
+                                                ctypes.byref(value), ctypes.byref(length))
+                        and length.value and (name := ctypes.wstring_at(value, length.value).strip("\0 "))):
+                    return name
+        return ""
+
+    def get_process_creation_time(self, pid: int) -> int:
+        process_handle = self.kernel32.OpenProcess(0x1000, False, pid)
+        # PROCESS_QUERY_LIMITED_INFORMATION
+
+        if not process_handle:
+            raise OSError(f"Process {pid} does not exist.")
+
+        creation_time, exit_time, kernel_time, user_time = (wintypes.FILETIME() for _ in range(4))
+        result = self.kernel32.GetProcessTimes(process_handle,
+                                               ctypes.byref(creation_time),
+                                               ctypes.byref(exit_time),
+                                               ctypes.byref(kernel_time),
+                                               ctypes.byref(user_time))
+        self.kernel32.CloseHandle(process_handle)
+        if result:
+            return (creation_time.dwHighDateTime << 32) | creation_time.dwLowDateTime
+        else:
+            raise RuntimeError(f"Cannot get creation time for process {pid}.")
+
+    def get_executable_path(self, pid: int) -> str:
+        process_handle = self.kernel32.OpenProcess(0x0400 | 0x0010, False, pid)
+        # PROCESS_QUERY_INFORMATION | PROCESS_VM_READ
+
+        if not process_handle:
+            raise OSError(f"Process {pid} does not exist.")
+
+        filename_buffer = ctypes.create_unicode_buffer(260)  # Windows path is 260 characters max.
+        result = self.psapi.GetModuleFileNameExW(process_handle, None, filename_buffer, 260)
+        self.kernel32.CloseHandle(process_handle)
+        if result:
+            return filename_buffer.value
+        else:
+            raise RuntimeError(f"Cannot get executable path for process {pid}.")
+
+    def get_running_process_ids(self) -> set[int]:
+        size = 1024
+        while True:
+            pids = (wintypes.DWORD * size)()
+            bytes_returned = wintypes.DWORD()
+            if not self.psapi.EnumProcesses(pids, ctypes.sizeof(pids), ctypes.byref(bytes_returned)):
+                raise RuntimeError("Cannot enumerate processes.")
+
+            amount = bytes_returned.value // ctypes.sizeof(wintypes.DWORD)
+            if amount < size:  # If the buffer is full, there may be more processes.
+                return set(pids[:amount])
+            size *= 2
+
+    def get_time_since_last_input(self) -> int:
+        last_input_info = LASTINPUTINFO()
+        last_input_info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+
+        if self.user32.GetLastInputInfo(ctypes.byref(last_input_info)):
+            current_time = self.kernel32.GetTickCount()
+            idle_time_ms = current_time - last_input_info.dwTime
+            return idle_time_ms // 1000
+        return 0
+
+    def play_sound(self, path: str | Path):
+        import winsound
+        with suppress(Exception):
+            winsound.PlaySound(str(path), winsound.SND_ASYNC)
+
+
+class LinuxBackend(ForegroundBackend):
+    """
+    Linux backend.
+
+    Processes are inspected through `/proc/<pid>/exe` and `/proc/<pid>/stat`.
+    Active window and idle time are taken from X11 (EWMH `_NET_ACTIVE_WINDOW` / `_NET_WM_PID`
+    and XScreenSaver extension), if X11 display is available.
+    The display connection is used by the sampler thread and by the OBS thread, so every Xlib call is made
+    under `x_lock` (`XInitThreads` is not used: it must be called before any other Xlib call in the process,
+    and OBS has already made them when the script is loaded).
+    Product names are taken from `.desktop` entries (`Name` of the entry whose `Exec` / `TryExec` runs the executable).
+    """
+    name = "linux"
+
+    def __init__(self):
+        self.desktop_names: dict[str, str] | None = None  # {executable path or name: entry name}, loaded lazily.
+        self.xlib = None
+        self.xss = None
+        self.display = None
+        self.root = None
+        self.xss_info = None
+        self.x_lock = Lock()
+
+        with suppress(Exception):
+            xlib = ctypes.cdll.LoadLibrary(find_library("X11"))
+            xlib.XOpenDisplay.restype = ctypes.c_void_p
+            xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+            xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+            xlib.XInternAtom.restype = ctypes.c_ulong
+            xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+            xlib.XGetWindowProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong,
+                                                ctypes.c_long, ctypes.c_long, ctypes.c_int, ctypes.c_ulong,
+                                                ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+                                                ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                                                ctypes.POINTER(ctypes.c_void_p)]
+            xlib.XFree.argtypes = [ctypes.c_void_p]
+
+            display = xlib.XOpenDisplay(None)
+            if display:
+                self.xlib, self.display = xlib, display
+                self.root = xlib.XDefaultRootWindow(display)
+                self.atom_active_window = xlib.XInternAtom(display, b"_NET_ACTIVE_WINDOW", False)
+                self.atom_wm_pid = xlib.XInternAtom(display, b"_NET_WM_PID", False)
+                self.atom_wm_name = xlib.XInternAtom(display, b"_NET_WM_NAME", False)
+
+        if self.display:
+            with suppress(Exception):
+                xss = ctypes.cdll.LoadLibrary(find_library("Xss"))
+                xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+                xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                                      ctypes.POINTER(XScreenSaverInfo)]
+                self.xss, self.xss_info = xss, xss.XScreenSaverAllocInfo()
+
+    def get_active_window(self) -> int:
+        if not self.display:
+            raise OSError("X11 display is not available.")
+
+        window = self._get_window_property(self.root, self.atom_active_window)
+        if not window:
+            raise RuntimeError("Cannot get active window.")
+        return window
+
+    def get_window_pid(self, window: int) -> int:
+        pid = self._get_window_property(window, self.atom_wm_pid)
+        if not pid:
+            raise RuntimeError(f"Cannot get process ID of window {window}.")
+        return pid
+
+    def get_window_title(self, window: int) -> str:
+        return self._get_window_property(window, self.atom_wm_name, text=True) or ""
+
+    def get_executable_product_name(self, path: str | Path) -> str:
+        if self.desktop_names is None:
+            self.desktop_names = self._load_desktop_names()
+        path = str(path)
+        return self.desktop_names.get(path) or self.desktop_names.get(os.path.basename(path), "")
+
+    def get_process_creation_time(self, pid: int) -> int:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        # Process name (2nd field) can contain spaces and brackets, so fields are counted from the last ')'.
+        # starttime is the 22nd field.
+        return int(stat[stat.rindex(b")") + 2:].split()[19])
+
+    def get_executable_path(self, pid: int) -> str:
+        return os.readlink(f"/proc/{pid}/exe")
+
+    def get_running_process_ids(self) -> set[int]:
+        return {int(i) for i in os.listdir("/proc") if i.isdigit()}
+
+    def get_time_since_last_input(self) -> int:
+        if not self.xss:
+            return 0
+        with self.x_lock:
+            if self.xss.XScreenSaverQueryInfo(self.display, self.root, self.xss_info):
+                return self.xss_info.contents.idle // 1000
+        return 0
+
+    def play_sound(self, path: str | Path):
+        with suppress(Exception):
+            subprocess.Popen(["paplay", str(path)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _get_window_property(self, window: int, atom: int, text: bool = False) -> int | str | None:
+        """
+        Returns the first 32-bit value of the X11 window property.
+
+        :param text: Return the whole property as UTF-8 string (e.g. `_NET_WM_NAME`).
+        """
+        actual_type, actual_format = ctypes.c_ulong(), ctypes.c_int()
+        items_amount, bytes_after = ctypes.c_ulong(), ctypes.c_ulong()
+        prop = ctypes.c_void_p()
+        with self.x_lock:
+            status = self.xlib.XGetWindowProperty(self.display, window, atom, 0, 1024 if text else 1, False, 0,
+                                                  ctypes.byref(actual_type), ctypes.byref(actual_format),
+                                                  ctypes.byref(items_amount), ctypes.byref(bytes_after),
+                                                  ctypes.byref(prop))
+            if status or not prop.value:
+                return None
+
+            if text:
+                value = ctypes.string_at(prop, items_amount.value).decode("utf-8", "replace")
+            else:
+                # Format 32 items are stored as C longs.
+                value = ctypes.cast(prop, ctypes.POINTER(ctypes.c_ulong))[0] if items_amount.value else None
+            self.xlib.XFree(prop)
+        return value
+
+    @staticmethod
+    def _load_desktop_names() -> dict[str, str]:
+        """
+        Reads `.desktop` entries from XDG applications folders (user entries override system ones).
+
+        :return: {executable path or name: entry name}
+        """
+        data_dirs = [os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")]
+        data_dirs += (os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share").split(":")
+        data_dirs += ["/var/lib/flatpak/exports/share", os.path.expanduser("~/.local/share/flatpak/exports/share")]
+
+        names = {}
+        for data_dir in reversed(data_dirs):
+            for entry_path in Path(data_dir, "applications").glob("**/*.desktop"):
+                with suppress(OSError, UnicodeDecodeError):
+                    entry, section = {}, None
+                    for line in entry_path.read_text(encoding="utf-8").splitlines():
+                        if line.startswith("["):
+                            section = line.strip()
+                        elif section == "[Desktop Entry]" and "=" in line:
+                            key, value = line.split("=", 1)
+                            entry.setdefault(key.strip(), value.strip())
+
+                    if not entry.get("Name") or entry.get("NoDisplay") == "true":
+                        continue
+                    for command in (entry.get("TryExec", ""), entry.get("Exec", "")):
+                        with suppress(ValueError):
+                            args = shlex.split(command)
+                            while args and (args[0] == "env" or "=" in args[0]):
+                                args.pop(0)
+                            # Launchers shortcuts (e.g. `steam steam://rungameid/...`) don't name the launcher itself.
+                            if args and not any("://" in i for i in args):
+                                names[args[0]] = names[os.path.basename(args[0])] = entry["Name"]
+        return names
+
+
+class SyntheticBackend(ForegroundBackend):
+    """
+    Scripted backend for benchmarks and load tests.
+
+    Active executable is switched according to the script: a list of `(executable path, duration in seconds)`
+    pairs, that is played in a loop. Every executable gets its own fake process.
+    """
+    name = "synthetic"
+
+    def __init__(self, script: list[tuple[str, float]], idle_time: int = 0, clock=time.monotonic):
+        """
+        :param script: List of `(executable path, duration in seconds)` pairs.
+        :param idle_time: Value returned by `get_time_since_last_input`.
+        :param clock: Function that returns current time in seconds.
+        """
+        if not script:
+            raise ValueError("Script is empty.")
+
+        self.script = script
+        self.idle_time = idle_time
+        self.clock = clock
+        self.started_at = clock()
+        self.played_sounds: list[str] = []
+
+        self.segments_ends: list[float] = []
+        total = 0
+        for _, duration in script:
+            total += duration
+            self.segments_ends.append(total)
+
+        self.paths: dict[int, str] = {}  # {pid: "path/to/executable"}
+        self.pids: dict[str, int] = {}  # {"path/to/executable": pid}
+        for path, _ in script:
+            if path not in self.pids:
+                pid = 1000 + len(self.pids) * 4
+                self.pids[path], self.paths[pid] = pid, path
+
+    def get_active_window(self) -> int:
+        position = (self.clock() - self.started_at) % self.segments_ends[-1]
+        return bisect_right(self.segments_ends, position) + 1
+
+    def get_window_pid(self, window: int) -> int:
+        return self.pids[self.script[window - 1][0]]
+
+    def get_window_title(self, window: int) -> str:
+        return Path(self.script[window - 1][0]).stem
+
+    def get_process_creation_time(self, pid: int) -> int:
+        if pid not in self.paths:
+            raise OSError(f"Process {pid} does not exist.")
+        return 0
+
+    def get_executable_path(self, pid: int) -> str:
+        if pid not in self.paths:
+            raise OSError(f"Process {pid} does not exist.")
+        return self.paths[pid]
+
+    def get_running_process_ids(self) -> set[int]:
+        return set(self.paths)
+
+    def get_time_since_last_input(self) -> int:
+        return self.idle_time
+
+    def play_sound(self, path: str | Path):
+        self.played_sounds.append(str(path))
+
+
+def create_backend() -> ForegroundBackend:
+    """
+    Creates backend for the current OS.
+    """
+    if sys.platform == "win32":
+        return WindowsBackend()
+    elif sys.platform.startswith("linux"):
+        return LinuxBackend()
+    raise NotImplementedError(f"{sys.platform} is not supported.")
+
+
+# -------------------- sampler.py --------------------
+class ForegroundSampler(Thread):
+    """
+    Background thread that calls the sampling callback.
+
+    OBS runs script timers on its graphics thread, so sampling in `obs.timer_add` callbacks
+    competes with frame rendering. This thread uses monotonic clock and doesn't accumulate
+    a drift: if a tick was missed, the next one is scheduled from the current time.
+
+    In fixed mode the callback is called every `period` seconds.
+    In adaptive mode the period drops to `min_period` right after the sampled value changes
+    (focus change), and then grows by `backoff` times on every sample with the same value
+    up to `max_period`. If user is idle for `idle_threshold` seconds, `max_period` is used at once.
+    """
+    def __init__(self,
+                 callback,
+                 period: float,
+                 adaptive: bool = False,
+                 min_period: float = 0.25,
+                 max_period: float = 4,
+                 backoff: float = 1.5,
+                 idle_callback=None,
+                 idle_threshold: float = 30):
+        """
+        :param callback: Function without parameters that takes a sample and returns sampled value
+            (used to detect changes in adaptive mode).
+        :param period: Sampling period in seconds (fixed mode).
+        :param adaptive: Use adaptive sampling period.
+        :param min_period: Min sampling period in seconds (adaptive mode).
+        :param max_period: Max sampling period in seconds (adaptive mode).
+        :param backoff: Period multiplier for every sample without changes (adaptive mode).
+        :param idle_callback: Function without parameters that returns user idle time in seconds (adaptive mode).
+        :param idle_threshold: Idle time in seconds after which `max_period` is used (adaptive mode).
+        """
+        super().__init__(name="SmartReplaysSampler", daemon=True)
+        self.callback = callback
+        self.period = period
+        self.adaptive = adaptive
+        self.min_period = min_period
+        self.max_period = max_period
+        self.backoff = backoff
+        self.idle_callback = idle_callback
+        self.idle_threshold = idle_threshold
+
+        self.samples_amount = 0
+        self.cpu_time = 0.0  # CPU time consumed by this thread (in seconds).
+        self.started_at: float | None = None
+        self._last_value = None
+        self._stop_event = Event()
+
+    def run(self):
+        self.started_at = time.monotonic()
+        cpu_started_at = time.thread_time()
+        next_tick = self.started_at
+        period = self.min_period if self.adaptive else self.period
+
+        while not self._stop_event.is_set():
+            value = None
+            with suppress(Exception):
+                value = self.callback()
+            self.samples_amount += 1
+            period = self._get_next_period(value, period)
+            self.cpu_time = time.thread_time() - cpu_started_at
+
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick, delay = time.monotonic(), 0
+            self._stop_event.wait(delay)
+
+    def stop(self, timeout: float | None = 2):
+        """
+        Stops the thread and waits for it to finish.
+
+        :param timeout: Max time to wait in seconds.
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def stats(self) -> str:
+        """
+        Returns sampling statistics (polls and CPU time per hour) as a string.
+        """
+        elapsed = time.monotonic() - self.started_at if self.started_at is not None else 0
+        hours = elapsed / 3600 or 1
+        return (f"mode={'adaptive' if self.adaptive else 'fixed'}, {self.samples_amount} polls in {elapsed:.0f}s "
+                f"({self.samples_amount / hours:.0f} polls/h), "
+                f"CPU time {self.cpu_time * 1000:.1f}ms ({self.cpu_time * 1000 / hours:.1f}ms/h)")
+
+    def _get_next_period(self, value, period: float) -> float:
+        if not self.adaptive:
+            return self.period
+
+        if value != self._last_value:
+            self._last_value = value
+            return self.min_period
+
+        if period >= self.max_period:
+            return self.max_period
+
+        if self.idle_callback is not None:
+            with suppress(Exception):
+                if self.idle_callback() >= self.idle_threshold:
+                    return self.max_period
+        return min(period * self.backoff, self.max_period)
+
+
+# -------------------- session_log.py --------------------
+class SessionLog:
+    """
+    Append-only binary log of focus samples `(timestamp_ms, exe_id)` written through a memory-mapped file.
+
+    Samples are written to the mapped memory, so they're in the OS page cache right after `append`
+    and survive OBS crash (OS flushes the pages on its own). The file is grown by `grow_by` records at once,
+    unused records are zeroed, so the actual amount of records can be recovered even if the header
+    was not updated before a crash.
+
+    Executable paths are stored in the append-only text sidecar (`<log>.paths`: `exe_id<TAB>path` lines),
+    since executable IDs are valid only within the session.
+
+    File layout: header (magic, version, record size, records amount), then records `<qq`.
+    """
+    MAGIC = b"SRSL"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHq")
+    RECORD = struct.Struct("<qq")
+
+    def __init__(self, path: str | Path, grow_by: int = 65536):
+        """
+        :param path: Log file path. If the file exists, new records are appended to it.
+        :param grow_by: Amount of records the file is grown by when it's full.
+        """
+        self.path = Path(path)
+        self.paths_path = self.path.with_name(self.path.name + ".paths")
+        self.grow_by = grow_by
+        self.lock = Lock()
+
+        exists = self.path.exists() and self.path.stat().st_size >= self.HEADER.size
+        self.file = open(self.path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(self.HEADER.size + grow_by * self.RECORD.size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        if not exists:
+            self.HEADER.pack_into(self.mm, 0, self.MAGIC, self.VERSION, self.RECORD.size, 0)
+
+        try:
+            self.size = get_session_log_size(self.mm)
+        except ValueError:
+            self.close()
+            raise ValueError(f"{self.path} is not a session log.")
+        self.capacity = (len(self.mm) - self.HEADER.size) // self.RECORD.size
+        struct.pack_into("<q", self.mm, 8, self.size)
+
+        self.known_ids: set[int] = set(read_session_log_paths(self.paths_path))
+        self.paths_file = open(self.paths_path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, exe_id: int, path: str | Path, ts: float | None = None):
+        """
+        Writes a sample to the log.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param path: Executable path (written to the sidecar the first time the ID is seen).
+        :param ts: Sample timestamp (`time.time()`). If None, current time is used.
+        """
+        ts = time.time() if ts is None else ts
+        with self.lock:
+            if self.mm.closed:
+                return
+            if exe_id not in self.known_ids:
+                self.paths_file.write(f"{exe_id}\t{path}\n")
+                self.paths_file.flush()
+                self.known_ids.add(exe_id)
+
+            if self.size >= self.capacity:
+                self._grow()
+            self.RECORD.pack_into(self.mm, self.HEADER.size + self.size * self.RECORD.size, int(ts * 1000), exe_id)
+            self.size += 1
+            struct.pack_into("<q", self.mm, 8, self.size)
+
+    def flush(self):
+        with self.lock:
+            if not self.mm.closed:
+                self.mm.flush()
+
+    def close(self):
+        with self.lock:
+            if not self.mm.closed:
+                self.mm.flush()
+                self.mm.close()
+            self.file.close()
+            if hasattr(self, "paths_file"):
+                self.paths_file.close()
+
+    def _grow(self):
+        self.mm.flush()
+        self.mm.close()  # Mapped file cannot be resized on Windows.
+        self.capacity += self.grow_by
+        self.file.truncate(self.HEADER.size + self.capacity * self.RECORD.size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+
+class SessionStats:
+    """
+    Per-executable active time of a session log.
+    """
+    def __init__(self, paths: dict[int, str], totals: dict[int, float], hourly: dict[int, dict[int, float]]):
+        """
+        :param paths: {exe_id: executable_path}
+        :param totals: {exe_id: active_seconds_amount}
+        :param hourly: {hour_timestamp: {exe_id: active_seconds_amount}}
+        """
+        self.paths = paths
+        self.totals = totals
+        self.hourly = hourly
+
+    def top(self, amount: int = 5) -> list[tuple[str, float]]:
+        """
+        Returns `amount` executables with the biggest active time: [(executable_path, active_seconds_amount), ...]
+        """
+        ids = sorted(self.totals, key=self.totals.get, reverse=True)[:amount]
+        return [(self.paths.get(i, f"#{i}"), self.totals[i]) for i in ids]
+
+
+def get_session_log_size(buffer) -> int:
+    """
+    Returns the actual amount of records in the session log.
+    Header may be behind if OBS crashed right after writing a record, so the following non-zero records are counted too
+    (records are written sequentially, so the first zero record is found with binary search).
+
+    :param buffer: Session log content (e.g. `mmap`).
+    """
+    magic, version, record_size, size = SessionLog.HEADER.unpack_from(buffer, 0)
+    if magic != SessionLog.MAGIC or version != SessionLog.VERSION or record_size != SessionLog.RECORD.size:
+        raise ValueError
+
+    capacity = (len(buffer) - SessionLog.HEADER.size) // record_size
+    low, high = min(size, capacity), capacity
+    while low < high:
+        middle = (low + high) // 2
+        if SessionLog.RECORD.unpack_from(buffer, SessionLog.HEADER.size + middle * record_size)[0]:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def read_session_log_paths(paths_path: str | Path) -> dict[int, str]:
+    """
+    Reads session log sidecar with executable paths.
+
+    :param paths_path: Sidecar path (`<log>.paths`).
+    :return: {exe_id: executable_path}
+    """
+    paths = {}
+    if not os.path.exists(paths_path):
+        return paths
+
+    with open(paths_path, "r", encoding="utf-8") as f:
+        for line in f:
+            exe_id, sep, path = line.rstrip("\n").partition("\t")
+            if sep and exe_id.isdigit():
+                paths[int(exe_id)] = path
+    return paths
+
+
+def analyze_session_log(path: str | Path, max_gap: float = 3) -> SessionStats:
+    """
+    Computes per-executable totals and per-hour histograms of the session log.
+
+    The log is mapped into memory and read without copying: as a NumPy structured array if NumPy is available,
+    otherwise as a `memoryview` of int64 values. Time between two samples is attributed to the first one,
+    but not more than `max_gap` seconds (sampling was interrupted).
+
+    :param path: Log file path.
+    :param max_gap: Max time in seconds between two samples of the same run.
+    """
+    path = Path(path)
+    paths = read_session_log_paths(path.with_name(path.name + ".paths"))
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        try:
+            size = get_session_log_size(mm)
+        except ValueError:
+            raise ValueError(f"{path} is not a session log.")
+
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is not None:
+            totals, hourly = _analyze_numpy(np, mm, size, max_gap)
+        else:
+            totals, hourly = _analyze_memoryview(mm, size, max_gap)
+    return SessionStats(paths, totals, hourly)
+
+
+def _analyze_numpy(np, buffer, size: int, max_gap: float):
+    records = np.frombuffer(buffer, dtype=[("ts", "<i8"), ("exe_id", "<i8")],
+                            count=size, offset=SessionLog.HEADER.size)
+    try:
+        if size < 2:
+            return {}, {}
+        durations = np.clip(np.diff(records["ts"]) / 1000, 0, max_gap)
+        exe_ids = records["exe_id"][:-1].copy()
+        hours = records["ts"][:-1] // 3_600_000
+    finally:
+        del records  # Release the buffer, so the mapping can be closed.
+
+    first_hour = int(hours.min())
+    hours_amount = int(hours.max()) - first_hour + 1
+    totals = np.bincount(exe_ids, weights=durations)
+    exe_amount = len(totals)
+    hourly = np.bincount((hours - first_hour) * exe_amount + exe_ids, weights=durations,
+                         minlength=hours_amount * exe_amount).reshape(hours_amount, exe_amount)
+
+    totals_dict = {int(i): float(totals[i]) for i in np.flatnonzero(totals)}
+    hourly_dict = {}
+    for hour_index, row in enumerate(hourly):
+        if len(ids := np.flatnonzero(row)):
+            hourly_dict[(first_hour + hour_index) * 3600] = {int(i): float(row[i]) for i in ids}
+    return totals_dict, hourly_dict
+
+
+def _analyze_memoryview(buffer, size: int, max_gap: float):
+    view = memoryview(buffer)[SessionLog.HEADER.size:SessionLog.HEADER.size + size * SessionLog.RECORD.size]
+    values = view.cast("q")
+    if sys.byteorder != "little":
+        values = [int.from_bytes(view[i:i + 8], "little", signed=True) for i in range(0, len(view), 8)]
+
+    totals, hourly = {}, {}
+    try:
+        for i in range(0, 2 * size - 2, 2):
+            ts, exe_id = values[i], values[i + 1]
+            duration = max(0, min((values[i + 2] - ts) / 1000, max_gap))
+            totals[exe_id] = totals.get(exe_id, 0) + duration
+            hour = hourly.setdefault(ts // 3_600_000 * 3600, {})
+            hour[exe_id] = hour.get(exe_id, 0) + duration
+    finally:
+        if isinstance(values, memoryview):
+            values.release()
+        view.release()
+    return totals, hourly
+
+
+# -------------------- templates.py --------------------
+class ClipTemplate:
+    """
+    File name / folder template compiled into a list of segments.
+
+    Template is parsed once: script variables (`%NAME`, `%APPS`, `%SCENE`, `%TITLE`, `%BUFLEN`, `%SEQ`)
+    become variable segments, everything else becomes either a static text segment or a `strftime` segment
+    (if it contains date directives). Date directives and prohibited characters are validated at compile time,
+    so rendering is just joining the segments. Prohibited characters in variables values are replaced with `_`.
+
+    If `separators` are set (folder templates, e.g. `%NAME/%Y-%m`), the template is split into several parts
+    (one part per folder). Parts can't be `.` / `..` (or other names of dots and spaces), so a clip can't be saved
+    outside the base folder: such template parts are rejected, such rendered parts (e.g. `%NAME` is `..`)
+    get their dots replaced with `_`.
+    """
+    VARIABLES_RE = re.compile(r"%(APPS|NAME|SCENE|TITLE|BUFLEN|SEQ)")
+    SAMPLE_DATETIME = datetime(2000, 12, 31, 23, 59, 59)
+    TEXT, DATE, VARIABLE = range(3)
+
+    def __init__(self, template: str, prohibited_chars: str, separators: str = ""):
+        """
+        Raises ValueError if the template is empty or has invalid date directives.
+        Raises SyntaxError if the template (or its date directives output) contains prohibited characters.
+
+        :param template: Template string.
+        :param prohibited_chars: Characters that are not allowed in a rendered part.
+        :param separators: Characters that split the template into parts (folders).
+        """
+        if not template:
+            raise ValueError
+
+        self.template = template
+        self.variables: set[str] = set()  # Names of variables used in the template (without %).
+        self.parts: list[list[tuple[int, str]]] = []
+        self.replacement_table = str.maketrans({i: "_" for i in prohibited_chars + separators})
+
+        raw_parts = re.split(f"[{re.escape(separators)}]", template) if separators else [template]
+        for raw_part in raw_parts:
+            if not raw_part.strip(" ."):
+                raise ValueError
+            self.parts.append(self._compile_part(raw_part, prohibited_chars))
+
+    def uses(self, variable: str) -> bool:
+        """
+        Checks if the template uses the variable.
+
+        :param variable: Variable name (without %), e.g. `SCENE`.
+        """
+        return variable in self.variables
+
+    def render_parts(self, values: dict[str, str], dt: datetime | None = None) -> list[str]:
+        """
+        Renders every part of the template.
+
+        :param values: Variables values: {variable_name: value}. Missing variables are rendered as empty strings.
+        :param dt: Optional datetime object; uses current time if None.
+        """
+        dt = dt or datetime.now()
+        table = self.replacement_table
+        result = []
+        for part in self.parts:
+            rendered = []
+            for kind, value in part:
+                if kind == self.TEXT:
+                    rendered.append(value)
+                elif kind == self.DATE:
+                    rendered.append(dt.strftime(value))
+                else:
+                    rendered.append(str(values.get(value, "")).translate(table))
+            rendered = "".join(rendered)
+            if rendered and not rendered.strip(" ."):
+                rendered = rendered.replace(".", "_")
+            result.append(rendered)
+        return result
+
+    def render(self, values: dict[str, str], dt: datetime | None = None) -> str:
+        """
+        Renders the template as a single string (parts are joined with `/`).
+
+        :param values: Variables values: {variable_name: value}.
+        :param dt: Optional datetime object; uses current time if None.
+        """
+        return "/".join(self.render_parts(values, dt))
+
+    def _compile_part(self, raw_part: str, prohibited_chars: str) -> list[tuple[int, str]]:
+        segments = []
+        for index, chunk in enumerate(self.VARIABLES_RE.split(raw_part)):
+            if index % 2:
+                self.variables.add(chunk)
+                segments.append((self.VARIABLE, chunk))
+                continue
+            if not chunk:
+                continue
+
+            try:
+                sample = self.SAMPLE_DATETIME.strftime(chunk)
+            except Exception as e:
+                raise ValueError from e
+
+            if any(i in sample for i in prohibited_chars):
+                raise SyntaxError
+            segments.append((self.DATE if "%" in chunk else self.TEXT, chunk))
+        return segments
+
+
+# -------------------- aliases.py --------------------
+class AliasTrie:
+    """
+    Trie of aliases paths, built from case-folded path components.
+
+    Both exact executable paths and folders are stored in the same trie, so the longest matching prefix
+    (the executable itself or its closest aliased parent folder) is found in a single walk over
+    the path components. Lookup time depends on the path depth only, not on the amount of aliases.
+    Paths are case-folded and both `\\` and `/` are treated as separators, so `C:\\Games` and `c:/games`
+    are the same key.
+    """
+    SEPARATORS_RE = re.compile(r"[\\/]+")
+    VALUE_KEY = ""  # Path components are never empty, so an empty key is used to store an alias in a node.
+
+    def __init__(self):
+        self.root: dict = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def split_path(cls, path: str | Path) -> list[str]:
+        """
+        Splits the path into case-folded components.
+
+        :param path: File or folder path.
+        """
+        return [i for i in cls.SEPARATORS_RE.split(str(path).casefold()) if i]
+
+    def add(self, path: str | Path, alias: str) -> bool:
+        """
+        Adds an alias. Returns False if the path already has an alias (it's not replaced).
+
+        :param path: Executable or folder path.
+        :param alias: Alias.
+        """
+        node = self.root
+        for part in self.split_path(path):
+            node = node.setdefault(part, {})
+        if self.VALUE_KEY in node:
+            return False
+
+        node[self.VALUE_KEY] = alias
+        self.size += 1
+        return True
+
+    def find(self, path: str | Path) -> str | None:
+        """
+        Returns alias of the path itself or of its closest parent folder, or None if there is no alias.
+
+        :param path: Executable path.
+        """
+        return self.match(path)[0]
+
+    def match(self, path: str | Path) -> tuple[str | None, bool]:
+        """
+        Returns alias of the path itself or of its closest parent folder (or None if there is no alias)
+        and whether it's an alias of the path itself.
+
+        :param path: Executable path.
+        """
+        return self.match_parts(self.split_path(path))
+
+    def match_parts(self, parts: list[str]) -> tuple[str | None, bool]:
+        """
+        Same as `match`, but takes path already split into case-folded components (see `split_path`).
+        """
+        node = self.root
+        alias, exact = None, False
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                return alias, False
+            if self.VALUE_KEY in node:
+                alias, exact = node[self.VALUE_KEY], True
+            else:
+                exact = False
+        return alias, exact
+
+
+class AliasPattern:
+    """
+    Glob or regex alias, compiled as a part of a combined regex (see `AliasMatcher`).
+    """
+    PLACEHOLDER_RE = re.compile(r"\{(\w+)}")
+
+    def __init__(self, index: int, regex: str, alias: str, prefix: str, key: str | None = None):
+        """
+        :param index: Pattern index (priority).
+        :param regex: Regex of the pattern (its group names are already prefixed).
+        :param alias: Alias, can contain `{1}` (captured group number) or `{name}` (captured group name) placeholders.
+        :param prefix: Prefix of the pattern's group names.
+        :param key: Case-folded path component that every matching path contains (if known).
+        """
+        self.index = index
+        self.regex = regex
+        self.alias = alias
+        self.prefix = prefix
+        self.key = key
+        # Compiled in the same form as in the combined regex, so invalid patterns are rejected by `AliasMatcher.add`.
+        self.compiled = re.compile(f"(?:{regex})", re.IGNORECASE)
+        self.groups_amount = self.compiled.groups
+        self.group = 0  # Index of the pattern's outer group in the combined regex (set by `AliasMatcher.compile`).
+        self.has_placeholders = bool(self.PLACEHOLDER_RE.search(alias))
+        self.replacement_table: dict = {}  # `str.translate` table for captured values (set by `AliasMatcher`).
+
+    def render(self, match: re.Match, offset: int = 0) -> str:
+        """
+        Substitutes captured groups into the alias. Prohibited characters of captured values are replaced with `_`.
+
+        :param match: Match of the pattern (or of the combined regex).
+        :param offset: Index of the pattern's first group in the match groups.
+        """
+        if not self.has_placeholders:
+            return self.alias
+
+        groups = match.groups()[offset:offset + self.groups_amount]
+
+        def replace(placeholder: re.Match) -> str:
+            key = placeholder.group(1)
+            if key.isdigit():
+                value = groups[int(key) - 1] if 0 < int(key) <= len(groups) else None
+            else:
+                value = match.groupdict().get(self.prefix + key)
+            return (value or "").translate(self.replacement_table)
+
+        return self.PLACEHOLDER_RE.sub(replace, self.alias)
+
+
+class AliasMatcher:
+    """
+    All aliases of the script compiled into a few lookup structures.
+
+    Supported alias paths:
+        - exact executable paths and folders (`C:\\Games\\Apex`) - `AliasTrie`;
+        - executable names (`valorant.exe`) - dict of case-folded names;
+        - globs (`*\\steamapps\\common\\<game>\\**`): `*` - any characters within a path component,
+          `**` - any characters, `?` - any character, `<name>` - captures a path component;
+        - regexes (`re:.*\\(\\w+)-Win64-Shipping\\.exe`).
+
+    Alias of a glob or regex can contain `{1}` / `{name}` placeholders that are replaced with captured groups.
+
+    Globs with a literal path component (e.g. `steamapps`) are indexed by it, so only the patterns which
+    components are present in the path are tried. Other globs and regexes are compiled into combined
+    alternation regexes (up to `CHUNK_SIZE` patterns in each), so a lookup is one regex match per chunk
+    instead of a match per pattern. The matched pattern is found by the index of the last closed group
+    (pattern's outer group).
+
+    Priority: exact executable path, executable name, patterns (in the order they were added), closest folder.
+    Matching is case-insensitive.
+    """
+    CHUNK_SIZE = 200
+    GLOB_TOKENS_RE = re.compile(r"\*\*|\*|\?|<(\w+)>|[\\/]+")
+    NAMED_GROUP_RE = re.compile(r"\(\?P([<=])(\w+)")
+    NUMBERED_BACKREFERENCE_RE = re.compile(r"\\\d")
+    GLOBAL_FLAGS_RE = re.compile(r"\(\?([ims]+)\)")
+
+    def __init__(self, prohibited_chars: str = ""):
+        """
+        :param prohibited_chars: Characters that are replaced with `_` in captured groups.
+        """
+        self.trie = AliasTrie()
+        self.names: dict[str, str] = {}  # {case-folded executable name: alias}
+        self.patterns: list[AliasPattern] = []
+        self.keys: dict[str, list[AliasPattern]] = {}  # {case-folded path component: [pattern, ...]}
+        self.chunks: list[tuple[re.Pattern, dict[int, AliasPattern]]] = []  # [(regex, {group: pattern}), ...]
+        self.replacement_table = str.maketrans({i: "_" for i in prohibited_chars})
+
+    def __len__(self) -> int:
+        return len(self.trie) + len(self.names) + len(self.patterns)
+
+    @staticmethod
+    def is_pattern(path: str) -> bool:
+        """
+        Checks if the alias path is a glob or regex.
+        """
+        return path.startswith("re:") or any(i in path for i in "*?<")
+
+    def add(self, path: str, alias: str) -> bool:
+        """
+        Adds an alias. Returns False if the path already has an alias.
+        Raises `re.error` if the path is an invalid regex.
+        Patterns are not matched until `compile` is called.
+
+        :param path: Executable path, folder path, executable name, glob or regex (with `re:` prefix).
+        :param alias: Alias.
+        """
+        if self.is_pattern(path):
+            pattern = self._create_pattern(len(self.patterns), path, alias)
+            pattern.replacement_table = self.replacement_table
+            self.patterns.append(pattern)
+            return True
+        elif not any(i in path for i in "\\/"):
+            key = path.casefold()
+            if key in self.names:
+                return False
+            self.names[key] = alias
+            return True
+        return self.trie.add(path, alias)
+
+    def compile(self):
+        """
+        Compiles patterns into combined regexes.
+        """
+        keys, chunks = {}, []
+        for pattern in self.patterns:
+            if pattern.key:
+                keys.setdefault(pattern.key, []).append(pattern)
+
+        not_indexed = [pattern for pattern in self.patterns if not pattern.key]
+        for start in range(0, len(not_indexed), self.CHUNK_SIZE):
+            patterns, regexes, group = {}, [], 1
+            for pattern in not_indexed[start:start + self.CHUNK_SIZE]:
+                pattern.group = group
+                patterns[group] = pattern
+                regexes.append(f"({pattern.regex})")
+                group += 1 + pattern.groups_amount
+            chunks.append((re.compile("|".join(regexes), re.IGNORECASE), patterns))
+        self.keys, self.chunks = keys, chunks
+
+    def find(self, path: str | Path) -> str | None:
+        """
+        Returns alias of the executable or None if there is no alias.
+
+        :param path: Executable path.
+        """
+        path = str(path)
+        parts = AliasTrie.split_path(path)
+        alias, exact = self.trie.match_parts(parts)
+        if exact:
+            return alias
+
+        if parts and parts[-1] in self.names:
+            return self.names[parts[-1]]
+
+        result = None  # (pattern, match, groups offset)
+        if self.keys:
+            candidates = {pattern.index: pattern for part in parts for pattern in self.keys.get(part, ())}
+            for index in sorted(candidates):
+                if match := candidates[index].compiled.fullmatch(path):
+                    result = (candidates[index], match, 0)
+                    break
+
+        for regex, patterns in self.chunks:
+            if match := regex.fullmatch(path):
+                pattern = patterns[match.lastindex]
+                if result is None or pattern.index < result[0].index:
+                    result = (pattern, match, pattern.group)
+                break
+
+        if result is not None:
+            return result[0].render(result[1], result[2])
+        return alias
+
+    @classmethod
+    def _create_pattern(cls, index: int, path: str, alias: str) -> AliasPattern:
+        prefix, key = f"a{index}_", None
+        if path.startswith("re:"):
+            regex = path[3:]
+            if cls.NUMBERED_BACKREFERENCE_RE.search(regex):
+                raise re.error("Numbered backreferences are not supported.")
+            # Global flags are allowed only at the start of the combined regex, so leading `(?i)` is scoped
+            # to the pattern: `(?i:...)`. Global flags in other places are rejected when the pattern is compiled.
+            if flags := cls.GLOBAL_FLAGS_RE.match(regex):
+                regex = f"(?{flags.group(1)}:{regex[flags.end():]})"
+            # Group names are prefixed, since all patterns are combined in one regex.
+            regex = cls.NAMED_GROUP_RE.sub(lambda m: f"(?P{m.group(1)}{prefix}{m.group(2)}", regex)
+        else:
+            regex = cls._translate_glob(path, prefix)
+            literals = [i for i in AliasTrie.split_path(path) if not any(j in i for j in "*?<")]
+            key = max(literals, key=len, default=None)
+        return AliasPattern(index, regex, alias, prefix, key)
+
+    @classmethod
+    def _translate_glob(cls, glob: str, prefix: str) -> str:
+        """
+        Translates glob into regex. Globs that don't start with a drive or separator match at any depth.
+        """
+        result = [] if re.match(r"[a-zA-Z]:|[\\/]", glob) else [r"(?:.*[\\/])?"]
+        position = 0
+        for token in cls.GLOB_TOKENS_RE.finditer(glob):
+            result.append(re.escape(glob[position:token.start()]))
+            value = token.group(0)
+            if value == "**":
+                result.append(".*")
+            elif value == "*":
+                result.append(r"[^\\/]*")
+            elif value == "?":
+                result.append(r"[^\\/]")
+            elif token.group(1):
+                result.append(f"(?P<{prefix}{token.group(1)}>[^\\\\/]+)")
+            else:
+                result.append(r"[\\/]+")
+            position = token.end()
+        result.append(re.escape(glob[position:]))
+        return "".join(result)
+
+
+class DisplayNameCache:
+    """
+    Bounded LRU memo of executables display names (alias or executable name): {exe_id: display_name}.
+
+    The cache is tagged with aliases generation (incremented every time aliases are reloaded).
+    If a lookup is made with another generation, the cache is cleared first, so names resolved
+    with old aliases are never returned.
+    """
+    def __init__(self, max_size: int = 256):
+        """
+        :param max_size: Max amount of cached names. The least recently used names are evicted.
+        """
+        self.max_size = max_size
+        self.entries: OrderedDict[int, str] = OrderedDict()
+        self.generation = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, exe_id: int, generation: int) -> str | None:
+        """
+        Returns cached display name or None.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param generation: Current aliases generation.
+        """
+        with self.lock:
+            if generation != self.generation:
+                self.entries.clear()
+                self.generation = generation
+
+            name = self.entries.get(exe_id)
+            if name is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(exe_id)
+            self.hits += 1
+            return name
+
+    def put(self, exe_id: int, name: str, generation: int):
+        """
+        Caches display name. Ignored if aliases were reloaded while the name was resolved.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param name: Display name.
+        :param generation: Aliases generation the name was resolved with.
+        """
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[exe_id] = name
+            self.entries.move_to_end(exe_id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{len(self.entries)} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+
+# -------------------- known_games.py --------------------
+class KnownGamesDB:
+    """
+    Read-only database of known games titles: {executable name: title}, e.g. `r5apex > Apex Legends`.
+
+    The database is a sorted binary file (see `compile_known_games`), which is memory-mapped on the first lookup
+    and searched by bisection, so only the touched pages are loaded and nothing is parsed at the script start.
+
+    File layout: header (magic, version, reserved, entries amount), entries offsets `<I` sorted by key,
+    then entries `key\\0title\\0` (UTF-8). Keys are case-folded executable names without `.exe` extension.
+    """
+    MAGIC = b"SRKG"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHHI")
+    OFFSET = struct.Struct("<I")
+
+    def __init__(self, path: str | Path):
+        """
+        :param path: Database file path. The file is opened lazily, it may not exist.
+        """
+        self.path = Path(path)
+        self.lock = Lock()
+        self.file = None
+        self.mm: mmap.mmap | None = None
+        self.size = 0
+        self.error: str | None = None  # Why the database is unavailable.
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def normalize_key(name: str | Path) -> str:
+        """
+        Converts executable name or path to the database key: case-folded name without `.exe` extension.
+
+        :param name: Executable name, stem or path.
+        """
+        name = str(name).replace("\\", "/").rsplit("/", 1)[-1].strip().casefold()
+        return name[:-4] if name.endswith(".exe") else name
+
+    def find(self, name: str | Path) -> str | None:
+        """
+        Returns title of the game or None if the executable is not in the database (or the database is unavailable).
+
+        :param name: Executable name, stem or path.
+        """
+        key = self.normalize_key(name).encode("utf-8")
+        if not key or (mm := self._open()) is None:
+            return None
+
+        self.lookups += 1
+        index = bisect_left(range(self.size), key, key=self._key_at)
+        if index == self.size or self._key_at(index) != key:
+            return None
+
+        self.hits += 1
+        start = mm.find(b"\0", self._offset_at(index)) + 1
+        return mm[start:mm.find(b"\0", start)].decode("utf-8")
+
+    def close(self):
+        with self.lock:
+            if self.mm is not None:
+                self.mm.close()
+            if self.file is not None:
+                self.file.close()
+            self.mm = self.file = None
+            self.size = 0
+            self.error = None
+
+    def stats(self) -> str:
+        if self.error:
+            return f"unavailable ({self.error})"
+        return f"{self.size} entries, {self.lookups} lookups, {self.hits} hits"
+
+    def _open(self) -> mmap.mmap | None:
+        if self.mm is not None or self.error is not None:
+            return self.mm
+
+        with self.lock:
+            if self.mm is not None or self.error is not None:
+                return self.mm
+            try:
+                self.file = open(self.path, "rb")
+                mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:  # ValueError: empty file.
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                self.error = str(e)
+                return None
+
+            magic, version, _, size = self.HEADER.unpack_from(mm) if len(mm) >= self.HEADER.size else (b"", 0, 0, 0)
+            if magic != self.MAGIC or version != self.VERSION or len(mm) < self.HEADER.size + size * self.OFFSET.size:
+                mm.close()
+                self.file.close()
+                self.file = None
+                self.error = f"{self.path} is not a known games database"
+                return None
+
+            self.size = size
+            self.mm = mm
+            return mm
+
+    def _offset_at(self, index: int) -> int:
+        return self.OFFSET.unpack_from(self.mm, self.HEADER.size + index * self.OFFSET.size)[0]
+
+    def _key_at(self, index: int) -> bytes:
+        offset = self._offset_at(index)
+        return self.mm[offset:self.mm.find(b"\0", offset)]
+
+
+def compile_known_games(source: str | Path, target: str | Path, prohibited_chars: str = r'/\:"<>*?|%') -> int:
+    """
+    Compiles known games text list into the binary database (see `KnownGamesDB`).
+
+    Source lines format: `executable > Title` (executable name with or without `.exe`, case-insensitive).
+    Empty lines and lines starting with `#` are skipped.
+    The target file is replaced atomically.
+    If the source has invalid lines, duplicated executables or prohibited characters in titles, raises ValueError.
+
+    :param source: Text list path.
+    :param target: Database path.
+    :param prohibited_chars: Characters that are not allowed in titles (titles are used as file and folder names).
+    :return: Amount of entries.
+    """
+    entries: dict[bytes, bytes] = {}
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = [i.strip() for i in line.rsplit(">", 1)]
+            if len(parts) != 2 or not all(parts):
+                raise ValueError(f"{source}:{line_no}: expected `executable > Title`, got `{line}`.")
+            key, title = KnownGamesDB.normalize_key(parts[0]).encode("utf-8"), parts[1]
+            if any(i in title for i in prohibited_chars):
+                raise ValueError(f"{source}:{line_no}: prohibited characters in `{line}`.")
+            if key in entries:
+                raise ValueError(f"{source}:{line_no}: {parts[0]} is already in the list.")
+            entries[key] = title.encode("utf-8")
+
+    keys = sorted(entries)
+    offsets, blob = [], bytearray()
+    data_start = KnownGamesDB.HEADER.size + len(keys) * KnownGamesDB.OFFSET.size
+    for key in keys:
+        offsets.append(data_start + len(blob))
+        blob += key + b"\0" + entries[key] + b"\0"
+
+    target = Path(target)
+    tmp_path = target.with_name(target.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(KnownGamesDB.HEADER.pack(KnownGamesDB.MAGIC, KnownGamesDB.VERSION, 0, len(keys)))
+        f.write(struct.pack(f"<{len(keys)}I", *offsets))
+        f.write(blob)
+    os.replace(tmp_path, target)
+    return len(keys)
+
+
+# -------------------- friendly_names.py --------------------
+class FriendlyNameCache:
+    """
+    Persistent cache of executables friendly names, keyed by file identity: {path: (size, mtime_ns, name)}.
+
+    Resolving a name (e.g. parsing the version resource of the executable) is slow, so resolved names
+    are stored in a JSON file. An entry is valid only while the executable size and modification time
+    are the same, so updated executables are resolved again.
+    The file is read on the first lookup and written in batches (every `batch_size` new entries and on `flush`).
+    Empty name means that the executable has no friendly name.
+    """
+    VERSION = 1
+
+    def __init__(self, path: str | Path, batch_size: int = 16, max_size: int = 4096):
+        """
+        :param path: Cache file path.
+        :param batch_size: Amount of new entries after which the cache is written.
+        :param max_size: Max amount of entries. The oldest entries are dropped on write.
+        """
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.lock = Lock()
+        self.entries: dict[str, list] | None = None  # {path: [size, mtime_ns, name]}, loaded lazily.
+        self.pending = 0  # Amount of entries that are not written yet.
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries or {})
+
+    def get(self, path: str, size: int, mtime_ns: int) -> str | None:
+        """
+        Returns cached name ("" if the executable has no name) or None if it's not cached or the file was changed.
+
+        :param path: Executable path.
+        :param size: Executable size.
+        :param mtime_ns: Executable modification time (ns).
+        """
+        with self.lock:
+            entry = self._load().get(path)
+            if entry is None or entry[0] != size or entry[1] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def put(self, path: str, size: int, mtime_ns: int, name: str):
+        """
+        Caches the name. The cache is written if there are `batch_size` unwritten entries.
+
+        :param path: Executable path.
+        :param size: Executable size.
+        :param mtime_ns: Executable modification time (ns).
+        :param name: Friendly name ("" if the executable has no name).
+        """
+        with self.lock:
+            entries = self._load()
+            entries.pop(path, None)  # Re-inserted at the end, so the oldest entries are dropped first.
+            entries[path] = [size, mtime_ns, name]
+            self.pending += 1
+            if self.pending >= self.batch_size:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            if self.pending:
+                self._write()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0
+        return f"{len(self)} entries, {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate)"
+
+    def _load(self) -> dict[str, list]:
+        if self.entries is None:
+            self.entries = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self.entries = {path: entry for path, entry in data["entries"].items()
+                                    if isinstance(entry, list) and len(entry) == 3}
+            except (OSError, ValueError, KeyError, AttributeError):  # No cache yet or it's broken.
+                pass
+        return self.entries
+
+    def _write(self):
+        while len(self.entries) > self.max_size:
+            del self.entries[next(iter(self.entries))]
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.VERSION, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:  # Names will be resolved again next time.
+            pass
+        self.pending = 0
+
+
+class FriendlyNameResolver:
+    """
+    Resolves friendly names of executables that have no aliases.
+
+    Sources (in priority order):
+        1. Game folder, if the executable is installed by a game store (e.g. `steamapps/common/Apex Legends/r5apex.exe`);
+        2. Executable metadata from the backend (version resource on Windows, `.desktop` entries on Linux).
+
+    Names are cleaned from trademark signs and prohibited characters and cached in `FriendlyNameCache`.
+    """
+    STORE_FOLDERS = (("steamapps", "common"), ("epic games",), ("gog games",), ("gog galaxy", "games"))
+    STORE_SERVICE_FOLDERS = {"launcher", "steamworks shared", "directxredist"}  # Case-folded, not games.
+    GENERIC_NAMES = {"bootstrappackagedgame", "microsoft windows operating system"}  # Case-folded.
+    TRADEMARKS_RE = re.compile(r"[©®™]|\((?:tm|r|c)\)", re.IGNORECASE)
+    SPACES_RE = re.compile(r"\s+")
+
+    def __init__(self, cache: FriendlyNameCache, prohibited_chars: str):
+        """
+        :param cache: Names cache.
+        :param prohibited_chars: Characters that are removed from names (names are used as file and folder names).
+        """
+        self.cache = cache
+        self.prohibited_chars_re = re.compile(f"[{re.escape(prohibited_chars)}]") if prohibited_chars else None
+
+    def resolve(self, executable_path: str | Path, backend) -> str | None:
+        """
+        Returns friendly name of the executable or None if it has no name.
+
+        :param executable_path: Executable path.
+        :param backend: `ForegroundBackend` used to read executable metadata.
+        """
+        path = str(executable_path)
+        try:
+            stat = os.stat(path)
+        except OSError:  # File identity is unknown, only folder heuristics can be used (they are not cached).
+            return self.get_store_folder_name(path) or None
+
+        name = self.cache.get(path, stat.st_size, stat.st_mtime_ns)
+        if name is None:
+            name = self.get_store_folder_name(path)
+            if not name:
+                try:
+                    name = self.clean_name(backend.get_executable_product_name(path))
+                except Exception:
+                    name = ""
+            self.cache.put(path, stat.st_size, stat.st_mtime_ns, name)
+        return name or None
+
+    def get_store_folder_name(self, executable_path: str | Path) -> str:
+        """
+        Returns name of the game folder if the executable is installed by a game store, otherwise an empty string.
+
+        :param executable_path: Executable path.
+        """
+        parts = [i for i in re.split(r"[\\/]+", str(executable_path)) if i]
+        folded = [i.casefold() for i in parts]
+        for store_parts in self.STORE_FOLDERS:
+            length = len(store_parts)
+            for index in range(len(folded) - length - 1):  # Game folder can't be the executable itself.
+                if (tuple(folded[index:index + length]) == store_parts
+                        and folded[index + length] not in self.STORE_SERVICE_FOLDERS):
+                    return self.clean_name(parts[index + length])
+        return ""
+
+    def clean_name(self, name: str) -> str:
+        """
+        Removes trademark signs and prohibited characters from the name.
+        Returns an empty string if the name is generic (e.g. Unreal Engine bootstrap executable).
+
+        :param name: Name.
+        """
+        name = self.TRADEMARKS_RE.sub("", name or "")
+        if self.prohibited_chars_re is not None:
+            name = self.prohibited_chars_re.sub(" ", name)
+        name = self.SPACES_RE.sub(" ", name).strip(" .")
+        return "" if name.casefold() in self.GENERIC_NAMES else name
+
+
+# -------------------- rules.py --------------------
+class ClipRule:
+    """
+    Overrides of clip settings. `None` means that the setting is not overridden.
+    """
+    __slots__ = ("mode", "template", "save_to_folder", "folder_template", "create_links")
+
+    def __init__(self,
+                 mode: int | None = None,
+                 template: str | None = None,
+                 save_to_folder: bool | None = None,
+                 folder_template: str | None = None,
+                 create_links: bool | None = None):
+        """
+        :param mode: Clip naming mode (`ClipNamingModes` value).
+        :param template: Clip filename template.
+        :param save_to_folder: Save clip to a folder.
+        :param folder_template: Clip folder template.
+        :param create_links: Create hard link of the clip.
+        """
+        self.mode = mode
+        self.template = template
+        self.save_to_folder = save_to_folder
+        self.folder_template = folder_template
+        self.create_links = create_links
+
+    def __repr__(self) -> str:
+        overrides = ", ".join(f"{i}={getattr(self, i)!r}" for i in self.__slots__ if getattr(self, i) is not None)
+        return f"ClipRule({overrides})"
+
+    def merged(self, other: "ClipRule | None") -> "ClipRule":
+        """
+        Returns a new rule with overrides of this rule, overridden by overrides of the `other` rule.
+        """
+        if other is None:
+            return self
+        return ClipRule(*(getattr(self, i) if getattr(other, i) is None else getattr(other, i)
+                          for i in self.__slots__))
+
+
+class ClipRules:
+    """
+    Per-app and per-scene clip rules compiled into a dispatch table.
+
+    App rules targets have the same format as aliases paths (executable / folder path, executable name,
+    glob or regex, see `AliasMatcher`), scene rules are matched by the exact scene name.
+    If both app and scene rules match, scene rule overrides app rule.
+
+    A lookup is a dict lookup of the executable ID (app rules are resolved once per executable
+    until rules are reloaded) and a dict lookup of the scene name, so it doesn't depend on the amount of rules.
+    """
+    def __init__(self):
+        self.app_rules: list[ClipRule] = []
+        self.apps = AliasMatcher()  # Alias of the target is the index of the rule in `app_rules`.
+        self.scenes: dict[str, ClipRule] = {}  # {scene name: rule}
+        self.resolved: dict[int, ClipRule | None] = {}  # {exe_id: app rule}
+
+    def __len__(self) -> int:
+        return len(self.app_rules) + len(self.scenes)
+
+    @property
+    def has_app_rules(self) -> bool:
+        return bool(self.app_rules)
+
+    @property
+    def has_scene_rules(self) -> bool:
+        return bool(self.scenes)
+
+    def add_app_rule(self, target: str, rule: ClipRule) -> bool:
+        """
+        Adds an app rule. Returns False if there is already a rule for the target.
+        Raises `re.error` if the target is an invalid regex.
+        App rules are not matched until `compile` is called.
+
+        :param target: Executable path, folder path, executable name, glob or regex (with `re:` prefix).
+        :param rule: Rule.
+        """
+        if not self.apps.add(target, str(len(self.app_rules))):
+            return False
+        self.app_rules.append(rule)
+        return True
+
+    def add_scene_rule(self, scene: str, rule: ClipRule) -> bool:
+        """
+        Adds a scene rule. Returns False if there is already a rule for the scene.
+
+        :param scene: Scene name.
+        :param rule: Rule.
+        """
+        if scene in self.scenes:
+            return False
+        self.scenes[scene] = rule
+        return True
+
+    def compile(self):
+        self.apps.compile()
+        self.resolved.clear()
+
+    def find(self, exe_id: int | None, executable_path: str | Path | None, scene: str | None) -> ClipRule | None:
+        """
+        Returns rule of the app and scene (merged, if both have rules) or None if there are no rules for them.
+
+        :param exe_id: Executable ID (from `ExeRegistry`).
+        :param executable_path: Executable path.
+        :param scene: Scene name.
+        """
+        app_rule = None
+        if exe_id is not None and self.app_rules:
+            try:
+                app_rule = self.resolved[exe_id]
+            except KeyError:
+                index = self.apps.find(executable_path)
+                app_rule = self.resolved[exe_id] = self.app_rules[int(index)] if index is not None else None
+
+        scene_rule = self.scenes.get(scene) if scene is not None else None
+        if app_rule is None:
+            return scene_rule
+        return app_rule.merged(scene_rule)
+
+
+# -------------------- save_request.py --------------------
+class SaveRequest:
+    """
+    Clip naming inputs and results captured at the moment of the save request (e.g. hotkey press).
+
+    The clip destination is generated before OBS writes the clip file, so it's based on the app, scene
+    and exe history at the moment the user asked to save the clip (not after OBS finished writing it,
+    when the user may have already switched to another app), and only the file renaming is left
+    for the moment the clip is saved.
+    The file extension is known only after saving, so `filename` has no extension.
+
+    The same class is used for the save plan: the destination generated in advance for the current app and scene.
+    A plan is reused while its `key` (the inputs it was generated for) matches the current ones, only the date parts
+    of the templates are rendered again.
+    """
+    __slots__ = ("mode", "ts", "clip_span", "clip_settings", "clip_name", "folder", "filename",
+                 "values", "templates", "base_folder", "key", "folder_exists")
+
+    def __init__(self,
+                 mode: int | None,
+                 ts: float,
+                 clip_span: tuple[float, float],
+                 clip_settings: ClipRule,
+                 clip_name: str,
+                 folder: Path | None = None,
+                 filename: str | None = None,
+                 values: dict[str, str] | None = None,
+                 templates: list[ClipTemplate] | None = None,
+                 base_folder: Path | None = None,
+                 key: tuple | None = None,
+                 folder_exists: bool = False):
+        """
+        :param mode: Forced clip naming mode (`ClipNamingModes` value) or None.
+        :param ts: Request timestamp (`time.time()`).
+        :param clip_span: Start and end timestamps of the clip.
+        :param clip_settings: Clip settings the destination was generated with.
+        :param clip_name: Base name of the clip.
+        :param folder: Destination folder (None until rendered, see `render_save_request`).
+        :param filename: Destination file name without extension (None until rendered).
+        :param values: Templates variables values.
+        :param templates: Compiled filename template and folder template (if clip is saved to a folder).
+        :param base_folder: Clips base folder.
+        :param key: Inputs the destination depends on (`(exe_id, scene_name)`) or None if it can't be reused.
+        :param folder_exists: Destination folder is known to exist.
+        """
+        self.mode = mode
+        self.ts = ts
+        self.clip_span = clip_span
+        self.clip_settings = clip_settings
+        self.clip_name = clip_name
+        self.folder = folder
+        self.filename = filename
+        self.values = values or {}
+        self.templates = templates or []
+        self.base_folder = base_folder
+        self.key = key
+        self.folder_exists = folder_exists
+
+    def __repr__(self) -> str:
+        if self.filename is None:
+            return f"SaveRequest(clip_name={self.clip_name!r}, path=None)"
+        return f"SaveRequest(clip_name={self.clip_name!r}, path={str(self.folder / self.filename)!r})"
+
+    def age(self, now: float | None = None) -> float:
+        """
+        Returns seconds passed since the request.
+
+        :param now: Current timestamp (`time.time()`). If None, current time is used.
+        """
+        return (time.time() if now is None else now) - self.ts
+
+
+# -------------------- unique_names.py --------------------
+class UniqueNameAllocator:
+    """
+    Moves files to unique paths: `name.ext`, `name (1).ext`, `name (2).ext`, ...
+
+    A path is claimed atomically, so an existing file is never overwritten, even by a concurrent save:
+    the file is hard-linked to the new path and the old name is removed (`os.link` fails if the path exists).
+    If hard links are not supported (e.g. FAT file systems), the new path is reserved with exclusive creation
+    and then replaced with the file.
+
+    Highest used suffixes are cached per folder and name, so the next free path is claimed at the first try.
+    The folder is listed only on the first collision of the name (instead of checking `(1)`, `(2)`, ... one by one).
+    The cache only holds hints, not reservations: if a cached suffix is taken, the folder is listed again,
+    and if files are deleted, numbering just continues from the cached suffix.
+    """
+    def __init__(self, max_size: int = 256):
+        """
+        :param max_size: Max amount of cached folders. The oldest folders are dropped first.
+        """
+        self.max_size = max_size
+        self.lock = Lock()
+        self.suffixes: dict[str, dict[str, int]] = {}  # {folder: {normalized file name: highest used suffix}}
+        self.no_links: set[str] = set()  # Folders on file systems without hard links.
+        self.claims = 0
+        self.collisions = 0
+        self.scans = 0
+
+    def move(self, src: str | Path, folder: str | Path, stem: str, ext: str) -> Path:
+        """
+        Moves `src` to a unique path in `folder` and returns the new path.
+        If `src` or `folder` doesn't exist, raises FileNotFoundError.
+
+        :param src: File to move.
+        :param folder: Destination folder.
+        :param stem: Destination file name without extension.
+        :param ext: Destination file extension (without dot).
+        """
+        folder = str(folder)
+        key = os.path.normcase(f"{stem}.{ext}")
+        with self.lock:
+            suffix = self._next_suffix(folder, key)
+            while True:
+                path = Path(folder, f"{stem}.{ext}" if not suffix else f"{stem} ({suffix}).{ext}")
+                self.claims += 1
+                try:
+                    self._claim(str(src), str(path), folder)
+                except FileExistsError:
+                    self.collisions += 1
+                    suffix = max(suffix, self._scan(folder, stem, ext)) + 1
+                    continue
+                self._remember(folder, key, suffix)
+                return path
+
+    def stats(self) -> dict:
+        return {"folders": len(self.suffixes), "claims": self.claims,
+                "collisions": self.collisions, "scans": self.scans}
+
+    def _next_suffix(self, folder: str, key: str) -> int:
+        """
+        Returns the suffix that is probably free: the next after the highest used one, or 0 (no suffix).
+        """
+        used = self.suffixes.get(folder, {}).get(key)
+        return 0 if used is None else used + 1
+
+    def _remember(self, folder: str, key: str, suffix: int):
+        names = self.suffixes.pop(folder, None)  # Re-inserted at the end, so the oldest folders are dropped first.
+        if names is None:
+            names = {}
+            while len(self.suffixes) >= self.max_size:
+                self.suffixes.pop(next(iter(self.suffixes)))
+        self.suffixes[folder] = names
+        names[key] = max(suffix, names.get(key, 0))
+
+    def _scan(self, folder: str, stem: str, ext: str) -> int:
+        """
+        Returns the highest suffix of the files named `stem (N).ext` in the folder (0 if there are none).
+        """
+        self.scans += 1
+        flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+        pattern = re.compile(rf"{re.escape(stem)} \((\d+)\)\.{re.escape(ext)}", flags)
+        highest = 0
+        with suppress(OSError), os.scandir(folder) as entries:
+            for entry in entries:
+                if match := pattern.fullmatch(entry.name):
+                    highest = max(highest, int(match.group(1)))
+        return highest
+
+    def _claim(self, src: str, dst: str, folder: str):
+        """
+        Moves `src` to `dst`. If `dst` exists, raises FileExistsError.
+        """
+        if folder not in self.no_links:
+            try:
+                os.link(src, dst)
+            except (FileExistsError, FileNotFoundError):
+                raise
+            except OSError:
+                self.no_links.add(folder)  # Different drives or no hard links support.
+            else:
+                try:
+                    os.unlink(src)
+                except OSError:
+                    os.unlink(dst)
+                    raise
+                return
+
+        os.close(os.open(dst, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        try:
+            os.replace(src, dst)
+        except OSError:
+            with suppress(OSError):
+                os.unlink(dst)
+            raise
+
+
+# -------------------- finalizer.py --------------------
+class FinishedJob:
+    """
+    Result of a background job: the returned value or the raised exception.
+    """
+    __slots__ = ("result", "error", "trace", "latency")
+
+    def __init__(self, result=None, error: BaseException | None = None, trace: str = "",
+                 latency: float = 0.0):
+        """
+        :param result: Value returned by the job.
+        :param error: Exception raised by the job.
+        :param trace: Formatted traceback of the exception.
+        :param latency: Time from submitting to finishing the job in seconds.
+        """
+        self.result = result
+        self.error = error
+        self.trace = trace
+        self.latency = latency
+
+
+class ClipFinalizer:
+    """
+    Bounded queue of background jobs (moving clip files, creating links) and worker threads running them.
+
+    OBS calls frontend event callbacks on its UI thread, so slow file operations (e.g. a busy disk or antivirus
+    scanning a new file) would freeze OBS. The callback submits a job and returns at once. Results are collected
+    in `finished` and taken with `poll` on the main thread (e.g. by an obs timer), which is the only place
+    where OBS API can be used safely.
+    Workers are started on the first submitted job.
+    """
+    def __init__(self, workers: int = 2, max_size: int = 16):
+        """
+        :param workers: Amount of worker threads.
+        :param max_size: Max amount of queued jobs. If the queue is full, `submit` returns False.
+        """
+        self.workers_amount = workers
+        self.queue: Queue = Queue(maxsize=max_size)
+        self.finished: deque[FinishedJob] = deque()
+        self.workers: list[Thread] = []
+        self.lock = Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.done = 0
+        self.max_depth = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def depth(self) -> int:
+        """
+        Amount of queued jobs (not started yet).
+        """
+        return self.queue.qsize()
+
+    def submit(self, func, *args) -> bool:
+        """
+        Queues `func(*args)`. Returns False if the queue is full (the job is not queued).
+
+        :param func: Function to run in a worker thread. It must not use OBS API.
+        :param args: Function arguments.
+        """
+        self._start_workers()
+        try:
+            self.queue.put_nowait((func, args, time.perf_counter()))
+        except Full:
+            self.rejected += 1
+            return False
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def run(self, func, *args, submit_time: float | None = None) -> FinishedJob:
+        """
+        Runs `func(*args)` in the current thread (e.g. if the queue is full) and returns its result.
+
+        :param func: Function to run.
+        :param args: Function arguments.
+        :param submit_time: Time the job was submitted (`time.perf_counter()`). If None, the current time is used.
+        """
+        submit_time = time.perf_counter() if submit_time is None else submit_time
+        try:
+            job = FinishedJob(result=func(*args))
+        except Exception as e:
+            job = FinishedJob(error=e, trace=traceback.format_exc())
+        job.latency = time.perf_counter() - submit_time
+        with self.lock:
+            self.done += 1
+            self.failed += job.error is not None
+            self.total_latency += job.latency
+            self.max_latency = max(self.max_latency, job.latency)
+        return job
+
+    def poll(self) -> list[FinishedJob]:
+        """
+        Returns finished jobs (each job is returned once).
+        """
+        jobs = []
+        while self.finished:
+            jobs.append(self.finished.popleft())
+        return jobs
+
+    def stop(self, timeout: float | None = None):
+        """
+        Waits for queued jobs and stops the workers.
+
+        :param timeout: Max wait time for every worker in seconds.
+        """
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for _ in workers:
+            self.queue.put((None, (), 0.0))
+        for worker in workers:
+            worker.join(timeout)
+
+    def stats(self) -> dict:
+        return {"workers": len(self.workers), "depth": self.depth, "max_depth": self.max_depth,
+                "submitted": self.submitted, "rejected": self.rejected, "done": self.done, "failed": self.failed,
+                "avg_latency_ms": round(self.total_latency / self.done * 1000, 2) if self.done else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 2)}
+
+    def _start_workers(self):
+        if self.workers:
+            return
+        with self.lock:
+            while len(self.workers) < self.workers_amount:
+                worker = Thread(target=self._run, name=f"SmartReplaysFinalizer-{len(self.workers)}", daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def _run(self):
+        while True:
+            func, args, submit_time = self.queue.get()
+            if func is None:
+                return
+            self.finished.append(self.run(func, *args, submit_time=submit_time))
+
+
+# -------------------- globals.py --------------------
+class ConfigTypes(Enum):
+    PROFILE = 0
+    APP = 1
+    USER = 2
+
+
+class ClipNamingModes(Enum):
+    CURRENT_PROCESS = 0
+    MOST_RECORDED_PROCESS = 1
+    CURRENT_SCENE = 2
+    TOP_PROCESSES = 3
+    MOST_RECORDED_SCENE = 4
+
+
+class VideoNamingModes(Enum):
+    CURRENT_PROCESS = 0
+    MOST_RECORDED_PROCESS = 1
+    CURRENT_SCENE = 2
+
+
+class PopupPathDisplayModes(Enum):
+    FULL_PATH = 0
+    FOLDER_AND_FILE = 1
+    JUST_FOLDER = 2
+    JUST_FILE = 3
+
+
+class CONSTANTS:
+    VERSION = "1.0.8.2"
+    OBS_VERSION_STRING = obs.obs_get_version_string()
+    OBS_VERSION_RE = re.compile(r'(\d+)\.(\d+)\.(\d+)')
+    OBS_VERSION = [int(i) for i in OBS_VERSION_RE.match(OBS_VERSION_STRING).groups()]
+    CLIPS_FORCE_MODE_LOCK = Lock()
+    VIDEOS_FORCE_MODE_LOCK = Lock()
+    FILENAME_PROHIBITED_CHARS = r'/\:"<>*?|%'
+    PATH_PROHIBITED_CHARS = r'"<>*?|%'
+    PROCESS_CACHE_SWEEP_INTERVAL = 30  # seconds
+    BUFFER_RESTART_START_TIMEOUT = 10  # seconds, replay buffer restart is considered failed if it doesn't start.
+    ADAPTIVE_SAMPLING_MIN_PERIOD = 0.25  # seconds
+    ADAPTIVE_SAMPLING_MAX_PERIOD = 4  # seconds
+    ADAPTIVE_SAMPLING_BACKOFF = 1.5
+    ADAPTIVE_SAMPLING_IDLE_THRESHOLD = 30  # seconds
+    TOP_APPS_SEPARATOR = "+"
+    DISPLAY_NAMES_CACHE_SIZE = 256
+    SAVE_PLAN_REFRESH_PERIOD = 500  # ms
+    # Naming modes, which names depend only on the current app / scene.
+    SAVE_PLAN_MODES = (ClipNamingModes.CURRENT_PROCESS.value, ClipNamingModes.CURRENT_SCENE.value)
+    SAVE_PLAN_VOLATILE_VARIABLES = {"APPS", "TITLE"}  # Can change without focus / scene change events.
+    SAVE_REQUEST_TIMEOUT = 60  # seconds, older save requests are discarded (e.g. OBS failed to save the clip).
+    CLIP_FINALIZER_WORKERS = 2
+    CLIP_FINALIZER_QUEUE_SIZE = 16
+    CLIP_FINALIZER_STOP_TIMEOUT = 10  # seconds
+    FINISHED_CLIPS_CHECK_PERIOD = 100  # ms
+    HOOKED_CAPTURE_SOURCES_IDS = ("game_capture", "window_capture")
+    SESSION_LOGS_FOLDER = Path(__file__).parent / "smart_replays_sessions"
+    SESSION_LOGS_MAX_AMOUNT = 30
+    KNOWN_GAMES_DB_PATH = Path(__file__).parent / "smart_replays_known_games.db"
+    FRIENDLY_NAMES_CACHE_PATH = Path(__file__).parent / "smart_replays_names_cache.json"
+    FRIENDLY_NAMES_CACHE_BATCH = 16
+    DEFAULT_FILENAME_FORMAT = "%NAME_%d.%m.%Y_%H-%M-%S"
+    DEFAULT_FOLDER_FORMAT = "%NAME"
+    RULES_NAMING_MODES = {"active": ClipNamingModes.CURRENT_PROCESS.value,
+                          "most-recorded": ClipNamingModes.MOST_RECORDED_PROCESS.value,
+                          "scene": ClipNamingModes.CURRENT_SCENE.value,
+                          "top-apps": ClipNamingModes.TOP_PROCESSES.value,
+                          "most-recorded-scene": ClipNamingModes.MOST_RECORDED_SCENE.value}
+    DEFAULT_ALIASES = (
+        {"value": "C:\\Windows\\explorer.exe > Desktop", "selected": False, "hidden": False},
+        {"value": f"{sys.executable} > OBS", "selected": False, "hidden": False}
+    )
+
+
+class VARIABLES:
+    update_available: bool = False
+    exe_registry: ExeRegistry = ExeRegistry()
+    backend: ForegroundBackend = create_backend()
+    process_cache: ProcessCache = ProcessCache()
+    clip_exe_history: ExeHistory | None = None
+    sampler: ForegroundSampler | None = None
+    session_log: SessionLog | None = None
+    buffer_start_time: float | None = None  # Timestamp of the last replay buffer start.
+    buffer_restarting: bool = False  # Replay buffer is being restarted by the script, exe history should be kept.
+    current_scene_name: str | None = None  # Cached name of the current scene, updated on scene events.
+    scene_ids: dict[str, int] = {}  # {scene_name: scene_id}
+    scene_names: list[str] = []  # [scene_name, ...], index is scene_id
+    scene_history: ExeHistory | None = None  # Timeline of scenes (scene IDs instead of executable IDs).
+    hooks_scene_name: str | None = None  # Name of the scene, which capture sources are subscribed to.
+    capture_sources: list[str] = []  # Names of subscribed capture sources.
+    hooked_executables: dict[str, int] = {}  # {capture_source_name: exe_id}
+    video_exe_history: defaultdict[int, int] | None = None  # {exe_id: active_seconds_amount}
+    exe_path_on_video_stopping_event: Path | None = None
+    aliases: dict[Path, str] = {}
+    alias_matcher: AliasMatcher = AliasMatcher()
+    aliases_generation: int = 0  # Incremented every time aliases are reloaded.
+    display_names: DisplayNameCache = DisplayNameCache(CONSTANTS.DISPLAY_NAMES_CACHE_SIZE)
+    known_games: KnownGamesDB = KnownGamesDB(CONSTANTS.KNOWN_GAMES_DB_PATH)  # Opened on the first lookup.
+    friendly_names: FriendlyNameResolver = FriendlyNameResolver(
+        FriendlyNameCache(CONSTANTS.FRIENDLY_NAMES_CACHE_PATH, CONSTANTS.FRIENDLY_NAMES_CACHE_BATCH),
+        CONSTANTS.FILENAME_PROHIBITED_CHARS
+    )
+    clip_rules: ClipRules = ClipRules()
+    compiled_templates: dict[tuple[str, bool], ClipTemplate] = {}  # {(template, is_folder_template): compiled}
+    clips_seq: int = 0  # Last clip number (%SEQ) given to a save request.
+    script_settings = None
+    hotkey_ids: dict = {}
+    force_mode = None
+    unique_names: UniqueNameAllocator = UniqueNameAllocator()
+    finalizer: ClipFinalizer = ClipFinalizer(workers=CONSTANTS.CLIP_FINALIZER_WORKERS,
+                                             max_size=CONSTANTS.CLIP_FINALIZER_QUEUE_SIZE)
+    save_request: SaveRequest | None = None  # Clip destination generated at the moment of the save request.
+    save_plan: SaveRequest | None = None  # Clip destination generated in advance for the current app and scene.
+    save_plan_dirty: bool = True  # Focus, scene, aliases or settings changed since the plan was generated.
+    last_sampled_exe_id: int | None = None
 
 
 class PropertiesNames:
@@ -264,6 +2977,7 @@ class PropertiesNames:
     GR_SOUND_NOTIFICATION_SETTINGS = "sound_notification_settings"
     GR_POPUP_NOTIFICATION_SETTINGS = "popup_notification_settings"
     GR_ALIASES_SETTINGS = "aliases_settings"
+    GR_RULES_SETTINGS = "rules_settings"
     GR_OTHER_SETTINGS = "other_settings"
 
     # Clips path settings
@@ -271,9 +2985,13 @@ class PropertiesNames:
     TXT_CLIPS_BASE_PATH_WARNING = "clips_base_path_warning"
     PROP_CLIPS_NAMING_MODE = "clips_naming_mode"
     TXT_CLIPS_HOTKEY_TIP = "clips_hotkey_tip"
+    PROP_CLIPS_TOP_APPS_AMOUNT = "clips_top_apps_amount"
+    PROP_CLIPS_TOP_APPS_MIN_SHARE = "clips_top_apps_min_share"
     PROP_CLIPS_FILENAME_TEMPLATE = "clips_filename_template"
     TXT_CLIPS_FILENAME_TEMPLATE_ERR = "clips_filename_template_err"
     PROP_CLIPS_SAVE_TO_FOLDER = "clips_save_to_folder"
+    PROP_CLIPS_FOLDER_TEMPLATE = "clips_folder_template"
+    TXT_CLIPS_FOLDER_TEMPLATE_ERR = "clips_folder_template_err"
     PROP_CLIPS_ONLY_FORCE_MODE = "clips_only_force_mode" # todo
     PROP_CLIPS_CREATE_LINKS = "clips_create_links"
     PROP_CLIPS_LINKS_FOLDER_PATH = "clips_links_folder_path"
@@ -313,6 +3031,12 @@ class PropertiesNames:
     TXT_ALIASES_INVALID_FORMAT = "aliases_invalid_format_err"
     TXT_ALIASES_INVALID_CHARACTERS = "aliases_invalid_characters_err"
 
+    # Clip rules settings
+    PROP_RULES_LIST = "rules_list"
+    TXT_RULES_DESC = "rules_desc"
+    TXT_RULES_INVALID_FORMAT = "rules_invalid_format_err"
+    TXT_RULES_TARGET_EXISTS = "rules_target_exists_err"
+
     # Export / Import aliases section
     PROP_ALIASES_EXPORT_PATH = "aliases_export_path"
     BTN_ALIASES_EXPORT = "aliases_export_btn"
@@ -323,11 +3047,17 @@ class PropertiesNames:
     PROP_RESTART_BUFFER = "restart_buffer"
     PROP_RESTART_BUFFER_LOOP = "restart_buffer_loop"
     TXT_RESTART_BUFFER_LOOP = "restart_buffer_loop_desc"
+    PROP_SAMPLING_PERIOD = "sampling_period"
+    PROP_ADAPTIVE_SAMPLING = "adaptive_sampling"
+    PROP_USE_CAPTURE_HOOKS = "use_capture_hooks"
+    PROP_SESSION_LOG = "session_log"
 
     # Hotkeys
     HK_SAVE_BUFFER_MODE_1 = "save_buffer_force_mode_1"
     HK_SAVE_BUFFER_MODE_2 = "save_buffer_force_mode_2"
     HK_SAVE_BUFFER_MODE_3 = "save_buffer_force_mode_3"
+    HK_SAVE_BUFFER_MODE_4 = "save_buffer_force_mode_4"
+    HK_SAVE_BUFFER_MODE_5 = "save_buffer_force_mode_5"
     HK_SAVE_VIDEO_MODE_1 = "save_video_force_mode_1"
     HK_SAVE_VIDEO_MODE_2 = "save_video_force_mode_2"
     HK_SAVE_VIDEO_MODE_3 = "save_video_force_mode_3"
@@ -366,6 +3096,30 @@ class AliasInvalidFormat(AliasParsingError):
     """
 
 
+class RuleParsingError(Exception):
+    """
+    Base exception for all clip rule related exceptions.
+    """
+    def __init__(self, index):
+        """
+        :param index: rule index.
+        """
+        super(Exception).__init__()
+        self.index = index
+
+
+class RuleTargetAlreadyExists(RuleParsingError):
+    """
+    Exception raised when a rule for the app / scene already exists.
+    """
+
+
+class RuleInvalidFormat(RuleParsingError):
+    """
+    Exception raised when a rule is invalid format.
+    """
+
+
 # -------------------- updates_check.py --------------------
 def get_latest_release_tag() -> dict | None:  # todo: for future updates
     url = "https://api.github.com/repos/qvvonk/smart_replays/releases/latest"
@@ -393,6 +3147,17 @@ def check_updates(current_version: str):  # todo: for future updates
 variables_tip = """<table>
 <tr><th align='left'>%NAME</th><td> - name of the clip.</td></tr>
 
+<tr><th align='left'>%SCENE</th><td> - name of the current scene.</td></tr>
+
+<tr><th align='left'>%TITLE</th><td> - title of the active window.</td></tr>
+
+<tr><th align='left'>%BUFLEN</th><td> - replay buffer length (in seconds).</td></tr>
+
+<tr><th align='left'>%SEQ</th><td> - clip number (since OBS start).</td></tr>
+
+<tr><th align='left'>%APPS</th><td> - names of the apps that were active most of the time during the clip recording.<br/>
+Example: Game+Discord</td></tr>
+
 <tr><th align='left'>%a</th><td> - Weekday as locale’s abbreviated name.<br/>
 Example: Sun, Mon, …, Sat (en_US); So, Mo, …, Sa (de_DE)</td></tr>
 
@@ -502,6 +3267,32 @@ def setup_clip_paths_settings(group_obj):
         name="the name of the current scene;",
         val=ClipNamingModes.CURRENT_SCENE.value
     )
+    obs.obs_property_list_add_int(
+        p=clip_naming_mode_prop,
+        name="the names of apps (.exe file names) that were active most of the time during the clip recording;",
+        val=ClipNamingModes.TOP_PROCESSES.value
+    )
+    obs.obs_property_list_add_int(
+        p=clip_naming_mode_prop,
+        name="the name of a scene that was active most of the time during the clip recording;",
+        val=ClipNamingModes.MOST_RECORDED_SCENE.value
+    )
+
+    obs.obs_properties_add_int_slider(
+        props=group_obj,
+        name=PN.PROP_CLIPS_TOP_APPS_AMOUNT,
+        description="Max apps in the name",
+        min=1, max=5,
+        step=1
+    )
+
+    obs.obs_properties_add_int_slider(
+        props=group_obj,
+        name=PN.PROP_CLIPS_TOP_APPS_MIN_SHARE,
+        description="Min share of the clip for other apps (%)",
+        min=1, max=100,
+        step=1
+    )
 
     t = obs.obs_properties_add_text(
         props=group_obj,
@@ -537,6 +3328,24 @@ def setup_clip_paths_settings(group_obj):
         description="Sort clips into folders by application or scene",
     )
 
+    folder_format_prop = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.PROP_CLIPS_FOLDER_TEMPLATE,
+        description="Folder name format",
+        type=obs.OBS_TEXT_DEFAULT
+    )
+    obs.obs_property_set_long_description(
+        folder_format_prop,
+        "Use / to create nested folders, e.g. %NAME/%Y-%m.\n" + variables_tip)
+
+    t = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_CLIPS_FOLDER_TEMPLATE_ERR,
+        description="<font color=\"red\"><pre> Invalid format!</pre></font>",
+        type=obs.OBS_TEXT_INFO
+    )
+    obs.obs_property_set_visible(t, False)
+
     # ----- Create links -----
     create_links_prop = obs.obs_properties_add_bool(
         props=group_obj,
@@ -572,6 +3381,7 @@ def setup_clip_paths_settings(group_obj):
     # ----- Callbacks -----
     obs.obs_property_set_modified_callback(base_path_prop, check_base_path_callback)
     obs.obs_property_set_modified_callback(filename_format_prop, check_filename_template_callback)
+    obs.obs_property_set_modified_callback(folder_format_prop, check_folder_template_callback)
     obs.obs_property_set_modified_callback(create_links_prop, update_links_path_prop_visibility)
     obs.obs_property_set_modified_callback(links_path_prop, check_clips_links_folder_path_callback)
 
@@ -732,7 +3542,12 @@ def setup_aliases_settings(group_obj):
         description="Executable (.exe) files often have names that don't match the actual game title "
                     "(e.g., the game is called Deadlock, but the .exe file is named project8.exe)."
                     "You can create an alias for the executable file or folder. "
-                    "Smart Replays will use this alias for renaming, rather than the .exe file name.",
+                    "Smart Replays will use this alias for renaming, rather than the .exe file name.\n"
+                    "Instead of a path you can use an executable name (valorant.exe), "
+                    "a glob (* - any characters within a folder name, ** - any characters, ? - any character) "
+                    "or a regex with re: prefix. Values captured by a regex can be used in the alias: {1} or {name}. "
+                    "More in the README.\n"
+                    "Example: re:.*\\\\(\\w+)-Win64-Shipping\\.exe > {1}",
         type=obs.OBS_TEXT_INFO
     )
 
@@ -763,6 +3578,7 @@ def setup_aliases_settings(group_obj):
     <div style="font-size: 14px">
     <span style="color: red">Invalid format.<br></span>
     <span style="color: orange">Required format: DISK:\\path\\to\\folder\\or\\executable > ClipName<br></span>
+    <span style="color: orange">Glob or regex (re:) path must be valid, regex global flags are allowed only at its start.<br></span>
     <span style="color: lightgreen">Example: C:\\Program Files\\Minecraft > Minecraft</span>
     </div>""",
         type=obs.OBS_TEXT_INFO
@@ -826,6 +3642,62 @@ def setup_aliases_settings(group_obj):
     obs.obs_property_set_modified_callback(aliases_list, update_aliases_callback)
 
 
+def setup_rules_settings(group_obj):
+    obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_RULES_DESC,
+        description="Clip rules override naming mode, file name template, folder and links "
+                    "for individual apps (same format as aliases) or scenes (scene:SceneName). "
+                    "If both app and scene rules match, the scene rule takes precedence. "
+                    "Hotkeys naming modes take precedence over rules.",
+        type=obs.OBS_TEXT_INFO
+    )
+
+    err_text_1 = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_RULES_INVALID_FORMAT,
+        description="""
+    <div style="font-size: 14px">
+    <span style="color: red">Invalid rule.<br></span>
+    <span style="color: orange">Required format: app or scene:SceneName > key=value; key=value<br>
+    Keys: mode (active, most-recorded, scene, top-apps, most-recorded-scene), template, folder (template or off), links (on, off).<br></span>
+    <span style="color: lightgreen">Example: scene:Ranked > template=%NAME_ranked_%d.%m.%Y_%H-%M-%S; folder=Ranked/%NAME</span>
+    </div>""",
+        type=obs.OBS_TEXT_INFO
+    )
+
+    err_text_2 = obs.obs_properties_add_text(
+        props=group_obj,
+        name=PN.TXT_RULES_TARGET_EXISTS,
+        description="""<div style="font-size: 14px; color: red">This app / scene already has a rule.</div>""",
+        type=obs.OBS_TEXT_INFO
+    )
+
+    obs.obs_property_set_visible(err_text_1, False)
+    obs.obs_property_set_visible(err_text_2, False)
+
+    rules_list = obs.obs_properties_add_editable_list(
+        props=group_obj,
+        name=PN.PROP_RULES_LIST,
+        description="",
+        type=obs.OBS_EDITABLE_LIST_TYPE_STRINGS,
+        filter=None,
+        default_path=None
+    )
+
+    t = obs.obs_properties_add_text(
+        props=group_obj,
+        name="rules_format",
+        description="Format:  app or scene:SceneName > key=value; key=value\n"
+                    "Example: C:\\Windows\\explorer.exe > links=off",
+        type=obs.OBS_TEXT_INFO
+    )
+    obs.obs_property_text_set_info_type(t, obs.OBS_TEXT_INFO_WARNING)
+
+    # ----- Callbacks -----
+    obs.obs_property_set_modified_callback(rules_list, update_rules_callback)
+
+
 def setup_other_settings(group_obj):
     obs.obs_properties_add_text(
         props=group_obj,
@@ -850,6 +3722,32 @@ To disable scheduled restarts, set the value to 0.""",
         description="Restart replay buffer after clip saving"
     )
 
+    obs.obs_properties_add_int(
+        props=group_obj,
+        name=PN.PROP_SAMPLING_PERIOD,
+        description="Check active app every (ms)",
+        min=100, max=5000,
+        step=100
+    )
+
+    obs.obs_properties_add_bool(
+        props=group_obj,
+        name=PN.PROP_ADAPTIVE_SAMPLING,
+        description="Adaptive active app checking (more often after app switching, less often while playing or idle)"
+    )
+
+    obs.obs_properties_add_bool(
+        props=group_obj,
+        name=PN.PROP_USE_CAPTURE_HOOKS,
+        description="Use the app captured by Game / Window Capture instead of the active window"
+    )
+
+    obs.obs_properties_add_bool(
+        props=group_obj,
+        name=PN.PROP_SESSION_LOG,
+        description="Keep session log of active apps (survives OBS crashes, stored in the script's folder, last 30 kept)"
+    )
+
 
 def script_properties():
     p = obs.obs_properties_create()  # main properties object
@@ -873,6 +3771,7 @@ def script_properties():
     notification_gr = obs.obs_properties_create()
     popup_gr = obs.obs_properties_create()
     aliases_gr = obs.obs_properties_create()
+    rules_gr = obs.obs_properties_create()
     other_gr = obs.obs_properties_create()
 
     obs.obs_properties_add_group(p, PN.GR_CLIPS_PATH_SETTINGS, "Clip path settings", obs.OBS_GROUP_NORMAL, clip_path_gr)
@@ -880,6 +3779,7 @@ def script_properties():
     obs.obs_properties_add_group(p, PN.GR_SOUND_NOTIFICATION_SETTINGS, "Sound notifications", obs.OBS_GROUP_CHECKABLE, notification_gr)
     obs.obs_properties_add_group(p, PN.GR_POPUP_NOTIFICATION_SETTINGS, "Popup notifications", obs.OBS_GROUP_CHECKABLE, popup_gr)
     obs.obs_properties_add_group(p, PN.GR_ALIASES_SETTINGS, "Aliases", obs.OBS_GROUP_NORMAL, aliases_gr)
+    obs.obs_properties_add_group(p, PN.GR_RULES_SETTINGS, "Clip rules", obs.OBS_GROUP_NORMAL, rules_gr)
     obs.obs_properties_add_group(p, PN.GR_OTHER_SETTINGS, "Other", obs.OBS_GROUP_NORMAL, other_gr)
 
     # ------ Setup properties ------
@@ -888,6 +3788,7 @@ def script_properties():
     setup_notifications_settings(notification_gr)
     setup_popup_notification_settings(popup_gr)
     setup_aliases_settings(aliases_gr)
+    setup_rules_settings(rules_gr)
     setup_other_settings(other_gr)
 
     return p
@@ -956,6 +3857,42 @@ def update_aliases_callback(p, prop, data):
     return True
 
 
+def update_rules_callback(p, prop, data):
+    """
+    Checks the list of clip rules and updates rules menu (shows / hides error texts).
+    Invalid rule is removed from the list.
+    """
+    invalid_format_err_text = obs.obs_properties_get(p, PN.TXT_RULES_INVALID_FORMAT)
+    target_exists_err_text = obs.obs_properties_get(p, PN.TXT_RULES_TARGET_EXISTS)
+
+    settings_json: dict = json.loads(obs.obs_data_get_json(data))
+    if not settings_json:
+        return False
+
+    try:
+        load_rules(settings_json)
+        obs.obs_property_set_visible(invalid_format_err_text, False)
+        obs.obs_property_set_visible(target_exists_err_text, False)
+        return True
+
+    except RuleParsingError as e:
+        obs.obs_property_set_visible(invalid_format_err_text, isinstance(e, RuleInvalidFormat))
+        obs.obs_property_set_visible(target_exists_err_text, isinstance(e, RuleTargetAlreadyExists))
+        index = e.index
+
+    # If error in parsing
+    settings_json[PN.PROP_RULES_LIST].pop(index)
+    new_rules_array = obs.obs_data_array_create()
+
+    for index, rule in enumerate(settings_json[PN.PROP_RULES_LIST]):
+        rule_data = obs.obs_data_create_from_json(json.dumps(rule))
+        obs.obs_data_array_insert(new_rules_array, index, rule_data)
+
+    obs.obs_data_set_array(data, PN.PROP_RULES_LIST, new_rules_array)
+    obs.obs_data_array_release(new_rules_array)
+    return True
+
+
 def check_filename_template_callback(p, prop, data):
     """
     Checks filename template.
@@ -963,11 +3900,20 @@ def check_filename_template_callback(p, prop, data):
     """
     error_text = obs.obs_properties_get(p, PN.TXT_CLIPS_FILENAME_TEMPLATE_ERR)
 
-    try:
-        gen_filename("clipname", obs.obs_data_get_string(data, PN.PROP_CLIPS_FILENAME_TEMPLATE))
-        obs.obs_property_set_visible(error_text, False)
-    except:
-        obs.obs_property_set_visible(error_text, True)
+    template = obs.obs_data_get_string(data, PN.PROP_CLIPS_FILENAME_TEMPLATE)
+    obs.obs_property_set_visible(error_text, not check_clip_template(template))
+    return True
+
+
+def check_folder_template_callback(p, prop, data):
+    """
+    Checks clips folder template.
+    If template is invalid, shows warning.
+    """
+    error_text = obs.obs_properties_get(p, PN.TXT_CLIPS_FOLDER_TEMPLATE_ERR)
+
+    template = obs.obs_data_get_string(data, PN.PROP_CLIPS_FOLDER_TEMPLATE)
+    obs.obs_property_set_visible(error_text, not check_clip_template(template, folder=True))
     return True
 
 
@@ -1077,11 +4023,6 @@ def export_aliases_to_json_callback(*args):
 
 
 # -------------------- tech.py --------------------
-class LASTINPUTINFO(ctypes.Structure):
-    _fields_ = [("cbSize", wintypes.UINT),
-                ("dwTime", wintypes.DWORD)]
-
-
 def _print(*values, sep: str | None = None, end: str | None = None, file=None, flush: bool = False):
     str_time = datetime.now().strftime(f"%d.%m.%Y %H:%M:%S")
     print(f"[{str_time}]", *values, sep=sep, end=end, file=file, flush=flush)
@@ -1091,56 +4032,118 @@ def get_active_window_pid() -> int | None:
     """
     Gets process ID of the current active window.
     """
-    hwnd = user32.GetForegroundWindow()
-    pid = wintypes.DWORD()
-    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-    return pid.value
+    return VARIABLES.backend.get_active_window_pid()
+
+
+def get_active_window_title() -> str:
+    """
+    Gets title of the current active window.
+    """
+    backend = VARIABLES.backend
+    return backend.get_window_title(backend.get_active_window())
+
+
+def get_active_executable_path() -> str:
+    """
+    Gets executable path of the current active window's process.
+
+    Uses `VARIABLES.process_cache`: while the active window doesn't change, it costs a single
+    active window request. Otherwise, the process is validated by its creation time,
+    and the executable path is resolved only if the process is not cached yet.
+    """
+    backend = VARIABLES.backend
+    cache = VARIABLES.process_cache
+    window = backend.get_active_window()
+    last = cache.last
+    if window and last and window == last[0] and (entry := cache.entries.get(last[1])):
+        cache.hits += 1
+        return entry[1]
+
+    pid = backend.get_window_pid(window)
+    creation_time = backend.get_process_creation_time(pid)
+    path = cache.get(pid, creation_time)
+    if path is not None:
+        cache.hits += 1
+    else:
+        cache.misses += 1
+        path = backend.get_executable_path(pid)
+        cache.put(pid, creation_time, path)
+        if time.monotonic() - cache.last_sweep > CONSTANTS.PROCESS_CACHE_SWEEP_INTERVAL:
+            with suppress(Exception):
+                sweep_process_cache()
+
+    cache.last = (window, pid)
+    return path
+
+
+def warm_process_cache():
+    """
+    Fills `VARIABLES.process_cache` with all currently running processes
+    (the ones which executable path can be accessed).
+    """
+    backend = VARIABLES.backend
+    cache = VARIABLES.process_cache
+    try:
+        pids = backend.get_running_process_ids()
+    except Exception:
+        _print("Cannot warm process cache: failed to enumerate processes.")
+        return
+
+    for pid in pids:
+        with suppress(Exception):
+            cache.put(pid, backend.get_process_creation_time(pid), backend.get_executable_path(pid))
+    cache.last_sweep = time.monotonic()
+    _print(f"Process cache warmed: {len(cache)} processes.")
+
+
+def sweep_process_cache():
+    """
+    Removes exited processes from `VARIABLES.process_cache`.
+    """
+    cache = VARIABLES.process_cache
+    removed = cache.retain(VARIABLES.backend.get_running_process_ids())
+    cache.last_sweep = time.monotonic()
+    if removed:
+        _print(f"{removed} exited processes removed from process cache.")
 
 
-def get_executable_path(pid: int) -> Path:
+def get_executable_path(pid: int) -> str:
     """
     Gets path of process's executable.
+    Returns a plain string, so it can be interned in `ExeRegistry` without creating a `Path` on every call.
 
     :param pid: process ID.
     :return: Executable path.
     """
-    process_handle = ctypes.windll.kernel32.OpenProcess(0x0400 | 0x0010, False, pid)
-    # PROCESS_QUERY_INFORMATION | PROCESS_VM_READ
-
-    if not process_handle:
-        raise OSError(f"Process {pid} does not exist.")
-
-    filename_buffer = ctypes.create_unicode_buffer(260)  # Windows path is 260 characters max.
-    result = ctypes.windll.psapi.GetModuleFileNameExW(process_handle, None, filename_buffer, 260)
-    ctypes.windll.kernel32.CloseHandle(process_handle)
-    if result:
-        return Path(filename_buffer.value)
-    else:
-        raise RuntimeError(f"Cannot get executable path for process {pid}.")
+    return VARIABLES.backend.get_executable_path(pid)
 
 
 def play_sound(path: str | Path):
     """
-    Plays sound using windows engine.
+    Plays sound using OS engine.
 
     :param path: path to sound (.wav)
     """
     with suppress(Exception):
-        winsound.PlaySound(str(path), winsound.SND_ASYNC)
+        VARIABLES.backend.play_sound(path)
 
 
 def get_time_since_last_input() -> int:
     """
     Gets the time (in seconds) since the last mouse or keyboard input.
     """
-    last_input_info = LASTINPUTINFO()
-    last_input_info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+    return VARIABLES.backend.get_time_since_last_input()
+
+
+def set_backend(backend: ForegroundBackend):
+    """
+    Replaces OS backend (e.g. with `SyntheticBackend` for benchmarks) and resets process cache.
 
-    if ctypes.windll.user32.GetLastInputInfo(ctypes.byref(last_input_info)):
-        current_time = ctypes.windll.kernel32.GetTickCount()
-        idle_time_ms = current_time - last_input_info.dwTime
-        return idle_time_ms // 1000
-    return 0
+    :param backend: New backend.
+    """
+    VARIABLES.backend = backend
+    VARIABLES.process_cache.clear()
+    _print(f"Backend changed to {backend.name}.")
 
 
 def create_hard_link(file_path: Path | str, links_folder: Path | str) -> None:
@@ -1214,6 +4217,16 @@ def get_last_replay_file_name() -> str:
 def get_current_scene_name() -> str:
     """
     Returns the current OBS scene name.
+    The name is cached and updated on scene events (see `update_current_scene`).
+    """
+    if VARIABLES.current_scene_name is None:
+        VARIABLES.current_scene_name = query_current_scene_name()
+    return VARIABLES.current_scene_name
+
+
+def query_current_scene_name() -> str:
+    """
+    Returns the current OBS scene name (queries OBS, doesn't use cache).
     """
     current_scene = obs.obs_frontend_get_current_scene()
     name = obs.obs_source_get_name(current_scene)
@@ -1221,6 +4234,53 @@ def get_current_scene_name() -> str:
     return name
 
 
+def get_scene_id(scene_name: str) -> int:
+    """
+    Returns ID of the scene name (registers the name if it's new).
+
+    :param scene_name: Scene name.
+    """
+    if (scene_id := VARIABLES.scene_ids.get(scene_name)) is None:
+        scene_id = VARIABLES.scene_ids[scene_name] = len(VARIABLES.scene_names)
+        VARIABLES.scene_names.append(scene_name)
+    return scene_id
+
+
+def update_current_scene(ts: float | None = None):
+    """
+    Updates cached current scene name and records the scene switch in the scene timeline.
+
+    :param ts: Switch timestamp (`time.time()`). If None, current time is used.
+    """
+    ts = time.time() if ts is None else ts
+    name = query_current_scene_name()
+    history = VARIABLES.scene_history
+    if history is not None:
+        if VARIABLES.current_scene_name is not None:  # Previous scene was active up to this moment.
+            history.append(get_scene_id(VARIABLES.current_scene_name), ts)
+        history.append(get_scene_id(name), ts)
+    VARIABLES.current_scene_name = name
+
+
+def get_most_recorded_scene_name(clip_span: tuple[float, float] | None = None) -> str:
+    """
+    Returns the name of the scene that was active most of the time during the clip recording.
+    If there is no scene timeline, returns the current scene name.
+
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole scene timeline is used.
+    """
+    history = VARIABLES.scene_history
+    if history is None:
+        return get_current_scene_name()
+
+    history.append(get_scene_id(get_current_scene_name()))  # Current scene is still active.
+    if clip_span is not None:
+        scene_id = history.snapshot().most_common_between(*clip_span)
+    else:
+        scene_id = history.most_common()
+    return VARIABLES.scene_names[scene_id] if scene_id is not None else get_current_scene_name()
+
+
 def get_replay_buffer_max_time() -> int:
     """
     Returns replay buffer max time from OBS config (in seconds).
@@ -1232,41 +4292,248 @@ def get_replay_buffer_max_time() -> int:
         return get_obs_config("AdvOut", "RecRBTime", int)
 
 
-def get_base_path(script_settings: Any | None = None) -> Path:
-    """
-    Returns the base path for clips, either from the script settings or OBS config.
+def get_clip_span_until(end: float) -> tuple[float, float]:
+    """
+    Returns time span (start and end timestamps) that is covered by the clip ending at `end`
+    (`max_time` seconds before, but not earlier than the replay buffer start).
+
+    :param end: Clip end timestamp (`time.time()`).
+    """
+    history = VARIABLES.clip_exe_history
+    max_time = history.max_time if history is not None else get_replay_buffer_max_time()
+    start = end - max_time
+    if VARIABLES.buffer_start_time is not None:
+        start = min(max(start, VARIABLES.buffer_start_time), end)
+    return start, end
+
+
+def get_base_path(script_settings: Any | None = None) -> Path:
+    """
+    Returns the base path for clips, either from the script settings or OBS config.
+
+    :param script_settings: Script config. If not provided, base path returns from OBS config.
+    :return: The base path as a `Path` object.
+    """
+    if script_settings is not None:
+        script_path = obs.obs_data_get_string(script_settings, PN.PROP_CLIPS_BASE_PATH)
+        # If PN.PROP_CLIPS_BASE_PATH is not saved in the script config, then it has a default value,
+        # which is the value from the OBS config.
+        if script_path:
+            return Path(script_path)
+
+    config_mode = get_obs_config("Output", "Mode")
+    if config_mode == "Simple":
+        return Path(get_obs_config("SimpleOutput", "FilePath"))
+    else:
+        return Path(get_obs_config("AdvOut", "RecFilePath"))
+
+
+def restart_replay_buffering():
+    """
+    Restarts replay buffering, obviously -_-
+
+    Exe history and its sampler are kept during the restart (see `VARIABLES.buffer_restarting`).
+    If replay buffering doesn't start, the flag is cleared, so the next manual start doesn't keep the old history.
+    """
+    _print("Stopping replay buffering...")
+    VARIABLES.buffer_restarting = True
+    replay_output = obs.obs_frontend_get_replay_buffer_output()
+    obs.obs_frontend_replay_buffer_stop()
+
+    while not obs.obs_output_can_begin_data_capture(replay_output, 0):
+        time.sleep(0.1)
+    _print("Replay buffering stopped.")
+    _print("Starting replay buffering...")
+    obs.obs_frontend_replay_buffer_start()
+
+    deadline = time.time() + CONSTANTS.BUFFER_RESTART_START_TIMEOUT
+    while not obs.obs_frontend_replay_buffer_active():
+        if time.time() > deadline:
+            VARIABLES.buffer_restarting = False
+            _print("Replay buffering failed to start.")
+            return
+        time.sleep(0.1)
+    _print("Replay buffering started.")
+
+
+# -------------------- capture_hooks.py --------------------
+def get_hooked_exe_id() -> int | None:
+    """
+    Returns ID of the executable that is currently captured by a game / window capture source
+    of the current scene. If several sources are hooked, returns the one that was hooked last.
+    """
+    hooked = VARIABLES.hooked_executables
+    if not hooked:
+        return None
+    # dict can be changed by OBS thread, so take a copy of values.
+    values = list(hooked.values())
+    return values[-1] if values else None
+
+
+def resolve_hooked_executable(executable: str) -> str:
+    """
+    Game capture reports only the executable file name.
+    Tries to find full path of the executable among cached processes to make path aliases work.
+
+    :param executable: Executable file name (e.g. `game.exe`).
+    :return: Full executable path if found, otherwise executable file name.
+    """
+    name = executable.casefold()
+    for _, path in list(VARIABLES.process_cache.entries.values()):
+        if os.path.basename(path).casefold() == name:
+            return path
+    return executable
+
+
+def query_hooked_executable(source) -> str | None:
+    """
+    Returns executable file name the capture source is currently hooked to (`get_hooked` proc of the source),
+    or None if the source is not hooked or OBS doesn't provide the proc (OBS < 30).
+
+    :param source: Capture source.
+    """
+    cd = obs.calldata_create()
+    try:
+        ph = obs.obs_source_get_proc_handler(source)
+        if not obs.proc_handler_call(ph, "get_hooked", cd) or not obs.calldata_bool(cd, "hooked"):
+            return None
+        return obs.calldata_string(cd, "executable") or None
+    finally:
+        obs.calldata_destroy(cd)
+
+
+def on_capture_hooked(cd):
+    """
+    `hooked` signal callback of a capture source.
+    """
+    source = obs.calldata_source(cd, "source")
+    executable = obs.calldata_string(cd, "executable")
+    if not source or not executable:
+        return
+
+    source_name = obs.obs_source_get_name(source)
+    exe_id = VARIABLES.exe_registry.intern(resolve_hooked_executable(executable))
+    VARIABLES.hooked_executables.pop(source_name, None)  # Re-insert to make it the last hooked.
+    VARIABLES.hooked_executables[source_name] = exe_id
+    VARIABLES.save_plan_dirty = True
+    _print(f"{source_name} hooked {VARIABLES.exe_registry.paths[exe_id]}.")
+
+
+def on_capture_unhooked(cd):
+    """
+    `unhooked` signal callback of a capture source.
+    """
+    source = obs.calldata_source(cd, "source")
+    if not source:
+        return
+
+    source_name = obs.obs_source_get_name(source)
+    if VARIABLES.hooked_executables.pop(source_name, None) is not None:
+        VARIABLES.save_plan_dirty = True
+        _print(f"{source_name} unhooked.")
+
 
-    :param script_settings: Script config. If not provided, base path returns from OBS config.
-    :return: The base path as a `Path` object.
+def on_scene_items_changed(cd):
     """
-    if script_settings is not None:
-        script_path = obs.obs_data_get_string(script_settings, PN.PROP_CLIPS_BASE_PATH)
-        # If PN.PROP_CLIPS_BASE_PATH is not saved in the script config, then it has a default value,
-        # which is the value from the OBS config.
-        if script_path:
-            return Path(script_path)
+    `item_add` / `item_remove` signal callback of the current scene.
+    """
+    subscribe_capture_hooks()
 
-    config_mode = get_obs_config("Output", "Mode")
-    if config_mode == "Simple":
-        return Path(get_obs_config("SimpleOutput", "FilePath"))
-    else:
-        return Path(get_obs_config("AdvOut", "RecFilePath"))
 
+def find_capture_sources(scene_source, found: dict | None = None) -> dict:
+    """
+    Finds all capture sources (that emit `hooked` signal) in the scene, including nested scenes and groups.
 
-def restart_replay_buffering():
+    :param scene_source: Scene source.
+    :param found: Already found sources {source_name: None} (used for recursion).
+    :return: {source_name: None}
     """
-    Restarts replay buffering, obviously -_-
+    found = {} if found is None else found
+    scene = obs.obs_scene_from_source(scene_source) or obs.obs_group_from_source(scene_source)
+    if not scene:
+        return found
+
+    items = obs.obs_scene_enum_items(scene)
+    for item in items or []:
+        source = obs.obs_sceneitem_get_source(item)
+        source_id = obs.obs_source_get_unversioned_id(source)
+        source_name = obs.obs_source_get_name(source)
+        if source_id in CONSTANTS.HOOKED_CAPTURE_SOURCES_IDS:
+            found[source_name] = None
+        elif source_id in ("scene", "group") and source_name not in found:
+            found[source_name] = None  # Prevents infinite recursion, removed below.
+            find_capture_sources(source, found)
+            del found[source_name]
+    obs.sceneitem_list_release(items)
+    return found
+
+
+def subscribe_capture_hooks():
     """
-    _print("Stopping replay buffering...")
-    replay_output = obs.obs_frontend_get_replay_buffer_output()
-    obs.obs_frontend_replay_buffer_stop()
+    (Re)subscribes to `hooked` / `unhooked` signals of capture sources of the current scene
+    and to `item_add` / `item_remove` signals of the current scene.
+    Hooked executables of the sources that are still in the current scene are kept,
+    sources that were hooked before subscribing are detected with `query_hooked_executable`.
+    """
+    hooked_executables = VARIABLES.hooked_executables
+    unsubscribe_capture_hooks()
+    if not obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_USE_CAPTURE_HOOKS):
+        return
 
-    while not obs.obs_output_can_begin_data_capture(replay_output, 0):
-        time.sleep(0.1)
-    _print("Replay buffering stopped.")
-    _print("Starting replay buffering...")
-    obs.obs_frontend_replay_buffer_start()
-    _print("Replay buffering started.")
+    scene_source = obs.obs_frontend_get_current_scene()
+    if not scene_source:
+        return
+
+    VARIABLES.hooks_scene_name = obs.obs_source_get_name(scene_source)
+    sh = obs.obs_source_get_signal_handler(scene_source)
+    obs.signal_handler_connect(sh, "item_add", on_scene_items_changed)
+    obs.signal_handler_connect(sh, "item_remove", on_scene_items_changed)
+
+    for source_name in find_capture_sources(scene_source):
+        source = obs.obs_get_source_by_name(source_name)
+        if not source:
+            continue
+        sh = obs.obs_source_get_signal_handler(source)
+        obs.signal_handler_connect(sh, "hooked", on_capture_hooked)
+        obs.signal_handler_connect(sh, "unhooked", on_capture_unhooked)
+        if source_name not in hooked_executables and (executable := query_hooked_executable(source)):
+            hooked_executables[source_name] = VARIABLES.exe_registry.intern(resolve_hooked_executable(executable))
+            VARIABLES.save_plan_dirty = True
+            _print(f"{source_name} is already hooked to {executable}.")
+        obs.obs_source_release(source)
+        VARIABLES.capture_sources.append(source_name)
+    obs.obs_source_release(scene_source)
+    VARIABLES.hooked_executables = {name: exe_id for name, exe_id in hooked_executables.items()
+                                    if name in VARIABLES.capture_sources}
+
+    if VARIABLES.capture_sources:
+        _print(f"Subscribed to capture sources of {VARIABLES.hooks_scene_name}: {', '.join(VARIABLES.capture_sources)}.")
+
+
+def unsubscribe_capture_hooks():
+    """
+    Unsubscribes from all signals connected in `subscribe_capture_hooks` and forgets hooked executables.
+    """
+    if VARIABLES.hooks_scene_name is not None:
+        scene_source = obs.obs_get_source_by_name(VARIABLES.hooks_scene_name)
+        if scene_source:
+            sh = obs.obs_source_get_signal_handler(scene_source)
+            obs.signal_handler_disconnect(sh, "item_add", on_scene_items_changed)
+            obs.signal_handler_disconnect(sh, "item_remove", on_scene_items_changed)
+            obs.obs_source_release(scene_source)
+
+    for source_name in VARIABLES.capture_sources:
+        source = obs.obs_get_source_by_name(source_name)
+        if not source:
+            continue
+        sh = obs.obs_source_get_signal_handler(source)
+        obs.signal_handler_disconnect(sh, "hooked", on_capture_hooked)
+        obs.signal_handler_disconnect(sh, "unhooked", on_capture_unhooked)
+        obs.obs_source_release(source)
+
+    VARIABLES.hooks_scene_name = None
+    VARIABLES.capture_sources = []
+    VARIABLES.hooked_executables = {}
 
 
 # -------------------- script_helpers.py --------------------
@@ -1303,7 +4570,8 @@ def notify(success: bool, clip_path: Path, path_display_mode: PopupPathDisplayMo
 
 def load_aliases(script_settings_dict: dict):
     """
-    Loads aliases to `VARIABLES.aliases`.
+    Loads aliases to `VARIABLES.aliases` and compiles `VARIABLES.alias_matcher` from them.
+    Alias path can be an executable / folder path, an executable name, a glob or a regex (see `AliasMatcher`).
     Raises exception if path or name are invalid.
 
     :param script_settings_dict: Script settings as dict.
@@ -1311,177 +4579,655 @@ def load_aliases(script_settings_dict: dict):
     _print("Loading aliases...")
 
     new_aliases = {}
+    new_alias_matcher = AliasMatcher(CONSTANTS.FILENAME_PROHIBITED_CHARS)
     aliases_list = script_settings_dict.get(PN.PROP_ALIASES_LIST)
     if aliases_list is None:
         aliases_list = CONSTANTS.DEFAULT_ALIASES
 
     for index, i in enumerate(aliases_list):
         value = i.get("value")
-        spl = value.split(">", 1)
+        spl = value.rsplit(">", 1)  # Alias name can't contain ">", but globs and regexes can.
         try:
             path, name = spl[0].strip(), spl[1].strip()
         except IndexError:
             raise AliasInvalidFormat(index)
 
-        path = os.path.expandvars(path)
-        if any(i in path for i in CONSTANTS.PATH_PROHIBITED_CHARS) or any(i in name for i in CONSTANTS.FILENAME_PROHIBITED_CHARS):
+        is_pattern = AliasMatcher.is_pattern(path)
+        if not is_pattern:
+            path = os.path.expandvars(path)
+        if (any(i in name for i in CONSTANTS.FILENAME_PROHIBITED_CHARS) or
+                (not is_pattern and any(i in path for i in CONSTANTS.PATH_PROHIBITED_CHARS))):
             raise AliasInvalidCharacters(index)
 
-        if Path(path) in new_aliases.keys():
-            raise AliasPathAlreadyExists(index)
+        try:
+            if not new_alias_matcher.add(path, name):
+                raise AliasPathAlreadyExists(index)
+        except re.error:
+            raise AliasInvalidFormat(index)
 
-        new_aliases[Path(path)] = name
+        if not is_pattern:
+            new_aliases[Path(path)] = name
 
+    new_alias_matcher.compile()
+    VARIABLES.alias_matcher = new_alias_matcher
     VARIABLES.aliases = new_aliases
+    VARIABLES.aliases_generation += 1  # Invalidates display names cache.
+    VARIABLES.save_plan_dirty = True
     _print(f"{len(VARIABLES.aliases)} aliases are loaded.")
 
 
+def load_rules(script_settings_dict: dict):
+    """
+    Loads clip rules and compiles them to `VARIABLES.clip_rules`.
+    Rule format: `target > key=value; key=value`, where target is an app (same format as alias path)
+    or `scene:SceneName`. Keys: `mode`, `template`, `folder` (template or `off`), `links` (`on` / `off`).
+    Raises exception if a rule is invalid.
+
+    :param script_settings_dict: Script settings as dict.
+    """
+    _print("Loading clip rules...")
+
+    new_rules = ClipRules()
+    for index, i in enumerate(script_settings_dict.get(PN.PROP_RULES_LIST) or []):
+        spl = i.get("value", "").rsplit(">", 1)  # Templates can't contain ">", but globs can.
+        if len(spl) != 2 or not spl[0].strip():
+            raise RuleInvalidFormat(index)
+        target, rule = spl[0].strip(), parse_clip_rule(spl[1], index)
+
+        if target.casefold().startswith("scene:"):
+            added = new_rules.add_scene_rule(target[6:].strip(), rule)
+        else:
+            if not AliasMatcher.is_pattern(target):
+                target = os.path.expandvars(target)
+            try:
+                # Patterns are validated in the form they take in the combined regex (see `AliasMatcher.add`),
+                # so `compile` doesn't fail on them.
+                added = new_rules.add_app_rule(target, rule)
+            except re.error:
+                raise RuleInvalidFormat(index)
+        if not added:
+            raise RuleTargetAlreadyExists(index)
+
+    new_rules.compile()
+    VARIABLES.clip_rules = new_rules
+    _print(f"{len(VARIABLES.clip_rules)} clip rules are loaded.")
+
+
+def parse_clip_rule(text: str, index: int) -> ClipRule:
+    """
+    Parses clip rule overrides (`key=value; key=value`).
+    Raises `RuleInvalidFormat` if overrides are invalid.
+
+    :param text: Overrides.
+    :param index: Rule index.
+    """
+    rule = ClipRule()
+    for item in text.split(";"):
+        if not item.strip():
+            continue
+        key, _, value = (i.strip() for i in item.partition("="))
+        key = key.casefold()
+        try:
+            if key == "mode":
+                rule.mode = CONSTANTS.RULES_NAMING_MODES[value.casefold()]
+            elif key == "template":
+                ClipTemplate(value, CONSTANTS.FILENAME_PROHIBITED_CHARS)
+                rule.template = value
+            elif key == "folder" and value.casefold() == "off":
+                rule.save_to_folder = False
+            elif key == "folder":
+                ClipTemplate(value, CONSTANTS.FILENAME_PROHIBITED_CHARS, separators="/\\")
+                rule.save_to_folder, rule.folder_template = True, value
+            elif key == "links":
+                rule.create_links = {"on": True, "off": False}[value.casefold()]
+            else:
+                raise KeyError(key)
+        except (KeyError, ValueError, SyntaxError):
+            raise RuleInvalidFormat(index)
+
+    if all(getattr(rule, i) is None for i in ClipRule.__slots__):
+        raise RuleInvalidFormat(index)
+    return rule
+
+
 # -------------------- clipname_gen.py --------------------
-def gen_clip_base_name(mode: ClipNamingModes | None = None) -> str:
+def gen_clip_base_name(mode: ClipNamingModes | None = None,
+                       clip_span: tuple[float, float] | None = None) -> str:
     """
     Generates the base name of the clip based on the selected naming mode.
     It does NOT generate a new path for the clip or filename, only its base name.
 
     :param mode: Clip naming mode. If None, the mode is fetched from the script config.
                  If a value is provided, it overrides the configs value.
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole exe history is used.
     :return: The base name of the clip based on the selected naming mode.
     """
     _print("Generating clip base name...")
     mode = obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_CLIPS_NAMING_MODE) if mode is None else mode
     mode = ClipNamingModes(mode)
 
-    if mode in [ClipNamingModes.CURRENT_PROCESS, ClipNamingModes.MOST_RECORDED_PROCESS]:
-        if mode is ClipNamingModes.CURRENT_PROCESS:
-            _print("Clip file name depends on the name of an active app (.exe file name) at the moment of clip saving.")
-            pid = get_active_window_pid()
-            executable_path = get_executable_path(pid)
-            _print(f"Current active window process ID: {pid}")
-            _print(f"Current active window executable: {executable_path}")
-
-        else:
-            _print("Clip file name depends on the name of an app (.exe file name) "
-                   "that was active most of the time during the clip recording.")
-            if VARIABLES.clip_exe_history:
-                executable_path = max(VARIABLES.clip_exe_history, key=VARIABLES.clip_exe_history.count)
-            else:
-                executable_path = get_executable_path(get_active_window_pid())
-
-        _print(f'Searching for {executable_path} in aliases list...')
-        if alias := get_alias(executable_path, VARIABLES.aliases):
-            _print(f'Alias found: {alias}.')
-            return alias
+    if mode is ClipNamingModes.CURRENT_PROCESS:
+        _print("Clip file name depends on the name of an active app (.exe file name) at the moment of clip saving.")
+        if (exe_id := get_hooked_exe_id()) is not None:
+            _print(f"Captured app executable: {VARIABLES.exe_registry.paths[exe_id]}")
         else:
-            _print(f"{executable_path} or its parents weren't found in aliases list. "
-                   f"Assigning the name of the executable: {executable_path.stem}")
-            return executable_path.stem
+            exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+            _print(f"Current active window process ID: {VARIABLES.process_cache.last_pid}")
+            _print(f"Current active window executable: {VARIABLES.exe_registry.paths[exe_id]}")
+        return get_exe_display_name(exe_id)
+
+    elif mode is ClipNamingModes.MOST_RECORDED_PROCESS:
+        _print("Clip file name depends on the name of an app (.exe file name) "
+               "that was active most of the time during the clip recording.")
+        return get_exe_display_name(get_top_exe_ids(1, 0, clip_span)[0])
+
+    elif mode is ClipNamingModes.TOP_PROCESSES:
+        _print("Clip file name depends on the names of apps (.exe file names) "
+               "that were active most of the time during the clip recording.")
+        return gen_top_apps_name(clip_span)
+
+    elif mode is ClipNamingModes.MOST_RECORDED_SCENE:
+        _print("Clip file name depends on the name of the scene "
+               "that was active most of the time during the clip recording.")
+        return get_most_recorded_scene_name(clip_span)
 
     else:
         _print("Clip filename depends on the name of the current scene name.")
         return get_current_scene_name()
 
 
-def get_alias(executable_path: str | Path, aliases_dict: dict[Path, str]) -> str | None:
+def gen_top_apps_name(clip_span: tuple[float, float] | None = None) -> str:
+    """
+    Generates a name from the names of the apps that were active most of the time during the clip recording
+    (amount of the apps and their min share are taken from the script config), e.g. `Game+Discord`.
+
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole exe history is used.
+    """
+    amount = obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_CLIPS_TOP_APPS_AMOUNT)
+    min_share = obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_CLIPS_TOP_APPS_MIN_SHARE) / 100
+    names = []
+    for exe_id in get_top_exe_ids(max(1, amount), min_share, clip_span):
+        if (name := get_exe_display_name(exe_id)) not in names:
+            names.append(name)
+    return CONSTANTS.TOP_APPS_SEPARATOR.join(names)
+
+
+def get_top_exe_ids(amount: int, min_share: float = 0.0, clip_span: tuple[float, float] | None = None) -> list[int]:
+    """
+    Returns IDs of up to `amount` executables that were active most of the time during the clip recording.
+    If exe history is empty, returns captured (or active) executable.
+
+    :param amount: Max amount of executables.
+    :param min_share: Min share (0..1) of the clip time (the most active executable is always included).
+    :param clip_span: Start and end timestamps of the saved clip. If None, the whole exe history is used.
+    """
+    history = VARIABLES.clip_exe_history.snapshot() if VARIABLES.clip_exe_history else None
+    exe_ids = []
+    if not history:
+        pass
+    elif clip_span is not None:
+        _print(f"Clip span: {clip_span[1] - clip_span[0]:.1f}s.")
+        exe_ids = history.top_between(*clip_span, amount, min_share)
+    else:
+        exe_ids = history.top(amount, min_share)
+
+    if not exe_ids and (exe_id := get_hooked_exe_id()) is not None:
+        exe_ids = [exe_id]
+    if not exe_ids:
+        exe_ids = [VARIABLES.exe_registry.intern(get_active_executable_path())]
+    return exe_ids
+
+
+def get_current_exe_id() -> int:
+    """
+    Returns ID of the captured app executable (if there is a hooked capture source) or of the active one.
+    """
+    if (exe_id := get_hooked_exe_id()) is None:
+        exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+    return exe_id
+
+
+def get_exe_display_name(exe_id: int, log: bool = True) -> str:
+    """
+    Returns alias of the registered executable, its title from the known games database,
+    its friendly name (see `FriendlyNameResolver`) or its name (without extension) if there is none of them.
+    Names are memoized in `VARIABLES.display_names` until aliases are reloaded.
+
+    :param exe_id: Executable ID (from `ExeRegistry`).
+    :param log: Log where the name was found.
+    """
+    executable_path = VARIABLES.exe_registry.paths[exe_id]
+    generation = VARIABLES.aliases_generation
+    if (name := VARIABLES.display_names.get(exe_id, generation)) is not None:
+        source = "cached"
+    elif name := get_alias(executable_path, VARIABLES.alias_matcher):
+        source = "alias"
+    elif name := VARIABLES.known_games.find(VARIABLES.exe_registry.stems[exe_id]):
+        source = "known game"
+    elif name := VARIABLES.friendly_names.resolve(executable_path, VARIABLES.backend):
+        source = "friendly name"
+    else:
+        name, source = VARIABLES.exe_registry.stems[exe_id], "executable name"
+
+    if source != "cached":
+        VARIABLES.display_names.put(exe_id, name, generation)
+    if log:
+        _print(f"Display name of {executable_path} ({source}): {name}.")
+    return name
+
+
+def get_alias(executable_path: str | Path, alias_matcher: AliasMatcher) -> str | None:
     """
-    Retrieves an alias for the given executable path from the provided dictionary.
+    Retrieves an alias for the given executable path.
 
-    The function first checks if the exact `executable_path` exists in `aliases_dict`.
-    If not, it searches for the closest parent directory that is present in the dictionary.
+    Priority: exact `executable_path`, executable name, globs / regexes, the closest parent directory.
+    Paths are compared case-insensitively.
 
     :param executable_path: A file path or string representing the executable.
-    :param aliases_dict: A dictionary where keys are `Path` objects representing executable file paths
-                         or directories, and values are their corresponding aliases.
+    :param alias_matcher: Compiled aliases (see `load_aliases`).
     :return: The corresponding alias if found, otherwise `None`.
     """
-    exe_path = Path(executable_path)
-    if exe_path in aliases_dict:
-        return aliases_dict[exe_path]
-
-    for parent in exe_path.parents:
-        if parent in aliases_dict:
-            return aliases_dict[parent]
+    return alias_matcher.find(executable_path)
 
 
+def get_clip_settings(log: bool = True) -> ClipRule:
+    """
+    Returns clip settings (naming mode, templates, links) from the script config,
+    overridden by the clip rules of the current app (captured or active) and scene.
 
-def gen_filename(base_name: str, template: str, dt: datetime | None = None) -> str:
+    :param log: Log the applied rule.
     """
-    Generates a file name based on the template.
-    If the template is invalid or formatting fails, raises ValueError.
-    If the generated name contains prohibited characters, raises SyntaxError.
+    settings = VARIABLES.script_settings
+    clip_settings = ClipRule(obs.obs_data_get_int(settings, PN.PROP_CLIPS_NAMING_MODE),
+                             obs.obs_data_get_string(settings, PN.PROP_CLIPS_FILENAME_TEMPLATE),
+                             obs.obs_data_get_bool(settings, PN.PROP_CLIPS_SAVE_TO_FOLDER),
+                             obs.obs_data_get_string(settings, PN.PROP_CLIPS_FOLDER_TEMPLATE),
+                             obs.obs_data_get_bool(settings, PN.PROP_CLIPS_CREATE_LINKS))
+    rules = VARIABLES.clip_rules
+    if not rules:
+        return clip_settings
+
+    exe_id = executable_path = scene = None
+    if rules.has_app_rules:
+        exe_id = get_current_exe_id()
+        executable_path = VARIABLES.exe_registry.paths[exe_id]
+    if rules.has_scene_rules:
+        scene = get_current_scene_name()
+
+    if (rule := rules.find(exe_id, executable_path, scene)) is not None:
+        if log:
+            _print(f"Clip rule applied: {rule}.")
+        clip_settings = clip_settings.merged(rule)
+    return clip_settings
+
+
+def compile_clip_template(template: str, folder: bool = False) -> ClipTemplate:
+    """
+    Returns compiled file name (or folder) template.
+    Compiled templates are cached until the script settings are updated.
+    If the template is invalid, raises ValueError.
+    If the template contains prohibited characters, raises SyntaxError.
 
-    :param base_name: Base name for the file.
-    :param template: Template for generating the file name.
-    :param dt: Optional datetime object; uses current time if None.
-    :return: Formatted file name.
+    :param template: Template string.
+    :param folder: Is it a folder template (can contain `/` and `\\` separators).
     """
-    if not template:
-        raise ValueError
+    key = (template, folder)
+    if (compiled := VARIABLES.compiled_templates.get(key)) is None:
+        try:
+            compiled = ClipTemplate(template, CONSTANTS.FILENAME_PROHIBITED_CHARS, separators="/\\" if folder else "")
+        except ValueError:
+            _print(f"An error occurred while compiling the template {template}.")
+            _print(traceback.format_exc())
+            raise
+        VARIABLES.compiled_templates[key] = compiled
+    return compiled
+
 
-    dt = dt or datetime.now()
-    filename = template.replace("%NAME", base_name)
+def check_clip_template(template: str, folder: bool = False) -> bool:
+    """
+    Checks whether the file name (or folder) template is valid.
+    Unlike `compile_clip_template`, doesn't log errors and doesn't cache the template
+    (it's called by the properties callbacks on every key press).
 
+    :param template: Template string.
+    :param folder: Is it a folder template (can contain `/` and `\\` separators).
+    """
     try:
-        filename = dt.strftime(filename)
-    except Exception as e:
-        _print(f"An error occurred while generating the file name using the template {template}.")
-        _print(traceback.format_exc())
-        raise ValueError from e
+        ClipTemplate(template, CONSTANTS.FILENAME_PROHIBITED_CHARS, separators="/\\" if folder else "")
+    except (ValueError, SyntaxError):
+        return False
+    return True
+
+
+def gen_template_values(base_name: str,
+                        templates: list[ClipTemplate],
+                        clip_span: tuple[float, float] | None = None,
+                        seq: int | None = None) -> dict[str, str]:
+    """
+    Generates values of the variables used in the templates (only the used ones are generated).
 
-    if any(i in filename for i in CONSTANTS.FILENAME_PROHIBITED_CHARS):
-        raise SyntaxError
-    return filename
+    :param base_name: Base name of the clip (%NAME).
+    :param templates: Compiled templates.
+    :param clip_span: Start and end timestamps of the saved clip.
+    :param seq: Clip number (%SEQ). If None, the next number is used (without reserving it).
+    """
+    used = set().union(*(template.variables for template in templates))
+    values = {"NAME": base_name}
+    if "APPS" in used:
+        values["APPS"] = gen_top_apps_name(clip_span)
+    if "SCENE" in used:
+        values["SCENE"] = get_current_scene_name()
+    if "TITLE" in used:
+        with suppress(Exception):
+            values["TITLE"] = get_active_window_title().strip()
+    if "BUFLEN" in used:
+        history = VARIABLES.clip_exe_history
+        values["BUFLEN"] = str(int(history.max_time if history is not None else get_replay_buffer_max_time()))
+    if "SEQ" in used:
+        values["SEQ"] = str(VARIABLES.clips_seq + 1 if seq is None else seq)
+    return values
+
+
+def reserve_clip_seq() -> int:
+    """
+    Reserves the next clip number (%SEQ).
+    Numbers are reserved when the clip destination is generated (not when the clip is moved),
+    so clips saved one after another never get the same number.
+    Must be called on the main thread.
+    """
+    VARIABLES.clips_seq += 1
+    return VARIABLES.clips_seq
+
+
+# -------------------- save_buffer.py --------------------
+def prepare_save_request(mode: ClipNamingModes | None = None,
+                         clip_span: tuple[float, float] | None = None,
+                         use_plan: bool = True,
+                         seq: int | None = None,
+                         render: bool = True) -> SaveRequest:
+    """
+    Captures clip naming inputs (app, scene, exe history) and generates the clip destination.
+    If the save plan is valid for the current app, scene and naming mode, its name and folder are reused.
+
+    :param mode: Clip naming mode. If None, the mode is taken from the clip settings.
+    :param clip_span: Start and end timestamps of the clip. If None, the clip is considered to end right now.
+    :param use_plan: Reuse the save plan (see `refresh_save_plan`).
+    :param seq: Clip number (%SEQ). If None, the next number is reserved (see `reserve_clip_seq`).
+    :param render: Render the destination right away. If False, it's rendered later (see `render_save_request`).
+    """
+    ts = time.time()
+    clip_span = get_clip_span_until(ts) if clip_span is None else clip_span
+    seq = reserve_clip_seq() if seq is None else seq
+    if use_plan and (plan := get_save_plan(mode)) is not None:
+        return request_from_plan(plan, mode, ts, clip_span, seq)
+
+    clip_settings = get_clip_settings()
+    clip_name = gen_clip_base_name(clip_settings.mode if mode is None else mode, clip_span=clip_span)
+    templates = compile_clip_templates(clip_settings)
+    return create_save_request(mode, ts, clip_span, clip_settings, clip_name, templates, seq, render)
+
+
+def compile_clip_templates(clip_settings: ClipRule) -> list[ClipTemplate]:
+    """
+    Returns compiled file name template and folder template (if clip is saved to a folder).
+
+    :param clip_settings: Clip settings.
+    """
+    templates = [compile_clip_template(clip_settings.template)]
+    if clip_settings.save_to_folder:
+        templates.append(compile_clip_template(clip_settings.folder_template, folder=True))
+    return templates
+
+
+def create_save_request(mode: ClipNamingModes | None,
+                        ts: float,
+                        clip_span: tuple[float, float] | None,
+                        clip_settings: ClipRule,
+                        clip_name: str,
+                        templates: list[ClipTemplate],
+                        seq: int,
+                        render: bool = True) -> SaveRequest:
+    """
+    Generates the templates values and creates save request.
+
+    :param mode: Forced clip naming mode or None.
+    :param ts: Request timestamp.
+    :param clip_span: Start and end timestamps of the clip.
+    :param clip_settings: Clip settings.
+    :param clip_name: Base name of the clip.
+    :param templates: Compiled templates (see `compile_clip_templates`).
+    :param seq: Clip number (%SEQ).
+    :param render: Render the destination right away (see `render_save_request`).
+    """
+    request = SaveRequest(mode=None if mode is None else ClipNamingModes(mode).value,
+                          ts=ts,
+                          clip_span=clip_span,
+                          clip_settings=clip_settings,
+                          clip_name=clip_name,
+                          values=gen_template_values(clip_name, templates, clip_span, seq),
+                          templates=templates,
+                          base_folder=Path(get_base_path(script_settings=VARIABLES.script_settings)))
+    if render:
+        render_save_request(request)
+    return request
+
+
+def render_save_request(request: SaveRequest):
+    """
+    Renders the destination folder and file name of the save request from its templates and values.
+    Doesn't use OBS API, so it can be run by `ClipFinalizer` workers.
+
+    :param request: Save request.
+    """
+    dt = datetime.fromtimestamp(request.ts)
+    request.folder = request.base_folder
+    if len(request.templates) > 1:
+        request.folder = request.folder.joinpath(*request.templates[1].render_parts(request.values, dt))
+    request.filename = request.templates[0].render(request.values, dt)
+
+
+def request_from_plan(plan: SaveRequest,
+                      mode: ClipNamingModes | None,
+                      ts: float,
+                      clip_span: tuple[float, float],
+                      seq: int) -> SaveRequest:
+    """
+    Creates save request from the save plan: only date parts and %SEQ of the templates are rendered again.
+
+    :param plan: Valid save plan.
+    :param mode: Forced clip naming mode or None.
+    :param ts: Request timestamp.
+    :param clip_span: Start and end timestamps of the clip.
+    :param seq: Clip number (%SEQ).
+    """
+    values = plan.values
+    if "SEQ" in values:
+        values = dict(values, SEQ=str(seq))
+    request = SaveRequest(mode=None if mode is None else ClipNamingModes(mode).value,
+                          ts=ts,
+                          clip_span=clip_span,
+                          clip_settings=plan.clip_settings,
+                          clip_name=plan.clip_name,
+                          values=values,
+                          templates=plan.templates,
+                          base_folder=plan.base_folder)
+    render_save_request(request)
+    request.folder_exists = plan.folder_exists and request.folder == plan.folder
+    return request
+
+
+def get_save_plan_key() -> tuple[int, str]:
+    """
+    Returns inputs the save plan depends on (besides settings and aliases, which mark the plan as dirty).
+    """
+    return get_current_exe_id(), get_current_scene_name()
 
 
-def ensure_unique_filename(file_path: str | Path) -> Path:
+def get_save_plan(mode: ClipNamingModes | None = None) -> SaveRequest | None:
     """
-    Generates a unique filename by adding a numerical suffix if the file already exists.
+    Returns the save plan if it's up-to-date and generated for the same naming mode, otherwise returns None.
 
-    :param file_path: A string or Path object representing the target file.
-    :return: A unique Path object with a modified name if necessary.
+    :param mode: Clip naming mode. If None, the mode from the clip settings of the plan is used.
     """
-    file_path = Path(file_path)
-    parent, stem, suffix = file_path.parent, file_path.stem, file_path.suffix
-    counter = 1
+    plan = VARIABLES.save_plan
+    if plan is None or VARIABLES.save_plan_dirty:
+        return None
+    if mode is not None and ClipNamingModes(mode).value != plan.clip_settings.mode:
+        return None
+    if plan.key != get_save_plan_key():
+        return None
+    return plan
 
-    while file_path.exists():
-        file_path = parent / f"{stem} ({counter}){suffix}"
-        counter += 1
 
-    return file_path
+def refresh_save_plan():
+    """
+    Generates the clip destination for the current app and scene in advance (see `gen_save_plan`).
+    """
+    VARIABLES.save_plan_dirty = False
+    VARIABLES.save_plan = None
+    try:
+        VARIABLES.save_plan = gen_save_plan()
+    except:
+        _print("An error occurred while generating the save plan.")
+        _print(traceback.format_exc())
+        return
+    _print(f"Save plan refreshed: {VARIABLES.save_plan or 'not used for the current clip settings'}.")
 
 
-# -------------------- save_buffer.py --------------------
-def move_clip_file(mode: ClipNamingModes | None = None) -> tuple[str, Path]:
+def gen_save_plan() -> SaveRequest | None:
+    """
+    Returns the clip destination for the current app and scene.
+    Returns None if the destination depends on something other than the current app and scene
+    (exe history, window title), such clips are named on demand.
+    The folder is not created here, only by the first save with the plan (see `move_clip_file`).
+    """
+    key = get_save_plan_key()
+    clip_settings = get_clip_settings(log=False)
+    if clip_settings.mode not in CONSTANTS.SAVE_PLAN_MODES:
+        return None
+    templates = compile_clip_templates(clip_settings)
+    if any(template.variables & CONSTANTS.SAVE_PLAN_VOLATILE_VARIABLES for template in templates):
+        return None
+
+    if clip_settings.mode == ClipNamingModes.CURRENT_PROCESS.value:
+        clip_name = get_exe_display_name(key[0], log=False)
+    else:
+        clip_name = key[1]
+    plan = create_save_request(None, time.time(), None, clip_settings, clip_name, templates, VARIABLES.clips_seq + 1)
+    if key != get_save_plan_key():  # Focus changed while the plan was generated.
+        return None
+    plan.key = key
+    return plan
+
+
+def reset_save_plan():
+    """
+    Drops the save plan, it's generated again on the next refresh.
+    """
+    VARIABLES.save_plan = None
+    VARIABLES.save_plan_dirty = True
+
+
+def prepare_clip_finalization(mode: ClipNamingModes | None = None) -> tuple:
+    """
+    Captures everything needed to finalize the last saved clip (see `finalize_clip`): the save request,
+    the saved clip path and the links folder.
+    If there is no pending save request, the save plan is used. If the plan is not valid either,
+    a new request is created: clip settings, base name, base folder and templates values are resolved here
+    (the clip is considered to end right now, OBS has just written it), only its rendering is left for the worker.
+    Uses OBS API, so it must be called on the main thread.
+
+    :param mode: Clip naming mode (used only if there is no pending save request).
+    """
     old_file_path = get_last_replay_file_name()
     _print(f"Old clip file path: {old_file_path}")
+    links_folder = obs.obs_data_get_string(VARIABLES.script_settings, PN.PROP_CLIPS_LINKS_FOLDER_PATH)
 
-    clip_name = gen_clip_base_name(mode)
-    ext = old_file_path.split(".")[-1]
-    filename_template = obs.obs_data_get_string(VARIABLES.script_settings,
-                                                PN.PROP_CLIPS_FILENAME_TEMPLATE)
-    filename = gen_filename(clip_name, filename_template) + f".{ext}"
+    if (request := take_save_request()) is not None:
+        _print(f"Clip destination was generated {request.age():.2f}s before saving.")
+    elif (plan := get_save_plan(mode)) is not None:
+        ts = time.time()
+        request = request_from_plan(plan, mode, ts, get_clip_span_until(ts), reserve_clip_seq())
+    else:
+        request = prepare_save_request(mode, use_plan=False, render=False)
+    return request, old_file_path, links_folder
+
+
+def finalize_clip(request: SaveRequest, old_file_path: str, links_folder: str) -> tuple[str, Path, Path]:
+    """
+    Renders the clip destination (if it's not rendered yet) and moves the clip.
+    Run by `ClipFinalizer` workers, arguments are taken from `prepare_clip_finalization`.
+    Doesn't use OBS API and doesn't touch the save plan (it's updated by `finish_clip_saving` on the main thread).
+
+    :param request: Save request.
+    :param old_file_path: Saved clip path.
+    :param links_folder: Folder for the hard link (used if it's enabled in the clip settings).
+    :return: Base name of the clip, its new path and its folder (which exists now).
+    """
+    if request.filename is None:
+        render_save_request(request)
+    return move_clip_file(request, old_file_path, links_folder if request.clip_settings.create_links else None)
 
-    new_folder = Path(get_base_path(script_settings=VARIABLES.script_settings))
-    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_CLIPS_SAVE_TO_FOLDER):
-        new_folder = new_folder / clip_name
 
-    os.makedirs(str(new_folder), exist_ok=True)
-    new_path = new_folder / filename
-    new_path = ensure_unique_filename(new_path)
-    _print(f"New clip file path: {new_path}")
+def move_clip_file(request: SaveRequest,
+                   old_file_path: str,
+                   links_folder: str | None = None) -> tuple[str, Path, Path]:
+    """
+    Moves the saved clip to its destination and creates its hard link.
+    Doesn't use OBS API and doesn't touch the save plan, so it can be run by `ClipFinalizer` workers.
 
-    os.rename(old_file_path, str(new_path))
-    _print("Clip file successfully moved.")
-    os.utime(new_folder)
+    :param request: Save request with the rendered destination.
+    :param old_file_path: Saved clip path.
+    :param links_folder: Folder for the hard link. If None, the link is not created.
+    :return: Base name of the clip, its new path and its folder (which exists now).
+    """
+    ext = old_file_path.split(".")[-1]
 
-    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_CLIPS_CREATE_LINKS):
-        links_folder = obs.obs_data_get_string(VARIABLES.script_settings, PN.PROP_CLIPS_LINKS_FOLDER_PATH)
+    if not request.folder_exists:
+        os.makedirs(str(request.folder), exist_ok=True)
+    try:
+        new_path = VARIABLES.unique_names.move(old_file_path, request.folder, request.filename, ext)
+    except FileNotFoundError:
+        if not os.path.exists(old_file_path):
+            raise
+        # Folder of the plan was removed after the previous save.
+        os.makedirs(str(request.folder), exist_ok=True)
+        new_path = VARIABLES.unique_names.move(old_file_path, request.folder, request.filename, ext)
+    _print(f"Clip file successfully moved: {new_path}.")
+    os.utime(request.folder)
+
+    if links_folder is not None:
         create_hard_link(new_path, links_folder)
-    return clip_name, new_path
+    return request.clip_name, new_path, request.folder
+
+
+def mark_plan_folder_created(folder: Path):
+    """
+    Marks the save plan folder as existing if the clip was moved into it,
+    so the next saves with the plan skip creating the folder.
+    Must be called on the main thread.
+
+    :param folder: Folder of the finalized clip.
+    """
+    if (plan := VARIABLES.save_plan) is not None and plan.folder == folder:
+        plan.folder_exists = True
+
+
+def take_save_request() -> SaveRequest | None:
+    """
+    Returns and resets the pending save request. Returns None if there is no request or it's outdated.
+    """
+    request, VARIABLES.save_request = VARIABLES.save_request, None
+    if request is not None and request.age() > CONSTANTS.SAVE_REQUEST_TIMEOUT:
+        _print(f"{request} is outdated, the clip destination will be generated again.")
+        return None
+    return request
 
 
 def save_buffer_with_force_mode(mode: ClipNamingModes):
     """
     Sends a request to save the replay buffer and setting a specific clip naming mode.
+    The clip destination is generated right away (see `SaveRequest`), only renaming is left for the saved event.
     Can only be called using hotkeys.
     """
     if not obs.obs_frontend_replay_buffer_active():
@@ -1492,71 +5238,127 @@ def save_buffer_with_force_mode(mode: ClipNamingModes):
 
     CONSTANTS.CLIPS_FORCE_MODE_LOCK.acquire()
     VARIABLES.force_mode = mode
+    try:
+        VARIABLES.save_request = prepare_save_request(mode)
+        _print(f"Clip destination generated: {VARIABLES.save_request}.")
+    except:
+        VARIABLES.save_request = None
+        _print("An error occurred while generating the clip destination, it will be generated after saving.")
+        _print(traceback.format_exc())
     obs.obs_frontend_replay_buffer_save()
 
 
 # -------------------- obs_events_callbacks.py --------------------
 def on_buffer_recording_started_callback(event):
     """
-    Resets and starts recording executables history.
-    Starts replay buffer auto restart loop.
+    Resets and starts recording executables history
+    (if replay buffer was restarted by the script, the existing history is kept).
+    Starts replay buffer auto restart loop and save plan refreshing.
     """
     if event is not obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_STARTED:
         return
 
-    # Reset and restart exe history
-    VARIABLES.clip_exe_history = deque([], maxlen=get_replay_buffer_max_time())
-    _print(f"Exe history deque created. Maxlen={VARIABLES.clip_exe_history.maxlen}.")
-    obs.timer_add(append_clip_exe_history, 1000)
+    VARIABLES.buffer_start_time = time.time()
+
+    if VARIABLES.buffer_restarting and VARIABLES.clip_exe_history is not None:
+        VARIABLES.clip_exe_history.set_max_time(get_replay_buffer_max_time())
+        _print(f"Exe history kept after restart. Max time={VARIABLES.clip_exe_history.max_time}s.")
+    else:
+        VARIABLES.clip_exe_history = ExeHistory(max_time=get_replay_buffer_max_time(),
+                                                max_gap=max(3.0, get_max_sampling_period() * 2))
+        _print(f"Exe history created. Max time={VARIABLES.clip_exe_history.max_time}s.")
+
+    if VARIABLES.buffer_restarting and VARIABLES.scene_history is not None:
+        VARIABLES.scene_history.set_max_time(get_replay_buffer_max_time())
+    else:
+        # Scene is active until the next scene switch, so there are no gaps between switches.
+        VARIABLES.scene_history = ExeHistory(max_time=get_replay_buffer_max_time(), max_gap=float("inf"))
+    update_current_scene()
+    VARIABLES.buffer_restarting = False
+
+    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_SESSION_LOG):
+        open_session_log()
+    if VARIABLES.sampler is None:
+        start_clip_exe_sampler()
 
     # Start replay buffer auto restart loop.
     if restart_loop_time := obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_RESTART_BUFFER_LOOP):
         obs.timer_add(restart_replay_buffering_callback, restart_loop_time * 1000)
 
+    VARIABLES.save_plan_dirty = True  # %BUFLEN could change.
+    obs.timer_remove(save_plan_callback)
+    obs.timer_add(save_plan_callback, CONSTANTS.SAVE_PLAN_REFRESH_PERIOD)
+
 
 def on_buffer_recording_stopped_callback(event):
     """
-    Stops recording executables history.
-    Stops replay buffer auto restart loop.
+    Stops recording executables history (unless replay buffer is being restarted by the script).
+    Stops replay buffer auto restart loop and save plan refreshing.
     """
     if event is not obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_STOPPED:
         return
 
-    obs.timer_remove(append_clip_exe_history)
     obs.timer_remove(restart_replay_buffering_callback)
-    VARIABLES.clip_exe_history.clear()
+    if VARIABLES.buffer_restarting:
+        _print("Replay buffer is restarting, exe history is kept.")
+        return
+
+    stop_clip_exe_sampler()
+    obs.timer_remove(save_plan_callback)
+    reset_save_plan()
+    if VARIABLES.session_log is not None:
+        VARIABLES.session_log.flush()
+    if VARIABLES.clip_exe_history is not None:
+        VARIABLES.clip_exe_history.clear()
+    if VARIABLES.scene_history is not None:
+        VARIABLES.scene_history.clear()
+    VARIABLES.friendly_names.cache.flush()
+    _print(f"Process cache: {VARIABLES.process_cache.stats()}.")
+    _print(f"Display names cache: {VARIABLES.display_names.stats()}.")
 
 
 def on_buffer_save_callback(event):
     if event is not obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_SAVED:
         return
 
-    path_display_type = obs.obs_data_get_int(VARIABLES.script_settings,
-                                             PN.PROP_POPUP_PATH_DISPLAY_MODE)
-    path_display_type = PopupPathDisplayModes(path_display_type)
-
     _print(f"{'SAVING BUFFER':->50}")
 
     try:
-        clip_name, path = move_clip_file(mode=VARIABLES.force_mode)
-        if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_RESTART_BUFFER):
-            # IMPORTANT
-            # I don't know why, but it seems like stopping and starting replay buffering should be in the separate thread.
-            # Otherwise it can "stuck" on stopping.
-            Thread(target=restart_replay_buffering, daemon=True).start()
-
-        if VARIABLES.force_mode:
-            VARIABLES.force_mode = None
-            CONSTANTS.CLIPS_FORCE_MODE_LOCK.release()
-
-        notify(True, path, path_display_mode=path_display_type)
+        args = prepare_clip_finalization(VARIABLES.force_mode)
+        # Rendering the destination and file operations are done by the finalizer workers,
+        # results are handled by `finished_clips_callback`.
+        if not VARIABLES.finalizer.submit(finalize_clip, *args):
+            _print(f"Clip finalization queue is full, the clip is moved right now: {VARIABLES.finalizer.stats()}.")
+            finish_clip_saving(VARIABLES.finalizer.run(finalize_clip, *args))
     except:
         _print("An error occurred while moving file to the new destination.")
         _print(traceback.format_exc())
-        notify(False, Path(), path_display_mode=path_display_type)
+        path_display_type = obs.obs_data_get_int(VARIABLES.script_settings,
+                                                 PN.PROP_POPUP_PATH_DISPLAY_MODE)
+        notify(False, Path(), path_display_mode=PopupPathDisplayModes(path_display_type))
+    finally:
+        if VARIABLES.force_mode:
+            VARIABLES.force_mode = None
+            CONSTANTS.CLIPS_FORCE_MODE_LOCK.release()
     _print("-" * 50)
 
 
+def on_scene_changed_callback(event):
+    """
+    Updates cached current scene name, records the scene switch in the scene timeline
+    and resubscribes to capture sources of the new current scene.
+    """
+    if event not in (obs.OBS_FRONTEND_EVENT_SCENE_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_SCENE_LIST_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_SCENE_COLLECTION_CHANGED,
+                     obs.OBS_FRONTEND_EVENT_FINISHED_LOADING):
+        return
+
+    update_current_scene()
+    subscribe_capture_hooks()
+    VARIABLES.save_plan_dirty = True
+
+
 def on_video_recording_started_callback(event):  # todo: for future updates
     if event is not obs.OBS_FRONTEND_EVENT_RECORDING_STARTED:
         return
@@ -1606,14 +5408,164 @@ def restart_replay_buffering_callback():
     # I don't re-add this callback to timer again, cz it will be automatically added in on buffering start callback.
 
 
+def save_plan_callback():
+    """
+    Refreshes the save plan if focus, scene, aliases or settings changed.
+
+    This callback is only called by the obs timer (the plan is not refreshed in the sampler thread,
+    cz generating it uses OBS API).
+    """
+    if VARIABLES.save_plan_dirty:
+        refresh_save_plan()
+
+
+def finished_clips_callback():
+    """
+    Handles clips finalized by `ClipFinalizer` workers (notifications and buffer restart use OBS API).
+
+    This callback is only called by the obs timer.
+    """
+    for job in VARIABLES.finalizer.poll():
+        finish_clip_saving(job)
+
+
+def finish_clip_saving(job: FinishedJob):
+    """
+    Notifies about the finalized clip, updates the save plan and restarts replay buffer (if it's enabled).
+    Must be called on the main thread.
+
+    :param job: Finished `finalize_clip` job.
+    """
+    path_display_type = obs.obs_data_get_int(VARIABLES.script_settings,
+                                             PN.PROP_POPUP_PATH_DISPLAY_MODE)
+    path_display_type = PopupPathDisplayModes(path_display_type)
+
+    if job.error is not None:
+        _print("An error occurred while moving file to the new destination.")
+        _print(job.trace)
+        notify(False, Path(), path_display_mode=path_display_type)
+        return
+
+    clip_name, path, folder = job.result
+    mark_plan_folder_created(folder)
+    _print(f"Clip {path} finalized in {job.latency * 1000:.1f}ms.")
+    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_RESTART_BUFFER):
+        # IMPORTANT
+        # I don't know why, but it seems like stopping and starting replay buffering should be in the separate thread.
+        # Otherwise it can "stuck" on stopping.
+        Thread(target=restart_replay_buffering, daemon=True).start()
+
+    notify(True, path, path_display_mode=path_display_type)
+
+
 def append_clip_exe_history():
     """
     Adds current active executable path in clip exe history.
+    If a capture source of the current scene is hooked to an app, its executable is used without polling the OS.
+
+    This callback is called by the sampler thread (not by OBS).
+
+    :return: ID of the active executable (used by the sampler to detect focus changes).
     """
     with suppress(Exception):
-        pid = get_active_window_pid()
-        exe = get_executable_path(pid)
-        VARIABLES.clip_exe_history.appendleft(exe)
+        exe_id = get_hooked_exe_id()
+        if exe_id is None:
+            exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+        VARIABLES.clip_exe_history.append(exe_id)
+        if exe_id != VARIABLES.last_sampled_exe_id:
+            VARIABLES.last_sampled_exe_id = exe_id
+            VARIABLES.save_plan_dirty = True
+        if VARIABLES.session_log is not None:
+            VARIABLES.session_log.append(exe_id, VARIABLES.exe_registry.paths[exe_id])
+        return exe_id
+
+
+def get_sampling_period() -> float:
+    """
+    Returns active executable sampling period from the script settings (in seconds).
+    """
+    return max(100, obs.obs_data_get_int(VARIABLES.script_settings, PN.PROP_SAMPLING_PERIOD)) / 1000
+
+
+def get_max_sampling_period() -> float:
+    """
+    Returns max possible time between two samples (in seconds) with the current settings.
+    """
+    if obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_ADAPTIVE_SAMPLING):
+        return CONSTANTS.ADAPTIVE_SAMPLING_MAX_PERIOD
+    return get_sampling_period()
+
+
+def start_clip_exe_sampler():
+    """
+    Starts (or restarts) background thread that fills clip exe history.
+    """
+    stop_clip_exe_sampler()
+    VARIABLES.sampler = ForegroundSampler(
+        callback=append_clip_exe_history,
+        period=get_sampling_period(),
+        adaptive=obs.obs_data_get_bool(VARIABLES.script_settings, PN.PROP_ADAPTIVE_SAMPLING),
+        min_period=CONSTANTS.ADAPTIVE_SAMPLING_MIN_PERIOD,
+        max_period=CONSTANTS.ADAPTIVE_SAMPLING_MAX_PERIOD,
+        backoff=CONSTANTS.ADAPTIVE_SAMPLING_BACKOFF,
+        idle_callback=get_time_since_last_input,
+        idle_threshold=CONSTANTS.ADAPTIVE_SAMPLING_IDLE_THRESHOLD
+    )
+    VARIABLES.sampler.start()
+    _print(f"Exe sampler started. Adaptive={VARIABLES.sampler.adaptive}, period={VARIABLES.sampler.period}s.")
+
+
+def stop_clip_exe_sampler():
+    """
+    Stops background thread that fills clip exe history.
+    """
+    if VARIABLES.sampler is None:
+        return
+
+    VARIABLES.sampler.stop()
+    _print(f"Exe sampler stopped: {VARIABLES.sampler.stats()}.")
+    VARIABLES.sampler = None
+
+
+def open_session_log():
+    """
+    Creates a new session log of active executables (if it's not opened yet) and removes the oldest ones.
+    """
+    if VARIABLES.session_log is not None:
+        return
+
+    folder = CONSTANTS.SESSION_LOGS_FOLDER
+    try:
+        folder.mkdir(parents=True, exist_ok=True)
+        logs = sorted(folder.glob("*.srlog"))
+        for old_log in logs[:max(0, len(logs) - CONSTANTS.SESSION_LOGS_MAX_AMOUNT + 1)]:
+            old_log.unlink()
+            old_log.with_name(old_log.name + ".paths").unlink(missing_ok=True)
+
+        VARIABLES.session_log = SessionLog(folder / f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.srlog")
+        _print(f"Session log opened: {VARIABLES.session_log.path}.")
+    except:
+        _print("An error occurred while opening session log.")
+        _print(traceback.format_exc())
+
+
+def close_session_log():
+    """
+    Closes the current session log and prints the most active executables of the session.
+    """
+    if VARIABLES.session_log is None:
+        return
+
+    session_log, VARIABLES.session_log = VARIABLES.session_log, None
+    session_log.close()
+    try:
+        stats = analyze_session_log(session_log.path, max_gap=max(3.0, get_max_sampling_period() * 2))
+        _print(f"Session log closed: {len(session_log)} samples.")
+        for path, seconds in stats.top():
+            _print(f"    {path}: {seconds / 60:.1f} min.")
+    except:
+        _print("An error occurred while analyzing session log.")
+        _print(traceback.format_exc())
 
 
 def append_video_exe_history():
@@ -1621,9 +5573,8 @@ def append_video_exe_history():
     Adds current active executable path in video exe history.
     """
     with suppress(Exception):
-        pid = get_active_window_pid()
-        exe = get_executable_path(pid)
-        VARIABLES.video_exe_history[exe] += 1
+        exe_id = VARIABLES.exe_registry.intern(get_active_executable_path())
+        VARIABLES.video_exe_history[exe_id] += 1
 
 
 # -------------------- hotkeys.py --------------------
@@ -1636,7 +5587,13 @@ def load_hotkeys():
          lambda pressed: save_buffer_with_force_mode(ClipNamingModes.MOST_RECORDED_PROCESS) if pressed else None),
 
         (PN.HK_SAVE_BUFFER_MODE_3, "[Smart Replays] Save buffer (active scene)",
-         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.CURRENT_SCENE) if pressed else None)
+         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.CURRENT_SCENE) if pressed else None),
+
+        (PN.HK_SAVE_BUFFER_MODE_4, "[Smart Replays] Save buffer (most recorded exes)",
+         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.TOP_PROCESSES) if pressed else None),
+
+        (PN.HK_SAVE_BUFFER_MODE_5, "[Smart Replays] Save buffer (most recorded scene)",
+         lambda pressed: save_buffer_with_force_mode(ClipNamingModes.MOST_RECORDED_SCENE) if pressed else None)
     )
 
     for key_name, key_desc, key_callback in keys:
@@ -1652,8 +5609,11 @@ def script_defaults(s):
     _print("Loading default values...")
     obs.obs_data_set_default_string(s, PN.PROP_CLIPS_BASE_PATH, str(get_base_path()))
     obs.obs_data_set_default_int(s, PN.PROP_CLIPS_NAMING_MODE, ClipNamingModes.CURRENT_PROCESS.value)
+    obs.obs_data_set_default_int(s, PN.PROP_CLIPS_TOP_APPS_AMOUNT, 2)
+    obs.obs_data_set_default_int(s, PN.PROP_CLIPS_TOP_APPS_MIN_SHARE, 25)
     obs.obs_data_set_default_string(s, PN.PROP_CLIPS_FILENAME_TEMPLATE, CONSTANTS.DEFAULT_FILENAME_FORMAT)
     obs.obs_data_set_default_bool(s, PN.PROP_CLIPS_SAVE_TO_FOLDER, True)
+    obs.obs_data_set_default_string(s, PN.PROP_CLIPS_FOLDER_TEMPLATE, CONSTANTS.DEFAULT_FOLDER_FORMAT)
     obs.obs_data_set_default_string(s, PN.PROP_CLIPS_LINKS_FOLDER_PATH, str(get_base_path() / '_links'))
 
     # obs.obs_data_set_default_int(s, PN.PROP_VIDEOS_NAMING_MODE, VideoNamingModes.MOST_RECORDED_PROCESS.value)
@@ -1667,6 +5627,10 @@ def script_defaults(s):
     obs.obs_data_set_default_int(s, PN.PROP_POPUP_PATH_DISPLAY_MODE, PopupPathDisplayModes.FULL_PATH.value)
 
     obs.obs_data_set_default_int(s, PN.PROP_RESTART_BUFFER_LOOP, 3600)
+    obs.obs_data_set_default_int(s, PN.PROP_SAMPLING_PERIOD, 1000)
+    obs.obs_data_set_default_bool(s, PN.PROP_ADAPTIVE_SAMPLING, True)
+    obs.obs_data_set_default_bool(s, PN.PROP_USE_CAPTURE_HOOKS, True)
+    obs.obs_data_set_default_bool(s, PN.PROP_SESSION_LOG, False)
     obs.obs_data_set_default_bool(s, PN.PROP_RESTART_BUFFER, True)
 
     arr = obs.obs_data_array_create()
@@ -1682,7 +5646,30 @@ def script_update(settings):
     _print("Updating script...")
 
     VARIABLES.script_settings = settings
-    _print(obs.obs_data_get_json(VARIABLES.script_settings))
+    VARIABLES.compiled_templates = {}
+    VARIABLES.save_plan_dirty = True
+    json_settings = obs.obs_data_get_json(VARIABLES.script_settings)
+    _print(json_settings)
+    try:
+        load_rules(json.loads(json_settings))
+    except RuleParsingError as e:
+        _print(f"Clip rule #{e.index + 1} is invalid, clip rules are not updated.")
+    except re.error:
+        _print("Clip rules can't be compiled, clip rules are not updated.")
+        _print(traceback.format_exc())
+
+    if VARIABLES.sampler is not None:
+        VARIABLES.sampler.period = get_sampling_period()
+        VARIABLES.sampler.adaptive = obs.obs_data_get_bool(settings, PN.PROP_ADAPTIVE_SAMPLING)
+    if VARIABLES.clip_exe_history is not None:
+        VARIABLES.clip_exe_history.max_gap = max(3.0, get_max_sampling_period() * 2)
+
+    if obs.obs_data_get_bool(settings, PN.PROP_USE_CAPTURE_HOOKS) != bool(VARIABLES.hooks_scene_name):
+        subscribe_capture_hooks()
+    if not obs.obs_data_get_bool(settings, PN.PROP_SESSION_LOG):
+        close_session_log()
+    elif VARIABLES.sampler is not None:
+        open_session_log()
     _print("Script updated")
 
 
@@ -1701,16 +5688,24 @@ def script_load(script_settings):
     # VARIABLES.update_available = check_updates(CONSTANTS.VERSION)  # todo: for future updates
 
     json_settings = json.loads(obs.obs_data_get_json(script_settings))
-    load_aliases(json_settings)
+    try:
+        load_aliases(json_settings)
+    except AliasParsingError as e:
+        # E.g. a regex alias saved by an older version, which is rejected now.
+        _print(f"Alias #{e.index + 1} is invalid, aliases are not loaded.")
+    warm_process_cache()
 
     obs.obs_frontend_add_event_callback(on_buffer_save_callback)
     obs.obs_frontend_add_event_callback(on_buffer_recording_started_callback)
     obs.obs_frontend_add_event_callback(on_buffer_recording_stopped_callback)
+    obs.obs_frontend_add_event_callback(on_scene_changed_callback)
 
     # obs.obs_frontend_add_event_callback(on_video_recording_started_callback)  # todo: for future updates
     # obs.obs_frontend_add_event_callback(on_video_recording_stopping_callback)  # todo: for future updates
     # obs.obs_frontend_add_event_callback(on_video_recording_stopped_callback)  # todo: for future updates
     load_hotkeys()
+    subscribe_capture_hooks()
+    obs.timer_add(finished_clips_callback, CONSTANTS.FINISHED_CLIPS_CHECK_PERIOD)
 
     if obs.obs_frontend_replay_buffer_active():
         on_buffer_recording_started_callback(obs.OBS_FRONTEND_EVENT_REPLAY_BUFFER_STARTED)
@@ -1719,8 +5714,24 @@ def script_load(script_settings):
 
 
 def script_unload():
-    obs.timer_remove(append_clip_exe_history)
+    obs.timer_remove(finished_clips_callback)
+    VARIABLES.finalizer.stop(CONSTANTS.CLIP_FINALIZER_STOP_TIMEOUT)
+    for job in VARIABLES.finalizer.poll():
+        _print(f"Clip finalized while unloading: {job.result or job.trace}")
+    stop_clip_exe_sampler()
+    close_session_log()
+    unsubscribe_capture_hooks()
     obs.timer_remove(restart_replay_buffering_callback)
+    obs.timer_remove(save_plan_callback)
+    reset_save_plan()
+    _print(f"Process cache: {VARIABLES.process_cache.stats()}.")
+    _print(f"Display names cache: {VARIABLES.display_names.stats()}.")
+    _print(f"Known games database: {VARIABLES.known_games.stats()}.")
+    _print(f"Friendly names cache: {VARIABLES.friendly_names.cache.stats()}.")
+    _print(f"Unique names: {VARIABLES.unique_names.stats()}.")
+    _print(f"Clip finalizer: {VARIABLES.finalizer.stats()}.")
+    VARIABLES.friendly_names.cache.flush()
+    VARIABLES.known_games.close()
 
     _print("Script unloaded.")
 